@@ -7,8 +7,8 @@ from django.shortcuts import redirect
 from django.template.response import TemplateResponse
 
 from app import settings
-from firebase import topic
 from notification.models import FCMToken
+from notification.tokens import unregister_tokens
 from utils import get_logger
 
 log = get_logger(__name__)
@@ -38,10 +38,7 @@ def logout_view(request):
     response = redirect("/admin/")
     fcm_token = request.COOKIES.get("fcm_token")
     print("FCM TOKEN:::", fcm_token)
-    FCMToken.objects.filter(
-        token=fcm_token, user=user, device_type=FCMToken.DeviceType.WEB
-    ).delete()
     response.delete_cookie("fcm_token")
-    topic.unsubscribe_from_topic(fcm_tokens=fcm_token, topic="admin")
+    unregister_tokens(user, [fcm_token], FCMToken.DeviceType.WEB, "admin")
 
     return response
@@ -0,0 +1,172 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    LimitOffsetPagination,
+    _reverse_ordering,
+)
+
+"""
+A keyset paginator with opaque cursors.
+
+The cursor holds the values of every ordering field of the last row, so every page is an
+index range scan from there and costs the same at any depth. No COUNT(*) is run unless
+the client asks for a cached count with ?count=cached. Views pick the order with
+cursor_ordering, whose fields go in the same direction and end with a unique one.
+"""
+
+
+class KeysetPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = "limit"
+    max_page_size = 100
+    ordering = "-id"
+    count_query_param = "count"
+    count_cache_timeout = 60
+    position_separator = "|"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total = None
+        if request.query_params.get(self.count_query_param) == "cached":
+            self.total = self.get_cached_count(queryset)
+        # NOTE: Positions are unique, the offset of CursorPagination is always 0
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = (
+            (self.cursor.reverse, self.cursor.position)
+            if self.cursor
+            else (False, None)
+        )
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, position))
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering)
+            if len(results) > len(self.page)
+            else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous = following_position is not None
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.next_position = following_position
+            self.has_previous, self.previous_position = position is not None, position
+        self.display_page_controls = self.has_previous or self.has_next
+        return self.page
+
+    """
+    Build the filter of the rows after a position, e.g. for (-created_date, -id):
+    created_date < c OR (created_date = c AND id < i).
+    """
+
+    def get_keyset_filter(self, ordering, position):
+        fields = [field.lstrip("-") for field in ordering]
+        lookup = "lt" if ordering[0].startswith("-") else "gt"
+        values = position.split(self.position_separator)
+        keyset_filter = Q()
+        for i, field in enumerate(fields):
+            keyset_filter |= Q(
+                **dict(zip(fields[:i], values[:i])),
+                **{f"{field}__{lookup}": values[i]},
+            )
+        return keyset_filter
+
+    def _get_position_from_instance(self, instance, ordering):
+        return self.position_separator.join(
+            str(getattr(instance, field.lstrip("-"))) for field in ordering
+        )
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "cursor_ordering", self.ordering)
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+    def get_cached_count(self, queryset):
+        key = hashlib.md5(str(queryset.query).encode()).hexdigest()
+        return cache.get_or_set(
+            f"pagination:count:{key}", queryset.count, self.count_cache_timeout
+        )
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.total is not None:
+            response.data["count"] = self.total
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count"] = {"type": "integer", "example": 123}
+        return schema
+
+
+"""
+Paginate with limit and offset like the rest of the API, or with KeysetPagination when
+the client opts in with ?pagination=cursor or sends a cursor.
+"""
+
+
+class OptionalCursorPagination(BasePagination):
+    cursor_query_param = "cursor"
+    pagination_query_param = "pagination"
+
+    def __init__(self):
+        self.paginator = LimitOffsetPagination()
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.pagination_query_param) == "cursor"
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = (
+            KeysetPagination() if self.use_cursor(request) else LimitOffsetPagination()
+        )
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = {}
+        for parameter in (
+            LimitOffsetPagination().get_schema_operation_parameters(view)
+            + KeysetPagination().get_schema_operation_parameters(view)
+            + [
+                {
+                    "name": self.pagination_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": "cursor to paginate with opaque cursors",
+                    "schema": {"type": "string"},
+                },
+                {
+                    "name": KeysetPagination.count_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": "cached to get a cached total count with cursors",
+                    "schema": {"type": "string"},
+                },
+            ]
+        ):
+            parameters.setdefault(parameter["name"], parameter)
+        return list(parameters.values())
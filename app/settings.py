@@ -79,6 +79,22 @@ CRONJOBS = [
         "invoice.tasks.create_invoices",
         ["DAILY"],
     ),  # NOTE: every day
+    ("30 0 * * *", "invoice.tasks.sweep_overdue_invoices"),  # NOTE: every day
+    (
+        "* * * * *",
+        "invoice.tasks.process_payment_notifications",
+    ),  # NOTE: every minute, run processpaymentnotifications --forever for less delay
+    (
+        "* * * * *",
+        "notification.tasks.drain_push_outbox",
+    ),  # NOTE: every minute, run drainpushoutbox --forever for less delay
+    ("* * * * *", "notification.tasks.flush_badges"),  # NOTE: every minute
+    ("0 1 * * *", "notification.tasks.archive_notifications"),  # NOTE: every day
+    (
+        "* * * * *",
+        "notification.tasks.flush_topic_subscriptions",
+    ),  # NOTE: every minute
+    ("0 * * * *", "notification.tasks.validate_fcm_tokens"),  # NOTE: every hour
     # (
     #     "* * * * *",
     #     "invoice.tasks.create_invoices",
@@ -500,6 +516,12 @@ firebase_credentials = {
 }
 cred = credentials.Certificate(firebase_credentials)
 FIREBASE_ADMIN = initialize_app(cred)
+# NOTE: fake keeps messages and topics in memory instead, see firebase.fake
+FIREBASE_BACKEND = os.environ.get("FIREBASE_BACKEND", "firebase")
+# NOTE: Chat documents are mirrored to Firestore in the background, see firebase.firestore
+FIRESTORE_MIRROR_WINDOW = float(os.environ.get("FIRESTORE_MIRROR_WINDOW", 0.2))
+FIRESTORE_MIRROR_MAX_RETRIES = int(os.environ.get("FIRESTORE_MIRROR_MAX_RETRIES", 5))
+FIRESTORE_MIRROR_BACKOFF = float(os.environ.get("FIRESTORE_MIRROR_BACKOFF", 0.5))
 
 VNPAY_TMN_CODE = os.environ.get("VNPAY_TMN_CODE")
 VNPAY_HASH_SECRET_KEY = os.environ.get("VNPAY_HASH_SECRET_KEY")
@@ -516,3 +538,21 @@ MOMO_SECRET_KEY = os.environ.get("MOMO_SECRET_KEY")
 MOMO_ENDPOINT = os.environ.get("MOMO_ENDPOINT")
 MOMO_REDIRECT_URL = HOST + os.environ.get("MOMO_REDIRECT_URL")
 MOMO_IPN_URL = HOST + os.environ.get("MOMO_IPN_URL")
+MOMO_CONNECT_TIMEOUT = float(os.environ.get("MOMO_CONNECT_TIMEOUT", 3))
+MOMO_READ_TIMEOUT = float(os.environ.get("MOMO_READ_TIMEOUT", 10))
+MOMO_MAX_RETRIES = int(os.environ.get("MOMO_MAX_RETRIES", 2))
+MOMO_RETRY_BACKOFF = float(os.environ.get("MOMO_RETRY_BACKOFF", 0.5))
+MOMO_POOL_SIZE = int(os.environ.get("MOMO_POOL_SIZE", 10))
+MOMO_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.environ.get("MOMO_CIRCUIT_FAILURE_THRESHOLD", 5)
+)
+MOMO_CIRCUIT_RESET_TIMEOUT = float(os.environ.get("MOMO_CIRCUIT_RESET_TIMEOUT", 30))
+
+# NOTE: Read notifications older than this are moved to the archive table
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", 90))
+
+# NOTE: memory only reaches the streams of this process, redis the ones of every node
+NOTIFICATION_STREAM_BROKER = os.environ.get("NOTIFICATION_STREAM_BROKER", "redis")
+NOTIFICATION_STREAM_HEARTBEAT = float(
+    os.environ.get("NOTIFICATION_STREAM_HEARTBEAT", 15)
+)
@@ -1,5 +1,8 @@
+from django.db.models import Q
+
 from app.admin import MyBaseModelAdmin, admin_site
 
+from . import search
 from .models import Inbox, Message
 
 
@@ -17,9 +20,19 @@ class InboxAdmin(MyBaseModelAdmin):
 
 class MessageAdmin(MyBaseModelAdmin):
     list_display = ("id", "inbox", "sender", "content", "created_date")
-    search_fields = ("sender__resident_id", "content")
+    search_fields = ("sender__resident_id",)
     list_filter = ("created_date",)
 
+    def get_search_results(self, request, queryset, search_term):
+        if not (terms := search.get_terms(search_term)):
+            return super().get_search_results(request, queryset, search_term)
+        # NOTE: The content is searched through the full-text index, see chat.search
+        queryset, matches = search.annotate_rank(queryset, terms)
+        return (
+            queryset.filter(matches | Q(sender__resident_id=search_term.strip())),
+            False,
+        )
+
 
 admin_site.register(Inbox, InboxAdmin)
 admin_site.register(Message, MessageAdmin)
@@ -0,0 +1,98 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import TestCase
+
+from app import settings
+from chat.models import Inbox
+from chat.serializers import MessageSerializer
+from firebase.fake import fake_firestore
+from firebase.firestore import mirror
+from user.models import PersonalInformation, User
+
+"""
+A management command to measure the chat throughput offline, with the in-memory
+Firestore.
+
+Messages are sent round robin to a few inboxes inside a transaction which is rolled
+back, so the command can be run against any database. Every Firestore write is slowed
+down by --latency, like a round trip, and the time the two inline writes per message
+used to cost is printed next to the time of a request with the background mirror.
+
+Args:
+    --messages (int): The number of messages. Defaults to 500.
+    --inboxes (int): The number of inboxes. Defaults to 5.
+    --latency (float): The seconds of every Firestore write. Defaults to 0.05.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure the chat throughput with the Firestore mirror"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=500)
+        parser.add_argument("--inboxes", type=int, default=5)
+        parser.add_argument("--latency", type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        settings.FIREBASE_BACKEND = "fake"
+        fake_firestore.reset(latency=options["latency"])
+        with transaction.atomic():
+            inboxes = self.create_inboxes(options["inboxes"])
+            started_at = time.perf_counter()
+            for i in range(options["messages"]):
+                inbox = inboxes[i % len(inboxes)]
+                sender = inbox.user_1 if i % 2 else inbox.user_2
+                with TestCase.captureOnCommitCallbacks(execute=True):
+                    serializer = MessageSerializer(
+                        data={
+                            "content": f"Message {i}",
+                            "inbox": inbox.id,
+                            "sender": sender.pk,
+                        },
+                        context={"request": SimpleNamespace(user=sender)},
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+            elapsed = time.perf_counter() - started_at
+            transaction.set_rollback(True)
+        mirror.flush()
+
+        per_message = elapsed / options["messages"]
+        inline = per_message + 2 * options["latency"]
+        self.stdout.write(
+            f"Mirror: queued {mirror.stats['queued']}, coalesced "
+            f"{mirror.stats['coalesced']}, wrote {mirror.stats['written']} documents "
+            f"in {len(fake_firestore.commits)} batches"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{per_message * 1000:.2f}ms per message "
+                f"({1 / per_message:.0f} messages/s), "
+                f"{inline * 1000:.2f}ms ({1 / inline:.0f} messages/s) "
+                "with the Firestore writes inline"
+            )
+        )
+
+    def create_inboxes(self, count):
+        users = []
+        for i in range(count * 2):
+            personal_information = PersonalInformation.objects.create(
+                citizen_id=f"07{i:010d}",
+                full_name=f"Benchmark {i}",
+                phone_number=f"07{i:08d}",
+            )
+            users.append(
+                User.objects.create(
+                    resident_id=f"C{i:05d}", personal_information=personal_information
+                )
+            )
+        return [
+            Inbox.objects.create(user_1=users[i], user_2=users[i + 1])
+            for i in range(0, len(users), 2)
+        ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from utils.format import fold_accents
+
+
+def copy_last_messages(apps, schema_editor):
+    Inbox = apps.get_model("chat", "Inbox")
+    Message = apps.get_model("chat", "Message")
+    last_message = Message.objects.filter(inbox=OuterRef("pk")).order_by(
+        "-created_date", "-id"
+    )
+    Inbox.objects.update(
+        last_sender=Subquery(last_message.values("sender")[:1]),
+        last_message_date=Subquery(last_message.values("created_date")[:1]),
+    )
+    inboxes = list(
+        Inbox.objects.select_related(
+            "user_1__personal_information", "user_2__personal_information"
+        )
+    )
+    for inbox in inboxes:
+        inbox.user_1_name = fold_accents(inbox.user_1.personal_information.full_name)
+        inbox.user_2_name = fold_accents(inbox.user_2.personal_information.full_name)
+    Inbox.objects.bulk_update(inboxes, ["user_1_name", "user_2_name"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0003_alter_inbox_last_message_alter_message_inbox"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inbox",
+            name="last_message_date",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Thời gian tin nhắn cuối cùng"
+            ),
+        ),
+        migrations.AddField(
+            model_name="inbox",
+            name="last_sender",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Người gửi cuối cùng",
+            ),
+        ),
+        migrations.AddField(
+            model_name="inbox",
+            name="user_1_name",
+            field=models.CharField(
+                blank=True, default="", max_length=50, verbose_name="Tên người dùng 1"
+            ),
+        ),
+        migrations.AddField(
+            model_name="inbox",
+            name="user_2_name",
+            field=models.CharField(
+                blank=True, default="", max_length=50, verbose_name="Tên người dùng 2"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inbox",
+            index=models.Index(
+                fields=["user_1", "user_2_name"], name="chat_inbox_user_1__dd7974_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inbox",
+            index=models.Index(
+                fields=["user_2", "user_1_name"], name="chat_inbox_user_2__762655_idx"
+            ),
+        ),
+        migrations.RunPython(copy_last_messages, migrations.RunPython.noop),
+    ]
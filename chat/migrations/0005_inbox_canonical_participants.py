@@ -0,0 +1,78 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min
+
+
+def order_participants(apps, schema_editor):
+    Inbox = apps.get_model("chat", "Inbox")
+    Message = apps.get_model("chat", "Message")
+    inboxes = list(Inbox.objects.filter(user_1__gt=F("user_2")))
+    for inbox in inboxes:
+        inbox.user_1_id, inbox.user_2_id = inbox.user_2_id, inbox.user_1_id
+        inbox.user_1_name, inbox.user_2_name = inbox.user_2_name, inbox.user_1_name
+    Inbox.objects.bulk_update(
+        inboxes, ["user_1", "user_2", "user_1_name", "user_2_name"], batch_size=1000
+    )
+    # NOTE: The messages of duplicate inboxes are moved to the oldest one of the pair
+    for pair in (
+        Inbox.objects.values("user_1", "user_2")
+        .annotate(
+            count=Count("id"), kept_id=Min("id"), updated_date=Max("updated_date")
+        )
+        .filter(count__gt=1)
+    ):
+        duplicates = Inbox.objects.filter(
+            user_1=pair["user_1"], user_2=pair["user_2"]
+        ).exclude(id=pair["kept_id"])
+        Message.objects.filter(inbox__in=duplicates).update(inbox_id=pair["kept_id"])
+        last_message = (
+            Message.objects.filter(inbox_id=pair["kept_id"])
+            .order_by("-created_date", "-id")
+            .first()
+        )
+        if last_message:
+            Inbox.objects.filter(id=pair["kept_id"]).update(
+                last_message=last_message.content,
+                last_sender_id=last_message.sender_id,
+                last_message_date=last_message.created_date,
+                updated_date=pair["updated_date"],
+            )
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0004_inbox_denormalized_last_message"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(order_participants, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="inbox",
+            index=models.Index(
+                fields=["user_1", "-updated_date"], name="chat_inbox_user_1__866d96_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inbox",
+            index=models.Index(
+                fields=["user_2", "-updated_date"], name="chat_inbox_user_2__7077bb_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="inbox",
+            constraint=models.UniqueConstraint(
+                fields=("user_1", "user_2"), name="unique_inbox_participants"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="inbox",
+            constraint=models.CheckConstraint(
+                check=models.Q(("user_1__lt", models.F("user_2"))),
+                name="inbox_participants_in_order",
+            ),
+        ),
+    ]
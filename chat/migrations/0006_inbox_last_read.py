@@ -0,0 +1,48 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:04
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def read_existing_messages(apps, schema_editor):
+    Inbox = apps.get_model("chat", "Inbox")
+    Message = apps.get_model("chat", "Message")
+    # NOTE: Messages sent before unread counts existed aren't counted as unread
+    last_message_id = Coalesce(
+        Subquery(
+            Message.objects.filter(inbox=OuterRef("pk"))
+            .order_by()
+            .values("inbox")
+            .annotate(last_id=Max("id"))
+            .values("last_id")
+        ),
+        0,
+    )
+    Inbox.objects.update(
+        user_1_last_read_id=last_message_id, user_2_last_read_id=last_message_id
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0005_inbox_canonical_participants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inbox",
+            name="user_1_last_read_id",
+            field=models.PositiveBigIntegerField(
+                default=0, verbose_name="Tin nhắn đã đọc của người dùng 1"
+            ),
+        ),
+        migrations.AddField(
+            model_name="inbox",
+            name="user_2_last_read_id",
+            field=models.PositiveBigIntegerField(
+                default=0, verbose_name="Tin nhắn đã đọc của người dùng 2"
+            ),
+        ),
+        migrations.RunPython(read_existing_messages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:06
+
+from django.db import migrations, models
+
+from utils.format import fold_accents
+
+
+def fold_contents(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+    messages = []
+    for message in Message.objects.only("id", "content").iterator(chunk_size=1000):
+        message.search_content = fold_accents(message.content)
+        messages.append(message)
+        if len(messages) == 1000:
+            Message.objects.bulk_update(messages, ["search_content"])
+            messages = []
+    Message.objects.bulk_update(messages, ["search_content"])
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "mysql":
+        # NOTE: The ngram parser also indexes the words shorter than ft_min_token_size
+        schema_editor.execute(
+            "ALTER TABLE chat_message ADD FULLTEXT INDEX "
+            "chat_message_search_content_ft (search_content) WITH PARSER ngram"
+        )
+    elif vendor == "sqlite":
+        # NOTE: An external content FTS5 table, kept in sync by triggers
+        for statement in [
+            "CREATE VIRTUAL TABLE chat_message_fts USING fts5(search_content, "
+            "content='chat_message', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')",
+            "CREATE TRIGGER chat_message_fts_insert AFTER INSERT ON chat_message "
+            "BEGIN INSERT INTO chat_message_fts(rowid, search_content) "
+            "VALUES (new.id, new.search_content); END",
+            "CREATE TRIGGER chat_message_fts_delete AFTER DELETE ON chat_message "
+            "BEGIN INSERT INTO chat_message_fts(chat_message_fts, rowid, search_content) "
+            "VALUES ('delete', old.id, old.search_content); END",
+            "CREATE TRIGGER chat_message_fts_update AFTER UPDATE ON chat_message "
+            "BEGIN INSERT INTO chat_message_fts(chat_message_fts, rowid, search_content) "
+            "VALUES ('delete', old.id, old.search_content); "
+            "INSERT INTO chat_message_fts(rowid, search_content) "
+            "VALUES (new.id, new.search_content); END",
+            "INSERT INTO chat_message_fts(chat_message_fts) VALUES ('rebuild')",
+        ]:
+            schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "mysql":
+        schema_editor.execute(
+            "ALTER TABLE chat_message DROP INDEX chat_message_search_content_ft"
+        )
+    elif vendor == "sqlite":
+        for statement in [
+            "DROP TRIGGER chat_message_fts_insert",
+            "DROP TRIGGER chat_message_fts_delete",
+            "DROP TRIGGER chat_message_fts_update",
+            "DROP TABLE chat_message_fts",
+        ]:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0006_inbox_last_read"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="search_content",
+            field=models.TextField(
+                blank=True, default="", editable=False, verbose_name="Nội dung tìm kiếm"
+            ),
+        ),
+        migrations.RunPython(fold_contents, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from utils.format import get_word_suffixes
+
+BATCH_SIZE = 1000
+
+
+def index_inbox_names(apps, schema_editor):
+    Inbox = apps.get_model("chat", "Inbox")
+    InboxName = apps.get_model("chat", "InboxName")
+    last_id = 0
+    while inboxes := list(
+        Inbox.objects.filter(id__gt=last_id)
+        .order_by("id")
+        .values_list("id", "user_1_id", "user_2_id", "user_1_name", "user_2_name")[
+            :BATCH_SIZE
+        ]
+    ):
+        InboxName.objects.bulk_create(
+            [
+                InboxName(inbox_id=inbox_id, user_id=user_id, name=name)
+                for inbox_id, user_1_id, user_2_id, user_1_name, user_2_name in inboxes
+                for user_id, full_name in (
+                    (user_1_id, user_2_name),
+                    (user_2_id, user_1_name),
+                )
+                for name in get_word_suffixes(full_name)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        last_id = inboxes[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0007_message_search_content"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InboxName",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, verbose_name="Tên")),
+            ],
+            options={
+                "verbose_name": "Tên tìm kiếm hộp thư",
+                "verbose_name_plural": "Tên tìm kiếm hộp thư",
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="inbox",
+            name="chat_inbox_user_1__dd7974_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="inbox",
+            name="chat_inbox_user_2__762655_idx",
+        ),
+        migrations.AddField(
+            model_name="inboxname",
+            name="inbox",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="names",
+                to="chat.inbox",
+                verbose_name="Hộp thư đến",
+            ),
+        ),
+        migrations.AddField(
+            model_name="inboxname",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Người dùng",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inboxname",
+            index=models.Index(
+                fields=["user", "name"], name="chat_inboxn_user_id_964111_idx"
+            ),
+        ),
+        migrations.RunPython(index_inbox_names, migrations.RunPython.noop),
+    ]
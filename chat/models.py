@@ -1,8 +1,13 @@
 from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 from app.models import MyBaseModel
-from user.models import User
+from user.models import PersonalInformation, User
+from utils.format import fold_accents, get_word_suffixes
 
 
 # TODO: Re-design this model to support group chat
@@ -20,11 +25,167 @@ class Inbox(MyBaseModel):
         on_delete=models.CASCADE,
         related_name="inboxes_as_user_2",
     )
+    # NOTE: Copied from the last message and the users, so listing needs no other table
+    last_sender = models.ForeignKey(
+        verbose_name=_("Người gửi cuối cùng"),
+        to=User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    last_message_date = models.DateTimeField(
+        verbose_name=_("Thời gian tin nhắn cuối cùng"), null=True, blank=True
+    )
+    user_1_name = models.CharField(
+        verbose_name=_("Tên người dùng 1"), max_length=50, blank=True, default=""
+    )
+    user_2_name = models.CharField(
+        verbose_name=_("Tên người dùng 2"), max_length=50, blank=True, default=""
+    )
+    # NOTE: The ID of the last message each user has read, everything after is unread
+    user_1_last_read_id = models.PositiveBigIntegerField(
+        verbose_name=_("Tin nhắn đã đọc của người dùng 1"), default=0
+    )
+    user_2_last_read_id = models.PositiveBigIntegerField(
+        verbose_name=_("Tin nhắn đã đọc của người dùng 2"), default=0
+    )
 
     class Meta:
         verbose_name = _("Hộp thư đến")
         verbose_name_plural = _("Hộp thư đến")
         ordering = ["-updated_date"]
+        indexes = [
+            models.Index(fields=["user_1", "-updated_date"]),
+            models.Index(fields=["user_2", "-updated_date"]),
+        ]
+        # NOTE: user_1 is always the lower resident ID, so a pair has one inbox
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user_1", "user_2"], name="unique_inbox_participants"
+            ),
+            models.CheckConstraint(
+                check=models.Q(user_1__lt=models.F("user_2")),
+                name="inbox_participants_in_order",
+            ),
+        ]
+
+    """
+    Get the inbox of two users, creating it when they have none.
+
+    The users are put in canonical order, so the lookup is one unique index probe, and
+    two concurrent creates end with the same inbox thanks to the unique constraint.
+
+    Args:
+        user (User): One of the users.
+        other_user (User): The other one.
+
+    Returns:
+        tuple: The inbox and whether it was created.
+    """
+
+    @staticmethod
+    def get_or_create_between(user, other_user):
+        user_1, user_2 = sorted([user, other_user], key=lambda user: user.pk)
+        return Inbox.objects.get_or_create(user_1=user_1, user_2=user_2)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            if self.user_1_id > self.user_2_id:
+                self.user_1, self.user_2 = self.user_2, self.user_1
+            self.user_1_name = fold_accents(self.user_1.personal_information.full_name)
+            self.user_2_name = fold_accents(self.user_2.personal_information.full_name)
+            super().save(*args, **kwargs)
+            InboxName.index([self])
+            return
+        super().save(*args, **kwargs)
+
+    def get_peer(self, user):
+        return self.user_2 if self.user_1_id == user.pk else self.user_1
+
+    def get_last_read_field(self, user):
+        return (
+            "user_1_last_read_id"
+            if self.user_1_id == user.pk
+            else "user_2_last_read_id"
+        )
+
+    def set_last_message(self, message):
+        self.last_message = message.content
+        self.last_sender = message.sender
+        self.last_message_date = message.created_date
+        # NOTE: Sending reads everything before, so the unread ones are the other's
+        last_read_field = self.get_last_read_field(message.sender)
+        setattr(self, last_read_field, message.id)
+        self.save(
+            update_fields=[
+                "last_message",
+                "last_sender",
+                "last_message_date",
+                last_read_field,
+                "updated_date",
+            ]
+        )
+
+    """
+    Mark the messages of the inbox as read by a user, up to a message.
+
+    The last read message only ever moves forward, whichever device of the user reads
+    last.
+
+    Args:
+        user (User): The user.
+        message_id (int, optional): Defaults to the last message of the inbox.
+
+    Returns:
+        bool: Whether anything was marked as read.
+    """
+
+    def read(self, user, message_id=None):
+        messages = self.message_set.order_by("-id")
+        if message_id is not None:
+            messages = messages.filter(id__lte=message_id)
+        # NOTE: Only IDs of messages of this inbox are stored
+        message_id = messages.values_list("id", flat=True).first()
+        if not message_id:
+            return False
+        last_read_field = self.get_last_read_field(user)
+        return bool(
+            Inbox.objects.filter(
+                id=self.id, **{f"{last_read_field}__lt": message_id}
+            ).update(**{last_read_field: message_id})
+        )
+
+    """
+    Annotate inboxes with the number of messages a user hasn't read.
+
+    Every count is a range of the (inbox, id) index after the last read message of the
+    user, computed inside the query of the inboxes.
+
+    Args:
+        queryset (QuerySet): The inboxes of the user.
+        user (User): The user.
+
+    Returns:
+        QuerySet: The inboxes with an unread attribute.
+    """
+
+    @staticmethod
+    def annotate_unread(queryset, user):
+        unread_messages = (
+            Message.objects.filter(inbox=OuterRef("pk"), id__gt=OuterRef("last_read"))
+            .order_by()
+            .values("inbox")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return queryset.annotate(
+            last_read=Case(
+                When(user_1=user, then=F("user_1_last_read_id")),
+                default=F("user_2_last_read_id"),
+            ),
+            unread=Coalesce(Subquery(unread_messages), 0),
+        )
 
     def get_last_message(self):
         if last_message := self.message_set.order_by("-created_date").first():
@@ -33,6 +194,66 @@ class Inbox(MyBaseModel):
             return None
 
 
+"""
+A name an inbox is searched by, from the word it starts at to the end of the folded name
+of the other user, e.g. "tran van duc", "van duc" and "duc".
+
+A search is a prefix range of the (user, name) index, so it matches the start of any
+word of the name.
+"""
+
+
+class InboxName(models.Model):
+    inbox = models.ForeignKey(
+        verbose_name=_("Hộp thư đến"),
+        to=Inbox,
+        on_delete=models.CASCADE,
+        related_name="names",
+    )
+    # NOTE: The user who searches, the name is the one of the other user
+    user = models.ForeignKey(
+        verbose_name=_("Người dùng"),
+        to=User,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    name = models.CharField(verbose_name=_("Tên"), max_length=50)
+
+    class Meta:
+        verbose_name = _("Tên tìm kiếm hộp thư")
+        verbose_name_plural = _("Tên tìm kiếm hộp thư")
+        indexes = [models.Index(fields=["user", "name"])]
+
+    """
+    Replace the names of inboxes with the ones of their user names.
+
+    Args:
+        inboxes (list): The inboxes.
+
+    Returns:
+        None
+    """
+
+    @staticmethod
+    def index(inboxes):
+        InboxName.objects.filter(inbox__in=inboxes).delete()
+        InboxName.objects.bulk_create(
+            [
+                InboxName(inbox=inbox, user_id=user_id, name=name)
+                for inbox in inboxes
+                for user_id, full_name in (
+                    (inbox.user_1_id, inbox.user_2_name),
+                    (inbox.user_2_id, inbox.user_1_name),
+                )
+                for name in get_word_suffixes(full_name)
+            ],
+            batch_size=1000,
+        )
+
+    def __str__(self):
+        return f"{self.user_id} - {self.name}"
+
+
 # TODO: Do we have time for handling image stuff in frontend? If we do, then add that
 # feature later
 class Message(MyBaseModel):
@@ -47,8 +268,36 @@ class Message(MyBaseModel):
         on_delete=models.CASCADE,
     )
     content = models.TextField(verbose_name=_("Nội dung"))
+    # NOTE: The content without accents, which is full-text indexed, see chat.search
+    search_content = models.TextField(
+        verbose_name=_("Nội dung tìm kiếm"), blank=True, default="", editable=False
+    )
 
     class Meta:
         verbose_name = _("Tin nhắn")
         verbose_name_plural = _("Tin nhắn")
         ordering = ["-created_date"]
+
+    def save(self, *args, **kwargs):
+        self.search_content = fold_accents(self.content)
+        super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=PersonalInformation)
+def update_inbox_names(sender, instance, **kwargs):
+    name = fold_accents(instance.full_name)
+    inboxes = list(
+        Inbox.objects.filter(
+            Q(user_1__personal_information=instance) & ~Q(user_1_name=name)
+            | Q(user_2__personal_information=instance) & ~Q(user_2_name=name)
+        ).select_related("user_1", "user_2")
+    )
+    if not inboxes:
+        return
+    for inbox in inboxes:
+        if inbox.user_1.personal_information_id == instance.pk:
+            inbox.user_1_name = name
+        if inbox.user_2.personal_information_id == instance.pk:
+            inbox.user_2_name = name
+    Inbox.objects.bulk_update(inboxes, ["user_1_name", "user_2_name"])
+    InboxName.index(inboxes)
@@ -0,0 +1,178 @@
+import re
+from html import escape
+
+from django.db import connection
+from django.db.models import F, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+
+from chat.models import Inbox, Message
+from utils.format import fold_accents
+
+FTS_TABLE = "chat_message_fts"
+HIGHLIGHT_SIZE = 80
+
+"""
+Split a search into the terms matched against the folded content of the messages.
+
+Args:
+    query (str): The search, e.g. "Đức  ơi!".
+
+Returns:
+    list: The folded words, e.g. ["duc", "oi"].
+"""
+
+
+def get_terms(query):
+    return re.findall(r"\w+", fold_accents(query or ""))
+
+
+"""
+The relevance of a message in the MySQL FULLTEXT index of its search_content.
+
+The column is a reference, so it follows the alias of the table when the query is
+nested, e.g. in an id__in subquery.
+"""
+
+
+class Match(Func):
+    template = "MATCH (%(expressions)s) AGAINST (%(query)s IN BOOLEAN MODE)"
+    output_field = FloatField()
+
+    def __init__(self, query):
+        super().__init__(F("search_content"), query=Value(query))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        query, params = compiler.compile(self.extra["query"])
+        sql, expression_params = super().as_sql(
+            compiler, connection, query=query, **extra_context
+        )
+        return sql, (*expression_params, *params)
+
+
+"""
+The BM25 relevance of a message in the SQLite FTS5 table which mirrors its
+search_content, higher is better.
+"""
+
+
+class BM25(Func):
+    template = (
+        f"(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %(query)s AND rowid = %(expressions)s)"
+    )
+    output_field = FloatField()
+
+    def __init__(self, query):
+        super().__init__(F("id"), query=Value(query))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        query, params = compiler.compile(self.extra["query"])
+        sql, expression_params = super().as_sql(
+            compiler, connection, query=query, **extra_context
+        )
+        return sql, (*params, *expression_params)
+
+
+"""
+Annotate messages with their rank and get the condition of the ones which contain every
+term, so it can be combined with other conditions.
+
+MySQL matches the FULLTEXT index of search_content, SQLite the FTS5 table which mirrors
+it, see the 0007 migration of chat. Other databases fall back to a scan with no rank.
+
+Args:
+    queryset (QuerySet): The messages searched.
+    terms (list): The folded terms.
+
+Returns:
+    tuple: The messages with a rank attribute, higher is better, and the Q of the
+    matching ones.
+"""
+
+
+def annotate_rank(queryset, terms):
+    if connection.vendor == "mysql":
+        match = " ".join(f'+"{term}"' for term in terms)
+        return queryset.annotate(rank=Match(match)), Q(rank__gt=0)
+    if connection.vendor == "sqlite":
+        # NOTE: Every term also matches the words it starts, like the ngram parser
+        match = " ".join(f'"{term}"*' for term in terms)
+        return queryset.annotate(rank=BM25(match)), Q(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+            )
+        )
+    matches = Q()
+    for term in terms:
+        matches &= Q(search_content__contains=term)
+    return queryset.annotate(rank=Value(0.0)), matches
+
+
+"""
+Search the messages of the inboxes of a user, best matches first.
+
+Args:
+    user (User): The user.
+    query (str): The search, accents don't matter.
+    inbox_id (int, optional): Only search this inbox.
+
+Returns:
+    QuerySet: The matching messages with a rank attribute.
+"""
+
+
+def search_messages(user, query, inbox_id=None):
+    terms = get_terms(query)
+    if not terms:
+        return Message.objects.none()
+    inboxes = Inbox.objects.filter(Q(user_1=user) | Q(user_2=user))
+    if inbox_id is not None:
+        inboxes = inboxes.filter(id=inbox_id)
+    messages, matches = annotate_rank(Message.objects.filter(inbox__in=inboxes), terms)
+    return (
+        messages.filter(matches)
+        .select_related("sender__personal_information")
+        .order_by("-rank", "-id")
+    )
+
+
+"""
+Cut the part of a message around its first match, with the matching words in <mark>.
+
+The folded content has a character per character of the content, so the matches found
+in it are the positions of the accented words.
+
+Args:
+    content (str): The content of the message.
+    terms (list): The folded terms.
+    size (int): The maximum number of characters of the snippet.
+
+Returns:
+    str: The escaped snippet.
+"""
+
+
+def get_highlight(content, terms, size=HIGHLIGHT_SIZE):
+    if not terms:
+        return escape(content[:size]) + ("…" if len(content) > size else "")
+    folded = fold_accents(content)
+    if len(folded) != len(content):
+        folded = content
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\w*")
+    matches = list(pattern.finditer(folded))
+    start = max(matches[0].start() - size // 4, 0) if matches else 0
+    # NOTE: Starts at a word
+    start = content.rfind(" ", 0, start) + 1 if start else 0
+    end = min(start + size, len(content))
+    snippet = []
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        snippet.append(escape(content[position : match.start()]))
+        snippet.append(f"<mark>{escape(content[match.start() : match.end()])}</mark>")
+        position = match.end()
+    snippet.append(escape(content[position:end]))
+    return (
+        ("…" if start else "") + "".join(snippet) + ("…" if end < len(content) else "")
+    )
@@ -1,10 +1,12 @@
+from django.db import transaction
 from rest_framework import serializers
 
-from firebase import firestore
+from firebase.firestore import mirror
 from notification.manager import NotificationManager
 from notification.types import EntityType
 from user.models import User
 
+from . import search
 from .models import Inbox, Message
 
 
@@ -19,10 +21,14 @@ class UserSerializer(serializers.ModelSerializer):
 
 class InboxSerializer(serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
+    unread = serializers.SerializerMethodField()
 
     def get_user(self, obj):
-        user = obj.user_1 if obj.user_1 != self.context["user"] else obj.user_2
-        return UserSerializer(user).data
+        return UserSerializer(obj.get_peer(self.context["user"])).data
+
+    def get_unread(self, obj):
+        # NOTE: Only set on inboxes annotated with Inbox.annotate_unread
+        return getattr(obj, "unread", None)
 
     def validate(self, attrs):
         user_1 = attrs.get("user_1")
@@ -35,23 +41,46 @@ class InboxSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Inbox
-        fields = ["id", "last_message", "user", "user_1", "user_2"]
-        read_only_fields = ["id", "last_message", "user"]
+        fields = [
+            "id",
+            "last_message",
+            "last_sender",
+            "last_message_date",
+            "updated_date",
+            "user",
+            "unread",
+            "user_1",
+            "user_2",
+        ]
+        read_only_fields = [
+            "id",
+            "last_message",
+            "last_sender",
+            "last_message_date",
+            "updated_date",
+            "user",
+            "unread",
+        ]
+        # NOTE: An existing pair is returned by the view instead of being rejected
+        validators = []
+
+
+class ReadInboxSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField(required=False, min_value=1)
 
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = "__all__"
+        exclude = ["search_content"]
 
     def create(self, validated_data):
         instance = super().create(validated_data)
         request = self.context["request"]
         inbox = instance.inbox
-        inbox.last_message = instance.content
-        inbox.save()
+        inbox.set_last_message(instance)
         receiver = inbox.user_1 if inbox.user_1 != request.user else inbox.user_2
-        firestore_data = {
+        inbox_data = {
             "id": inbox.id,
             "created_date": inbox.created_date,
             "updated_date": inbox.updated_date,
@@ -69,11 +98,7 @@ class MessageSerializer(serializers.ModelSerializer):
                 "avatar": receiver.avatar_url,
             },
         }
-        firestore.db.collection("inboxes").document(document_id=str(inbox.id)).set(
-            firestore_data
-        )
-
-        firestore_data = {
+        message_data = {
             "id": instance.id,
             "created_date": instance.created_date,
             "updated_date": instance.updated_date,
@@ -85,9 +110,9 @@ class MessageSerializer(serializers.ModelSerializer):
                 "avatar": request.user.avatar_url,
             },
         }
-        firestore.db.collection("messages").document(document_id=str(instance.id)).set(
-            firestore_data
-        )
+        # NOTE: Written in the background, bursts to an inbox rewrite it once
+        transaction.on_commit(lambda: mirror.set("inboxes", inbox.id, inbox_data))
+        transaction.on_commit(lambda: mirror.set("messages", instance.id, message_data))
         NotificationManager.create_notification(
             entity=inbox,
             entity_type=EntityType.CHAT_SEND_MESSAGE,
@@ -102,3 +127,24 @@ class MessageSerializer(serializers.ModelSerializer):
             },
         )
         return instance
+
+
+class MessageSearchSerializer(serializers.ModelSerializer):
+    sender = UserSerializer()
+    rank = serializers.FloatField()
+    highlight = serializers.SerializerMethodField()
+
+    def get_highlight(self, obj):
+        return search.get_highlight(obj.content, self.context["terms"])
+
+    class Meta:
+        model = Message
+        fields = [
+            "id",
+            "inbox",
+            "sender",
+            "content",
+            "created_date",
+            "rank",
+            "highlight",
+        ]
@@ -1,10 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import InboxViewSet, MessageViewSet
+from .views import InboxViewSet, MessageSearchViewSet, MessageViewSet
 
 router = DefaultRouter()
 router.register("inboxes", InboxViewSet, basename="inbox")
+router.register("messages/search", MessageSearchViewSet, basename="message-search")
 router.register(
     "inboxes/(?P<inbox_id>[^/.]+)/messages",
     MessageViewSet,
@@ -1,16 +1,25 @@
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets
-from rest_framework.generics import ListCreateAPIView
+from rest_framework.decorators import action
+from rest_framework.generics import ListAPIView, ListCreateAPIView
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from app.pagination import OptionalCursorPagination
 from chat.permissions import IsRelated
 from utils import get_logger
+from utils.format import fold_accents
 
-from .models import Inbox, Message
-from .serializers import InboxSerializer, MessageSerializer
+from . import search
+from .models import Inbox, InboxName, Message
+from .serializers import (
+    InboxSerializer,
+    MessageSearchSerializer,
+    MessageSerializer,
+    ReadInboxSerializer,
+)
 
 log = get_logger(__name__)
 
@@ -33,16 +42,24 @@ class InboxViewSet(ListCreateAPIView, viewsets.ViewSet):
         return context
 
     def get_queryset(self):
-        queryset = None
-        if query := self.request.query_params.get("q", None):
-            queryset = Inbox.objects.filter(
-                Q(user_1__personal_information__full_name__icontains=query)
-                | Q(user_2__personal_information__full_name__icontains=query)
+        user = self.request.user
+        queryset = Inbox.objects.filter(Q(user_1=user) | Q(user_2=user)).exclude(
+            Q(last_message=None) | Q(last_message="")
+        )
+        if query := self.request.query_params.get("q", "").strip():
+            # NOTE: Matches the start of any word of the name of the other user, without
+            # accents, through the (user, name) index of InboxName
+            queryset = queryset.filter(
+                id__in=InboxName.objects.filter(
+                    user=user, name__startswith=" ".join(fold_accents(query).split())
+                ).values("inbox_id")
             )
-        queryset = Inbox.objects.filter(
-            Q(user_1=self.request.user) | Q(user_2=self.request.user)
-        ).exclude(Q(last_message=None) | Q(last_message=""))
-        return queryset
+        return Inbox.annotate_unread(
+            queryset.select_related(
+                "user_1__personal_information", "user_2__personal_information"
+            ),
+            user,
+        ).order_by("-updated_date")
 
     def create(self, request, *args, **kwargs):
         if (
@@ -52,23 +69,51 @@ class InboxViewSet(ListCreateAPIView, viewsets.ViewSet):
             return Response(
                 "You do not have permission to create this inbox", status=400
             )
-        if inbox := Inbox.objects.filter(
-            Q(user_1=request.data.get("user_1"), user_2=request.data.get("user_2"))
-            | Q(
-                user_1=request.data.get("user_2"),
-                user_2=request.data.get("user_1"),
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        inbox, created = Inbox.get_or_create_between(
+            serializer.validated_data["user_1"], serializer.validated_data["user_2"]
+        )
+        return Response(
+            self.get_serializer(instance=inbox).data,
+            status=201 if created else 200,
+        )
+
+    @action(detail=False, methods=["GET"])
+    def unread(self, request):
+        unread = dict(
+            Inbox.annotate_unread(
+                Inbox.objects.filter(Q(user_1=request.user) | Q(user_2=request.user)),
+                request.user,
             )
-        ).first():
-            return Response(
-                InboxSerializer(instance=inbox, context={"user": request.user}).data,
-                status=200,
-            )
-        return super().create(request, *args, **kwargs)
+            .filter(unread__gt=0)
+            .values_list("id", "unread")
+        )
+        return Response({"total": sum(unread.values()), "inboxes": unread})
+
+    @action(detail=True, methods=["POST"], serializer_class=ReadInboxSerializer)
+    def read(self, request, inbox_id=None):
+        inbox = self.get_object()
+        serializer = ReadInboxSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        inbox.read(request.user, serializer.validated_data.get("message_id"))
+        log.info(f"{request.user.pk} read inbox {inbox.id}")
+        return Response(
+            {
+                "unread": Inbox.annotate_unread(
+                    Inbox.objects.filter(id=inbox.id), request.user
+                )
+                .values_list("unread", flat=True)
+                .get()
+            }
+        )
 
 
 class MessageViewSet(ListCreateAPIView, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = MessageSerializer
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ("-created_date", "-id")
     lookup_url_kwarg = "message_id"
 
     def get_serializer_context(self):
@@ -100,3 +145,22 @@ class MessageViewSet(ListCreateAPIView, viewsets.ViewSet):
             ).data
         log.info("Get messagse successfully")
         return response
+
+
+class MessageSearchViewSet(ListAPIView, viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+    serializer_class = MessageSearchSerializer
+    pagination_class = MessagePagination
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update({"terms": search.get_terms(self.request.query_params.get("q"))})
+        return context
+
+    def get_queryset(self):
+        inbox_id = self.request.query_params.get("inbox")
+        return search.search_messages(
+            self.request.user,
+            self.request.query_params.get("q"),
+            inbox_id=int(inbox_id) if inbox_id and inbox_id.isdigit() else None,
+        )
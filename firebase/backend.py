@@ -0,0 +1,12 @@
+from firebase_admin import firestore, messaging
+
+from app import settings
+from firebase.fake import fake_firestore, fake_messaging
+
+
+def get_messaging():
+    return fake_messaging if settings.FIREBASE_BACKEND == "fake" else messaging
+
+
+def get_firestore():
+    return fake_firestore if settings.FIREBASE_BACKEND == "fake" else firestore.client()
@@ -0,0 +1,162 @@
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+from firebase_admin import exceptions, messaging
+
+"""
+A stand-in for firebase_admin.messaging which keeps everything in memory.
+
+It is used instead of Firebase when FIREBASE_BACKEND is fake, e.g. in tests or on a
+machine without Firebase credentials. Topics are sets of tokens, the sent messages are
+recorded and tokens added to invalid_tokens are answered like FCM answers unregistered
+tokens.
+"""
+
+
+class FakeMessaging:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.topics = defaultdict(set)
+            self.invalid_tokens = set()
+            self.sent = []
+            self.calls = []
+
+    def manage_topic(self, name, tokens, topic, add):
+        tokens = [tokens] if isinstance(tokens, str) else list(tokens)
+        results = []
+        with self.lock:
+            self.calls.append((name, len(tokens)))
+            for token in tokens:
+                if token in self.invalid_tokens:
+                    results.append({"error": "NOT_FOUND"})
+                    continue
+                if add:
+                    self.topics[topic].add(token)
+                else:
+                    self.topics[topic].discard(token)
+                results.append({})
+        return messaging.TopicManagementResponse({"results": results})
+
+    def subscribe_to_topic(self, tokens, topic, app=None):
+        return self.manage_topic("subscribe_to_topic", tokens, topic, True)
+
+    def unsubscribe_from_topic(self, tokens, topic, app=None):
+        return self.manage_topic("unsubscribe_from_topic", tokens, topic, False)
+
+    def send_one(self, message, dry_run):
+        if message.token in self.invalid_tokens:
+            return messaging.SendResponse(
+                None, messaging.UnregisteredError("Requested entity was not found.")
+            )
+        if not dry_run:
+            self.sent.append(message)
+        return messaging.SendResponse(
+            {"name": f"projects/fake/messages/{next(self.ids)}"}, None
+        )
+
+    def send_each(self, messages, dry_run=False, app=None):
+        with self.lock:
+            self.calls.append(("send_each", len(messages)))
+            return messaging.BatchResponse(
+                [self.send_one(message, dry_run) for message in messages]
+            )
+
+    def send_multicast(self, multicast_message, dry_run=False, app=None):
+        return self.send_each(
+            [
+                messaging.Message(
+                    token=token,
+                    notification=multicast_message.notification,
+                    data=multicast_message.data,
+                    android=multicast_message.android,
+                )
+                for token in multicast_message.tokens
+            ],
+            dry_run,
+        )
+
+    def send(self, message, dry_run=False, app=None):
+        with self.lock:
+            self.calls.append(("send", 1))
+            return self.send_one(message, dry_run).message_id
+
+
+fake_messaging = FakeMessaging()
+
+
+"""
+A stand-in for a Firestore client which keeps the documents in memory.
+
+Writes can be slowed down by latency seconds, like a round trip to Firestore, and the
+next fail_next commits raise, so the writers can be benchmarked and tested offline.
+"""
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, latency=0, fail_next=0):
+        with self.lock:
+            self.documents = defaultdict(dict)
+            self.commits = []
+            self.latency = latency
+            self.fail_next = fail_next
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def commit(self, writes):
+        time.sleep(self.latency)
+        with self.lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                raise exceptions.UnavailableError("The service is unavailable")
+            for collection, document_id, data in writes:
+                self.documents[collection][document_id] = data
+            self.commits.append(len(writes))
+
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, document_id):
+        return FakeDocument(self.client, self.name, document_id)
+
+
+class FakeDocument:
+    def __init__(self, client, collection, document_id):
+        self.client = client
+        self.collection = collection
+        self.id = document_id
+
+    def set(self, data):
+        self.client.commit([(self.collection, self.id, data)])
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, reference, data):
+        self.writes.append((reference.collection, reference.id, data))
+
+    def commit(self):
+        self.client.commit(self.writes)
+
+
+fake_firestore = FakeFirestore()
@@ -1,3 +1,119 @@
-from firebase_admin import firestore
+import atexit
+import os
+import threading
+import time
 
-db = firestore.client()
+from app import settings
+from firebase.backend import get_firestore
+from utils import get_logger
+
+log = get_logger(__name__)
+
+MAX_BATCH_SIZE = 500  # NOTE: The limit of Firestore for the writes of a batch
+
+"""
+Mirror documents to Firestore from a background thread.
+
+Writes are queued and written every window seconds with WriteBatch, up to
+MAX_BATCH_SIZE per batch, so the request doesn't wait for Firestore. Only the last write
+of a document within a window is kept, e.g. a burst of messages rewrites their inbox
+once. A failed batch is retried max_retries times, backoff seconds apart and doubled
+every time, before it is dropped. The queue lives in the memory of the process, a crash
+loses at most one window of writes.
+
+Args:
+    window (float): The number of seconds writes are coalesced for.
+    max_retries (int): The number of times a failed batch is retried.
+    backoff (float): The number of seconds before the first retry.
+"""
+
+
+class MirrorWriter:
+    def __init__(self, window=0.2, max_retries=5, backoff=0.5):
+        self.window = window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.has_pending = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.pid = None
+        self.stats = dict.fromkeys(
+            ["queued", "coalesced", "written", "commits", "retries", "dropped"], 0
+        )
+
+    def set(self, collection, document_id, data):
+        key = (collection, str(document_id))
+        with self.lock:
+            self.start()
+            if self.pending.pop(key, None) is not None:
+                self.stats["coalesced"] += 1
+            self.pending[key] = data
+            self.stats["queued"] += 1
+            self.idle.clear()
+            self.has_pending.set()
+
+    def start(self):
+        # NOTE: A forked worker doesn't inherit the thread of its parent
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            threading.Thread(
+                target=self.run, name="firestore-mirror", daemon=True
+            ).start()
+
+    def run(self):
+        while True:
+            self.has_pending.wait()
+            time.sleep(self.window)
+            with self.lock:
+                writes, self.pending = list(self.pending.items()), {}
+                self.has_pending.clear()
+            for i in range(0, len(writes), MAX_BATCH_SIZE):
+                self.commit(writes[i : i + MAX_BATCH_SIZE])
+            with self.lock:
+                if not self.pending:
+                    self.idle.set()
+
+    def commit(self, writes):
+        db = get_firestore()
+        for attempt in range(self.max_retries + 1):
+            try:
+                batch = db.batch()
+                for (collection, document_id), data in writes:
+                    batch.set(db.collection(collection).document(document_id), data)
+                batch.commit()
+                self.stats["written"] += len(writes)
+                self.stats["commits"] += 1
+                return True
+            except Exception:
+                if attempt == self.max_retries:
+                    log.exception(
+                        f"Dropped {len(writes)} documents after {attempt} retries"
+                    )
+                    self.stats["dropped"] += len(writes)
+                    return False
+                self.stats["retries"] += 1
+                log.warning(f"Writing {len(writes)} documents to Firestore failed")
+                time.sleep(self.backoff * 2**attempt)
+
+    """
+    Wait until every queued write has been tried.
+
+    Args:
+        timeout (float, optional): The maximum number of seconds to wait.
+
+    Returns:
+        bool: Whether the queue is empty.
+    """
+
+    def flush(self, timeout=None):
+        return self.idle.wait(timeout)
+
+
+mirror = MirrorWriter(
+    window=settings.FIRESTORE_MIRROR_WINDOW,
+    max_retries=settings.FIRESTORE_MIRROR_MAX_RETRIES,
+    backoff=settings.FIRESTORE_MIRROR_BACKOFF,
+)
+atexit.register(mirror.flush, timeout=10)
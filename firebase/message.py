@@ -1,22 +1,102 @@
 from firebase_admin import messaging
 
+from firebase.backend import get_messaging
 from notification.types import MessageTarget
+from utils import get_logger
+
+log = get_logger(__name__)
+
+MAX_BATCH_SIZE = 500  # NOTE: The limit of FCM for a batch of messages
 
 
 def send(tokens, notification=None, data=None, **kwargs):
     message = messaging.MulticastMessage(
         notification=notification, data=data, tokens=tokens, **kwargs
     )
-    response = messaging.send_multicast(message)
+    response = get_messaging().send_multicast(message)
     print("{0} messages were sent successfully".format(response.success_count))
     return response
 
 
+"""
+Send messages to many devices, each with its own title and data, in batches.
+
+A batch which raises doesn't stop the next ones, its messages get a failed response
+with the error instead.
+
+Args:
+    notifications (list): The notifications, dicts with tokens, title, image and data.
+
+Returns:
+    list: A (token, SendResponse) pair per message, in the order they were built.
+"""
+
+
+def send_each(notifications):
+    tokens = []
+    messages = []
+    for notification in notifications:
+        for token in notification["tokens"]:
+            tokens.append(token)
+            messages.append(
+                messaging.Message(
+                    token=token,
+                    notification=messaging.Notification(
+                        title=notification["title"], image=notification["image"]
+                    ),
+                    android=messaging.AndroidConfig(
+                        data=notification["data"], priority="high"
+                    ),
+                )
+            )
+    responses = []
+    for i in range(0, len(messages), MAX_BATCH_SIZE):
+        batch = messages[i : i + MAX_BATCH_SIZE]
+        try:
+            responses.extend(get_messaging().send_each(batch).responses)
+        except Exception as e:
+            log.exception(f"Sending a batch of {len(batch)} messages failed")
+            responses.extend(messaging.SendResponse(None, e) for _ in batch)
+    log.info(
+        f"Sent {sum(response.success for response in responses)} of {len(responses)} "
+        "messages successfully"
+    )
+    return list(zip(tokens, responses))
+
+
+"""
+Check tokens with FCM without sending anything, in batches.
+
+Args:
+    tokens (list): The tokens.
+
+Returns:
+    list: A (token, SendResponse) pair per token.
+"""
+
+
+def validate_tokens(tokens):
+    responses = []
+    for i in range(0, len(tokens), MAX_BATCH_SIZE):
+        responses.extend(
+            get_messaging()
+            .send_each(
+                [
+                    messaging.Message(token=token)
+                    for token in tokens[i : i + MAX_BATCH_SIZE]
+                ],
+                dry_run=True,
+            )
+            .responses
+        )
+    return list(zip(tokens, responses))
+
+
 def send_to_topic(topic, notification=None, data=None, **kwargs):
     message = messaging.Message(
         notification=notification, data=data, topic=topic, **kwargs
     )
-    response = messaging.send(message)
+    response = get_messaging().send(message)
     print("Successfully sent message:", response)
     return response
 
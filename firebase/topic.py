@@ -1,13 +1,40 @@
-from firebase_admin import messaging
+from firebase.backend import get_messaging
+
+MAX_BATCH_SIZE = 1000  # NOTE: The limit of FCM for a topic management request
 
 
 def subscribe_to_topic(fcm_tokens, topic):
-    response = messaging.subscribe_to_topic(fcm_tokens, topic)
+    response = get_messaging().subscribe_to_topic(fcm_tokens, topic)
     print(response.success_count, "tokens were subscribed successfully")
     return response
 
 
 def unsubscribe_from_topic(fcm_tokens, topic):
-    response = messaging.unsubscribe_from_topic(fcm_tokens, topic)
+    response = get_messaging().unsubscribe_from_topic(fcm_tokens, topic)
     print(response.success_count, "tokens were unsubscribed successfully")
     return response
+
+
+"""
+Subscribe or unsubscribe many tokens to a topic, in batches of MAX_BATCH_SIZE tokens.
+
+Args:
+    fcm_tokens (list): The tokens.
+    topic (str): The topic.
+    subscribe (bool): Whether the tokens are subscribed instead of unsubscribed.
+
+Returns:
+    list: A (token, reason) pair per token which failed, e.g. NOT_FOUND.
+"""
+
+
+def manage_topic(fcm_tokens, topic, subscribe=True):
+    manage = subscribe_to_topic if subscribe else unsubscribe_from_topic
+    errors = []
+    for i in range(0, len(fcm_tokens), MAX_BATCH_SIZE):
+        batch = fcm_tokens[i : i + MAX_BATCH_SIZE]
+        errors.extend(
+            (batch[error.index], error.reason)
+            for error in manage(fcm_tokens=batch, topic=topic).errors
+        )
+    return errors
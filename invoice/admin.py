@@ -1,5 +1,4 @@
-from calendar import monthrange
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any
 
 from django.contrib import admin
@@ -150,6 +149,71 @@ class ProofImageAdmin(MyBaseModelAdmin):
         return False
 
 
+class BillingRunAdmin(MyBaseModelAdmin):
+    list_display = (
+        "id",
+        "payment",
+        "first_day_of_period",
+        "status",
+        "attempts",
+        "invoices_count",
+        "details_count",
+        "elapsed",
+        "finished_date",
+    )
+    list_filter = ("payment", "status")
+    readonly_fields = (
+        "payment",
+        "first_day_of_period",
+        "last_day_of_period",
+        "due_date",
+        "status",
+        "attempts",
+        "invoices_count",
+        "details_count",
+        "started_date",
+        "finished_date",
+        "elapsed",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class PaymentNotificationAdmin(MyBaseModelAdmin):
+    list_display = (
+        "id",
+        "wallet_type",
+        "transaction_id",
+        "reference_number",
+        "status",
+        "attempts",
+        "created_date",
+        "processed_date",
+    )
+    list_filter = ("wallet_type", "status")
+    search_fields = ("transaction_id", "reference_number")
+    readonly_fields = (
+        "wallet_type",
+        "transaction_id",
+        "reference_number",
+        "data",
+        "status",
+        "attempts",
+        "error",
+        "processed_date",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 class VnPayBillingAdmin(BillingAdmin, MyBaseModelAdmin):
     search_fields = (
         "id",
@@ -160,30 +224,50 @@ class VnPayBillingAdmin(BillingAdmin, MyBaseModelAdmin):
     )
 
 
-# TODO: Implement pick date
 class StatsRevenueAdmin(admin.ModelAdmin):
     change_list_template = "admin/stats/revenue_change_list.html"
 
     def changelist_view(self, request, extra_context=None):
+        # NOTE: Take the date range out of the query string, otherwise the change list
+        # treats it as an unknown lookup
+        request.GET = request.GET.copy()
+        first_month = self.parse_month(
+            request.GET.pop("from", [None])[0], date(datetime.now().year, 1, 1)
+        )
+        last_month = self.parse_month(
+            request.GET.pop("to", [None])[0], date(datetime.now().year, 12, 1)
+        )
         extra_context = extra_context or {}
         extra_context["title"] = "Thống kê doanh thu"
-        extra_context["chart_data"] = self.get_revenue_stats()
+        extra_context["first_month"] = first_month.strftime("%Y-%m")
+        extra_context["last_month"] = last_month.strftime("%Y-%m")
+        extra_context["chart_data"] = self.get_revenue_stats(first_month, last_month)
         return super().changelist_view(request, extra_context=extra_context)
 
-    def get_revenue_stats(self):
-        current_year = datetime.now().year
-        data = {}
+    def parse_month(self, value, default):
+        try:
+            return datetime.strptime(value, "%Y-%m").date()
+        except (TypeError, ValueError):
+            return default
 
-        for month in range(1, 13):
-            days_in_month = monthrange(current_year, month)[1]
-            start_date = datetime(current_year, month, 1)
-            end_date = datetime(current_year, month, days_in_month)
-
-            total_revenue = models.Invoice.objects.filter(
-                due_date__gte=start_date, due_date__lte=end_date
-            ).aggregate(total_revenue=Sum("total_amount"))["total_revenue"]
-
-            data[f"{month}-{current_year}"] = int(total_revenue) if total_revenue else 0
+    def get_revenue_stats(self, first_month, last_month):
+        data = {}
+        month = first_month
+        while month <= last_month:
+            data[f"{month.month}-{month.year}"] = 0
+            month = models.RevenueRollup.get_next_month(month)
+
+        revenues = (
+            models.RevenueRollup.objects.filter(
+                month__gte=first_month, month__lte=last_month
+            )
+            .values("month")
+            .annotate(total_revenue=Sum("amount"))
+            .order_by("month")
+        )
+        for revenue in revenues:
+            month = revenue["month"]
+            data[f"{month.month}-{month.year}"] = int(revenue["total_revenue"])
 
         return data
 
@@ -215,6 +299,8 @@ admin_site.register(models.InvoiceDetail, InvoiceDetailAdmin)
 admin_site.register(models.Payment, PaymentAdmin)
 admin_site.register(models.ProofImage, ProofImageAdmin)
 admin_site.register(models.OnlineWallet, OnlineWalletAdmin)
+admin_site.register(models.BillingRun, BillingRunAdmin)
+admin_site.register(models.PaymentNotification, PaymentNotificationAdmin)
 admin_site.register(models.StatsRevenue, StatsRevenueAdmin)
 
 admin_site.register(Billing, VnPayBillingAdmin)
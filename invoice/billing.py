@@ -0,0 +1,404 @@
+import math
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from app import settings
+from invoice.models import (
+    BillingRun,
+    BillingRunItem,
+    Invoice,
+    InvoiceDetail,
+    InvoiceSequence,
+    RevenueRollup,
+)
+from notification.manager import NotificationManager
+from notification.types import EntityType
+from service.models import MyBaseServiceStatus, ServiceRegistration
+from utils import get_logger
+
+log = get_logger(__name__)
+
+"""
+Calculate the billing period of a payment type.
+
+Args:
+    payment (str): The payment type of the service registrations (MONTHLY or DAILY).
+    now (datetime, optional): The moment the period is calculated for. Defaults to now.
+
+Returns:
+    tuple: The first day, the last day and the due date of the period.
+"""
+
+
+def get_billing_period(payment, now=None):
+    now = now or datetime.now()
+    if payment == ServiceRegistration.Payment.MONTHLY:
+        first_day_of_period = now.replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        first_day_of_next_period = (first_day_of_period + timedelta(days=32)).replace(
+            day=1
+        )
+        last_day_of_period = first_day_of_next_period - timedelta(days=1)
+        due_date = last_day_of_period + timedelta(days=15)
+    elif payment == ServiceRegistration.Payment.DAILY:
+        first_day_of_period = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        last_day_of_period = first_day_of_period
+        due_date = now + timedelta(days=7)
+    else:
+        raise ValueError(f"{payment} is not a billable payment type")
+    return first_day_of_period, last_day_of_period, due_date
+
+
+"""
+Generate the invoices of a billing period with a constant number of queries.
+
+The billable service registrations are read once, ordered by resident, together with
+the price of their service. Amounts are computed while streaming that result and the
+invoices and their details are written with bulk_create, one chunk of residents per
+transaction, which also adds the chunk to the monthly revenue rollup and notifies its
+residents with NotificationManager.create_notifications. When a billing run is given,
+every invoice is recorded in its ledger in the same transaction, which checkpoints the
+run: residents of the ledger and registrations which already have an invoice detail are
+skipped, so running the engine again for the same period only bills what is left.
+
+Args:
+    payment (str): The payment type to bill. Defaults to MONTHLY.
+    now (datetime, optional): The moment the run is done for. Defaults to now.
+    chunk_size (int): The number of residents written per transaction.
+    notify (bool): Whether residents are notified about their new invoices.
+    resident_range (tuple, optional): The first and last resident ID of a shard.
+    billing_run (BillingRun, optional): The ledger the invoices are recorded in.
+
+Returns:
+    None
+"""
+
+
+class BillingEngine:
+    DEFAULT_CHUNK_SIZE = 1000
+
+    def __init__(
+        self,
+        payment=ServiceRegistration.Payment.MONTHLY,
+        now=None,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        notify=True,
+        resident_range=None,
+        billing_run=None,
+    ):
+        self.payment = payment
+        self.now = now or datetime.now()
+        self.chunk_size = chunk_size
+        self.notify = notify
+        self.resident_range = resident_range
+        self.billing_run = billing_run
+        (
+            self.first_day_of_period,
+            self.last_day_of_period,
+            self.due_date,
+        ) = get_billing_period(payment, self.now)
+
+    def get_service_registrations(self):
+        service_registrations = ServiceRegistration.objects.filter(
+            Q(status=MyBaseServiceStatus.Status.APPROVED)
+            | Q(
+                status=MyBaseServiceStatus.Status.CANCELED,
+                previous_status=MyBaseServiceStatus.Status.APPROVED,
+            ),
+            created_date__gte=self.first_day_of_period,
+            created_date__lte=self.last_day_of_period,
+            payment=self.payment,
+            invoicedetail__isnull=True,
+        )
+        if self.resident_range:
+            first_resident_id, last_resident_id = self.resident_range
+            service_registrations = service_registrations.filter(
+                resident_id__gte=first_resident_id,
+                resident_id__lte=last_resident_id,
+            )
+        if self.billing_run:
+            service_registrations = service_registrations.exclude(
+                resident_id__in=BillingRunItem.objects.filter(
+                    billing_run=self.billing_run
+                ).values("resident_id")
+            )
+        return service_registrations
+
+    def get_resident_ranges(self, shards):
+        resident_ids = list(
+            self.get_service_registrations()
+            .order_by("resident_id")
+            .values_list("resident_id", flat=True)
+            .distinct()
+        )
+        shard_size = max(math.ceil(len(resident_ids) / shards), 1)
+        return [
+            (resident_ids[i], resident_ids[min(i + shard_size, len(resident_ids)) - 1])
+            for i in range(0, len(resident_ids), shard_size)
+        ]
+
+    def calculate_units_used(self, created_date):
+        return (self.now.date() - created_date.date()).days + 1
+
+    def iter_billable_residents(self):
+        rows = (
+            self.get_service_registrations()
+            .order_by("resident_id", "id")
+            .values_list(
+                "id", "resident_id", "created_date", "service_id", "service__price"
+            )
+            .iterator(chunk_size=self.chunk_size)
+        )
+        for resident_id, registrations in groupby(rows, key=lambda row: row[1]):
+            details = [
+                (
+                    registration_id,
+                    service_id,
+                    price * self.calculate_units_used(created_date),
+                )
+                for registration_id, _, created_date, service_id, price in registrations
+            ]
+            yield resident_id, details
+
+    def write_chunk(self, chunk):
+        invoice_ids = InvoiceSequence.allocate_invoice_ids(len(chunk))
+        invoices = []
+        invoice_details = []
+        revenues = Counter()
+        for invoice_id, (resident_id, details) in zip(invoice_ids, chunk):
+            invoice = Invoice(
+                id=invoice_id,
+                resident_id=resident_id,
+                due_date=self.due_date,
+                total_amount=sum(amount for _, _, amount in details),
+            )
+            invoices.append(invoice)
+            for registration_id, service_id, amount in details:
+                invoice_details.append(
+                    InvoiceDetail(
+                        invoice=invoice,
+                        service_registration_id=registration_id,
+                        amount=amount,
+                    )
+                )
+                revenues[service_id] += amount
+        with transaction.atomic():
+            Invoice.objects.bulk_create(invoices, batch_size=self.chunk_size)
+            InvoiceDetail.objects.bulk_create(
+                invoice_details, batch_size=self.chunk_size
+            )
+            for service_id, amount in revenues.items():
+                RevenueRollup.add(
+                    self.due_date, service_id, Invoice.InvoiceStatus.PENDING, amount
+                )
+            if self.billing_run:
+                BillingRunItem.objects.bulk_create(
+                    [
+                        BillingRunItem(
+                            billing_run=self.billing_run,
+                            resident_id=invoice.resident_id,
+                            invoice=invoice,
+                        )
+                        for invoice in invoices
+                    ],
+                    batch_size=self.chunk_size,
+                )
+                self.billing_run.checkpoint(len(invoices), len(invoice_details))
+            if self.notify:
+                NotificationManager.create_notifications(
+                    entities=invoices,
+                    entity_type=EntityType.INVOICE_CREATE,
+                    recipient_ids=[invoice.resident_id for invoice in invoices],
+                    image=settings.LOGO,
+                )
+        return invoices, len(invoice_details)
+
+    def run(self):
+        created_invoices = 0
+        created_details = 0
+        chunk = []
+        for billable_resident in self.iter_billable_residents():
+            chunk.append(billable_resident)
+            if len(chunk) < self.chunk_size:
+                continue
+            invoices, details_count = self.write_chunk(chunk)
+            created_invoices += len(invoices)
+            created_details += details_count
+            chunk = []
+        if chunk:
+            invoices, details_count = self.write_chunk(chunk)
+            created_invoices += len(invoices)
+            created_details += details_count
+        log.info(
+            f"Created {created_invoices} invoices and {created_details} invoice details for {self.payment}"
+        )
+        return created_invoices, created_details
+
+
+"""
+Bill one shard of residents from a worker process.
+
+Args:
+    payment (str): The payment type to bill.
+    now (datetime): The moment the run is done for, shared by every shard.
+    resident_range (tuple): The first and last resident ID of the shard.
+    chunk_size (int): The number of residents written per transaction.
+    notify (bool): Whether residents are notified about their new invoices.
+    billing_run (BillingRun): The ledger the invoices are recorded in.
+
+Returns:
+    dict: The report of the shard.
+"""
+
+
+def run_shard(payment, now, resident_range, chunk_size, notify, billing_run):
+    started_at = time.perf_counter()
+    created_invoices, created_details = BillingEngine(
+        payment=payment,
+        now=now,
+        chunk_size=chunk_size,
+        notify=notify,
+        resident_range=resident_range,
+        billing_run=billing_run,
+    ).run()
+    return {
+        "resident_range": resident_range,
+        "invoices": created_invoices,
+        "details": created_details,
+        "elapsed": time.perf_counter() - started_at,
+    }
+
+
+"""
+Bill a period with a pool of worker processes.
+
+The run is recorded in a BillingRun ledger keyed by payment type and period. A completed
+period is a no-op and an interrupted one resumes from its last checkpoint. Residents are
+split into contiguous resident ID ranges, one shard per worker, and every shard runs the
+billing engine with its own database connection. Shards never overlap and the ledger
+allows one invoice per resident and run, so a failed shard is simply run again up to
+`retries` times without producing duplicate invoices.
+
+Args:
+    payment (str): The payment type to bill. Defaults to MONTHLY.
+    workers (int): The number of worker processes. Defaults to 1.
+    now (datetime, optional): The moment the run is done for. Defaults to now.
+    chunk_size (int): The number of residents written per transaction.
+    notify (bool): Whether residents are notified about their new invoices.
+    retries (int): How many times a failed shard is run again. Defaults to 1.
+
+Returns:
+    dict: The report of the run merged from the reports of its shards.
+"""
+
+
+def run_billing(
+    payment=ServiceRegistration.Payment.MONTHLY,
+    workers=1,
+    now=None,
+    chunk_size=BillingEngine.DEFAULT_CHUNK_SIZE,
+    notify=True,
+    retries=1,
+):
+    started_at = time.perf_counter()
+    engine = BillingEngine(payment=payment, now=now, chunk_size=chunk_size)
+    billing_run, _ = BillingRun.objects.get_or_create(
+        payment=payment,
+        first_day_of_period=engine.first_day_of_period.date(),
+        defaults={
+            "last_day_of_period": engine.last_day_of_period.date(),
+            "due_date": engine.due_date.date(),
+        },
+    )
+    report = {
+        "billing_run": billing_run,
+        "payment": payment,
+        "first_day_of_period": engine.first_day_of_period,
+        "last_day_of_period": engine.last_day_of_period,
+        "due_date": engine.due_date,
+        "shards": [],
+        "invoices": 0,
+        "details": 0,
+        "elapsed": 0,
+    }
+    if billing_run.is_completed:
+        log.info(f"{billing_run} has been billed already")
+        return report
+
+    billing_run.start()
+    try:
+        shards = run_shards(engine, billing_run, workers, chunk_size, notify, retries)
+    except Exception:
+        billing_run.fail(time.perf_counter() - started_at)
+        raise
+    billing_run.complete(time.perf_counter() - started_at)
+    report.update(
+        shards=shards,
+        invoices=sum(shard["invoices"] for shard in shards),
+        details=sum(shard["details"] for shard in shards),
+        elapsed=billing_run.elapsed,
+    )
+    log.info(
+        f"{billing_run} billed {report['invoices']} invoices in {report['elapsed']:.2f}s"
+    )
+    return report
+
+
+def run_shards(engine, billing_run, workers, chunk_size, notify, retries):
+    payment = engine.payment
+    engine.billing_run = billing_run
+    resident_ranges = engine.get_resident_ranges(workers)
+    shards = []
+    if workers <= 1:
+        shards = [
+            run_shard(
+                payment, engine.now, resident_range, chunk_size, notify, billing_run
+            )
+            for resident_range in resident_ranges
+        ]
+    elif resident_ranges:
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            pending = {
+                resident_range: executor.submit(
+                    run_shard,
+                    payment,
+                    engine.now,
+                    resident_range,
+                    chunk_size,
+                    notify,
+                    billing_run,
+                )
+                for resident_range in resident_ranges
+            }
+            attempts = dict.fromkeys(resident_ranges, 0)
+            while pending:
+                resident_range, future = pending.popitem()
+                try:
+                    shards.append(future.result())
+                except Exception:
+                    if attempts[resident_range] >= retries:
+                        raise
+                    attempts[resident_range] += 1
+                    log.exception(f"Shard {resident_range} failed, retrying")
+                    pending[resident_range] = executor.submit(
+                        run_shard,
+                        payment,
+                        engine.now,
+                        resident_range,
+                        chunk_size,
+                        notify,
+                        billing_run,
+                    )
+    shards.sort(key=lambda shard: shard["resident_range"])
+    return shards
@@ -0,0 +1,106 @@
+from django.db import transaction
+
+from invoice import momo, vnpay
+from invoice.models import OnlineWallet, PaymentNotification
+from utils import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+"""
+Apply a stored gateway callback to its online wallet payment.
+
+The online wallet is locked first, so a callback and its retries can't pay the same
+payment twice, and a payment which is already paid is left as it is.
+
+Args:
+    notification (PaymentNotification): The callback to apply.
+
+Returns:
+    str: The reason the callback can't be applied, None if it is applied.
+"""
+
+
+def apply_payment_notification(notification):
+    online_wallet = (
+        OnlineWallet.objects.select_for_update()
+        .select_related("payment__invoice")
+        .filter(
+            wallet_type=notification.wallet_type,
+            reference_number=notification.reference_number,
+        )
+        .first()
+    )
+    if not online_wallet:
+        return "Not found online wallet"
+    if online_wallet.payment.is_success:
+        return None
+
+    data = notification.data
+    if notification.wallet_type == OnlineWallet.WalletType.MOMO:
+        if data.get("resultCode") != momo.SUCCESS_CODE:
+            return f"Transaction is not success:::{data.get('resultCode')}"
+        if online_wallet.payment.total_amount != int(data["amount"]):
+            return "Amounts are not matching"
+        transaction_id = notification.transaction_id
+    else:
+        result = vnpay.confirm_payment(data)
+        if result["RspCode"] != vnpay.SUCCESS_CODE:
+            return f"Transaction is not success:::{result}"
+        transaction_id = data["vnp_TransactionNo"]
+
+    online_wallet.pay(transaction_id=transaction_id)
+    return None
+
+
+def process_payment_notification(notification):
+    try:
+        with transaction.atomic():
+            error = apply_payment_notification(notification)
+    except Exception as e:
+        log.exception(f"Processing payment notification failed:::{notification}")
+        notification.retry(str(e))
+        return False
+    if error:
+        log.error(f"Payment notification failed:::{notification}:::{error}")
+        notification.fail(error)
+        return False
+    log.info(f"Processed payment notification successfully:::{notification}")
+    notification.process()
+    return True
+
+
+"""
+Process the pending gateway callbacks in batches.
+
+Every batch is locked with select_for_update(skip_locked=True), so several workers can
+run at the same time without applying the same callback twice. A callback which raises
+is kept pending until it has been tried PaymentNotification.MAX_ATTEMPTS times.
+
+Args:
+    batch_size (int): The number of callbacks locked per transaction.
+
+Returns:
+    tuple: The number of processed and failed callbacks.
+"""
+
+
+def process_payment_notifications(batch_size=DEFAULT_BATCH_SIZE):
+    processed = failed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            notifications = list(
+                PaymentNotification.objects.select_for_update(skip_locked=True)
+                .filter(status=PaymentNotification.Status.PENDING, id__gt=last_id)
+                .order_by("id")[:batch_size]
+            )
+            if not notifications:
+                return processed, failed
+            for notification in notifications:
+                if process_payment_notification(notification):
+                    processed += 1
+                else:
+                    failed += 1
+        last_id = notifications[-1].id
@@ -0,0 +1,110 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from invoice.billing import BillingEngine, get_billing_period, run_billing
+from invoice.models import BillingRun
+from service.models import MyBaseServiceStatus, Service, ServiceRegistration
+from user.models import PersonalInformation, User
+
+"""
+A management command to benchmark the billing engine over a synthetic dataset.
+
+The residents, their service registrations and a staff who sends their notifications are
+created inside a transaction which is rolled back at the end, together with a fresh
+billing run of the current month, so the command can be run against any database.
+Residents are notified like in the cron job.
+
+Args:
+    --residents (int): The number of synthetic residents. Defaults to 20000.
+    --chunk-size (int): The number of residents written per transaction.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Benchmark monthly invoice generation over a synthetic dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--residents", type=int, default=20000)
+        parser.add_argument(
+            "--chunk-size", type=int, default=BillingEngine.DEFAULT_CHUNK_SIZE
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        residents = options["residents"]
+        self.stdout.write(self.style.HTTP_INFO(f"Creating {residents} residents..."))
+        self.create_dataset(residents)
+
+        first_day_of_period, _, _ = get_billing_period(
+            ServiceRegistration.Payment.MONTHLY
+        )
+        BillingRun.objects.filter(
+            payment=ServiceRegistration.Payment.MONTHLY,
+            first_day_of_period=first_day_of_period.date(),
+        ).delete()
+        with CaptureQueriesContext(connection) as queries:
+            report = run_billing(chunk_size=options["chunk_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['invoices']} invoices and {report['details']} details "
+                f"with {len(queries)} queries in {report['elapsed']:.2f}s"
+            )
+        )
+        transaction.set_rollback(True)
+
+    def create_dataset(self, residents):
+        services = [
+            Service.ServiceType.MANAGING,
+            Service.ServiceType.MOTOR_PARKING_CARD,
+        ]
+        for service_id in services:
+            Service.objects.get_or_create(
+                id=service_id, defaults={"name": service_id, "price": 5000}
+            )
+        # NOTE: The sender of the invoice notifications
+        User.objects.create(
+            resident_id="BSTAFF",
+            personal_information=PersonalInformation.objects.create(
+                citizen_id="800000000000",
+                full_name="Benchmark staff",
+                phone_number="0800000000",
+            ),
+            is_staff=True,
+        )
+        personal_informations = PersonalInformation.objects.bulk_create(
+            [
+                PersonalInformation(
+                    citizen_id=f"9{i:011d}",
+                    full_name=f"Benchmark {i}",
+                    phone_number=f"09{i:08d}",
+                )
+                for i in range(residents)
+            ],
+            batch_size=1000,
+        )
+        users = User.objects.bulk_create(
+            [
+                User(resident_id=f"B{i:05d}", personal_information=personal_information)
+                for i, personal_information in enumerate(personal_informations)
+            ],
+            batch_size=1000,
+        )
+        ServiceRegistration.objects.bulk_create(
+            [
+                ServiceRegistration(
+                    service_id=service_id,
+                    personal_information_id=user.personal_information_id,
+                    resident=user,
+                    status=MyBaseServiceStatus.Status.APPROVED,
+                    payment=ServiceRegistration.Payment.MONTHLY,
+                )
+                for user in users
+                for service_id in services
+            ],
+            batch_size=1000,
+        )
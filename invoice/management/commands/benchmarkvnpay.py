@@ -0,0 +1,130 @@
+import statistics
+import time
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from vnpay.utils import VnPay
+
+from app import settings
+from invoice import vnpay
+from user.models import User
+from utils import token
+
+"""
+A management command to compare the latency of the in-process VNPay flow with the old
+HTTP loopback into the django-vnpay endpoints.
+
+The in-process billings are created inside a transaction which is rolled back at the end.
+The loopback is only measured when an authorization header is given, because it needs
+a running server at settings.HOST and it writes real billings.
+
+Args:
+    --iterations (int): The number of payments to time. Defaults to 100.
+    --authorization (str): The authorization header of a resident, e.g. "Bearer <token>".
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Compare the latency of in-process VNPay payments with the HTTP loopback"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100)
+        parser.add_argument("--authorization")
+
+    def handle(self, *args, **options):
+        user = User.objects.first()
+        if not user:
+            raise CommandError("There is no user to pay with")
+        iterations = options["iterations"]
+
+        with transaction.atomic():
+            payment_url_timings, return_timings = self.time_in_process(user, iterations)
+            transaction.set_rollback(True)
+        self.report("In-process payment url", payment_url_timings)
+        self.report("In-process return", return_timings)
+
+        if options["authorization"]:
+            payment_url_timings, return_timings = self.time_loopback(
+                options["authorization"], iterations
+            )
+            self.report("Loopback payment url", payment_url_timings)
+            self.report("Loopback return", return_timings)
+
+    def time_in_process(self, user, iterations):
+        payment_url_timings = []
+        return_timings = []
+        for _ in range(iterations):
+            request = RequestFactory().post("/")
+            request.user = user
+            started_at = time.perf_counter()
+            _, payment_url = vnpay.create_payment_url(request, 100000)
+            payment_url_timings.append(time.perf_counter() - started_at)
+
+            params = self.get_return_params(payment_url)
+            started_at = time.perf_counter()
+            vnpay.confirm_payment(params)
+            return_timings.append(time.perf_counter() - started_at)
+        return payment_url_timings, return_timings
+
+    def time_loopback(self, authorization, iterations):
+        payment_url_timings = []
+        return_timings = []
+        for _ in range(iterations):
+            started_at = time.perf_counter()
+            r = requests.post(
+                url=f"{settings.HOST}/vnpay/payment_url/?token={token.generate_token(settings.SECRET_KEY)}",
+                headers={"AUTHORIZATION": authorization},
+                data={"amount": 100000},
+            )
+            payment_url_timings.append(time.perf_counter() - started_at)
+            if not r.ok:
+                raise CommandError(f"Loopback payment url failed:::{r.text}")
+
+            params = self.get_return_params(r.json()["payment_url"])
+            started_at = time.perf_counter()
+            requests.get(
+                url=f"{settings.HOST}/vnpay/payment_ipn/?{urlencode(params)}&token={token.generate_token(settings.SECRET_KEY)}",
+            )
+            return_timings.append(time.perf_counter() - started_at)
+        return payment_url_timings, return_timings
+
+    """
+    Build the parameters VNPay would send back after a successful payment.
+
+    Args:
+        payment_url (str): The payment URL of the billing.
+
+    Returns:
+        dict: The signed return parameters.
+    """
+
+    def get_return_params(self, payment_url):
+        payment_params = dict(parse_qsl(urlparse(payment_url).query))
+        params = {
+            "vnp_TmnCode": payment_params["vnp_TmnCode"],
+            "vnp_Amount": payment_params["vnp_Amount"],
+            "vnp_BankCode": "NCB",
+            "vnp_OrderInfo": payment_params["vnp_OrderInfo"],
+            "vnp_TransactionNo": payment_params["vnp_TxnRef"][-8:],
+            "vnp_ResponseCode": vnpay.SUCCESS_CODE,
+            "vnp_TransactionStatus": vnpay.SUCCESS_CODE,
+            "vnp_TxnRef": payment_params["vnp_TxnRef"],
+        }
+        _, params["vnp_SecureHash"] = VnPay().get_query_string_and_hash(params)
+        return params
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{name}: median {statistics.median(timings) * 1000:.2f}ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.2f}ms "
+                f"over {len(timings)} requests"
+            )
+        )
@@ -1,66 +1,59 @@
-from datetime import datetime, timedelta
-
 from django.core.management.base import BaseCommand
 
-from invoice.models import Invoice, InvoiceDetail
-from service.models import MyBaseServiceStatus, ServiceRegistration
+from invoice.billing import BillingEngine, run_billing
+from service.models import ServiceRegistration
+
+"""
+A management command to create the invoices of the current billing period.
+
+Args:
+    --payment (str): The payment type to bill. Defaults to MONTHLY.
+    --workers (int): The number of worker processes, each billing one shard of residents.
+    --chunk-size (int): The number of residents written per transaction.
+    --retries (int): How many times a failed shard is run again.
+
+Returns:
+    None
+"""
 
 
 class Command(BaseCommand):
     help = "Create invoices for residents every month"
 
-    def handle(self, *args, **kwargs):
-        now = datetime.now()
-        first_day_of_month = now.replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--payment",
+            choices=[
+                ServiceRegistration.Payment.MONTHLY,
+                ServiceRegistration.Payment.DAILY,
+            ],
+            default=ServiceRegistration.Payment.MONTHLY,
         )
-        last_day_of_month = first_day_of_month.replace(
-            month=first_day_of_month.month % 12 + 1, day=1
-        ) - timedelta(days=1)
-
-        service_registrations = ServiceRegistration.objects.filter(
-            status=MyBaseServiceStatus.Status.APPROVED,
-            created_date__gte=first_day_of_month,
-            created_date__lte=last_day_of_month,
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument(
+            "--chunk-size", type=int, default=BillingEngine.DEFAULT_CHUNK_SIZE
         )
-
-        residents = service_registrations.values_list("resident", flat=True).distinct()
-
-        for resident in residents:
-            invoice = Invoice.objects.create(
-                resident_id=resident, due_date=last_day_of_month + timedelta(days=15)
+        parser.add_argument("--retries", type=int, default=1)
+
+    def handle(self, *args, **options):
+        report = run_billing(
+            payment=options["payment"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            retries=options["retries"],
+        )
+        for shard in report["shards"]:
+            first_resident_id, last_resident_id = shard["resident_range"]
+            self.stdout.write(
+                f"Shard {first_resident_id}..{last_resident_id}: "
+                f"{shard['invoices']} invoices, {shard['details']} details "
+                f"in {shard['elapsed']:.2f}s"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['invoices']} invoices and {report['details']} details "
+                f"for {report['payment']} {report['first_day_of_period']:%d/%m/%Y} - "
+                f"{report['last_day_of_period']:%d/%m/%Y} "
+                f"in {report['elapsed']:.2f}s"
             )
-
-            total_amount = 0
-            for service_registration in service_registrations.filter(
-                resident_id=resident
-            ):
-                service = service_registration.service
-                price_per_day = service.price / last_day_of_month.day
-                days_used = self.calculate_days_used(service_registration)
-
-                detail_amount = price_per_day * days_used
-
-                total_amount += detail_amount
-
-                InvoiceDetail.objects.create(
-                    invoice=invoice,
-                    service_registration=service_registration,
-                    amount=detail_amount,
-                )
-
-            invoice.total_amount = total_amount
-            invoice.save()
-
-    def calculate_days_used(self, registration):
-        today = datetime.now()
-        last_day_of_month = today.replace(
-            day=1, month=today.month % 12 + 1
-        ) - timedelta(days=1)
-        last_day_of_month_date = last_day_of_month.date()
-        created_datetime = datetime.combine(
-            registration.created_date, datetime.min.time()
         )
-        days_used = (last_day_of_month_date - created_datetime.date()).days + 1
-        days_used = min(days_used, last_day_of_month.day)
-        return days_used
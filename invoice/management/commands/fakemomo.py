@@ -0,0 +1,120 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+"""
+A local fake of the MoMo create payment endpoint.
+
+Every request waits for latency seconds, then fails with a 503 with the probability
+error_rate, or hangs for hang seconds with the probability hang_rate to trip the read
+timeout of the client. Otherwise it answers like MoMo does for a created payment.
+
+Args:
+    port (int): The port to listen on, 0 picks a free one.
+    latency (float): The number of seconds every response is delayed.
+    error_rate (float): The probability of a 503 response.
+    hang_rate (float): The probability of a hanging response.
+    hang (float): The number of seconds a hanging response waits.
+"""
+
+
+class FakeMomoServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, port=0, latency=0, error_rate=0, hang_rate=0, hang=30):
+        super().__init__(("127.0.0.1", port), FakeMomoHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_port}/v2/gateway/api/create"
+
+
+class FakeMomoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+        if random.random() < self.server.hang_rate:
+            time.sleep(self.server.hang)
+        if random.random() < self.server.error_rate:
+            self.respond(503, {"resultCode": 99, "message": "Service unavailable"})
+            return
+        pay_url = f"http://127.0.0.1:{self.server.server_port}/pay/{data['orderId']}"
+        self.respond(
+            200,
+            {
+                "partnerCode": data["partnerCode"],
+                "requestId": data["requestId"],
+                "orderId": data["orderId"],
+                "amount": int(data["amount"]),
+                "responseTime": int(time.time() * 1000),
+                "message": "Thành công.",
+                "resultCode": 0,
+                "payUrl": pay_url,
+                "deeplink": pay_url,
+                "qrCodeUrl": pay_url,
+            },
+        )
+
+    def respond(self, status, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            # NOTE: The client gave up on a hanging response
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+"""
+A management command to run a local fake MoMo server.
+
+Point MOMO_ENDPOINT to the printed endpoint to develop and test payments without MoMo.
+
+Args:
+    --port (int): Defaults to 8001.
+    --latency (float): The number of seconds every response is delayed.
+    --error-rate (float): The probability of a 503 response.
+    --hang-rate (float): The probability of a hanging response.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Run a local fake MoMo server"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument("--latency", type=float, default=0)
+        parser.add_argument("--error-rate", type=float, default=0)
+        parser.add_argument("--hang-rate", type=float, default=0)
+
+    def handle(self, *args, **options):
+        server = FakeMomoServer(
+            port=options["port"],
+            latency=options["latency"],
+            error_rate=options["error_rate"],
+            hang_rate=options["hang_rate"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Fake MoMo at {server.endpoint}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from invoice.ipn import DEFAULT_BATCH_SIZE, process_payment_notifications
+
+"""
+A management command to apply the pending MoMo and VNPay callbacks.
+
+Args:
+    --batch-size (int): The number of callbacks locked per transaction.
+    --forever (bool): Keep polling for new callbacks instead of exiting.
+    --interval (float): The number of seconds between polls. Defaults to 1.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Apply the pending payment notifications of the online wallets"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--forever", action="store_true")
+        parser.add_argument("--interval", type=float, default=1)
+
+    def handle(self, *args, **options):
+        while True:
+            processed, failed = process_payment_notifications(
+                batch_size=options["batch_size"]
+            )
+            if processed or failed or not options["forever"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Processed {processed} payment notifications, {failed} failed"
+                    )
+                )
+            if not options["forever"]:
+                return
+            time.sleep(options["interval"])
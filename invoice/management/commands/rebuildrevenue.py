@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.models import RevenueRollup
+
+"""
+A management command to rebuild the monthly revenue rollup from the invoice details.
+
+Args:
+    --from (str, optional): The first month to rebuild, formatted as YYYY-MM.
+    --to (str, optional): The last month to rebuild, formatted as YYYY-MM.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly revenue rollup for backfills"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first_month")
+        parser.add_argument("--to", dest="last_month")
+
+    def handle(self, *args, **options):
+        first_month = self.parse_month(options["first_month"])
+        last_month = self.parse_month(options["last_month"])
+        rows = RevenueRollup.rebuild(first_month=first_month, last_month=last_month)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} revenue rollup rows"))
+
+    def parse_month(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m").date()
+        except ValueError as e:
+            raise CommandError(f"{value} is not a month formatted as YYYY-MM") from e
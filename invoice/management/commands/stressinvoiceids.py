@@ -0,0 +1,90 @@
+import multiprocessing
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from invoice.models import InvoiceSequence
+
+"""
+Reserve blocks of invoice IDs from a worker process.
+
+Args:
+    allocations (int): The number of blocks to reserve.
+    max_block_size (int): The maximum size of a block.
+
+Returns:
+    list: All the invoice IDs reserved by the worker.
+"""
+
+
+def allocate_blocks(allocations, max_block_size):
+    invoice_ids = []
+    for _ in range(allocations):
+        invoice_ids.extend(
+            InvoiceSequence.allocate_invoice_ids(random.randint(1, max_block_size))
+        )
+    connections.close_all()
+    return invoice_ids
+
+
+"""
+A management command to stress test the invoice ID sequence with concurrent allocators.
+
+Every worker is a separate process with its own database connection. The reserved IDs
+are burnt, so run it against a disposable database.
+
+Args:
+    --workers (int): The number of concurrent allocator processes. Defaults to 16.
+    --allocations (int): The number of blocks each worker reserves. Defaults to 200.
+    --max-block-size (int): The maximum size of a block. Defaults to 50.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Stress test the invoice ID sequence with many concurrent allocators"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--allocations", type=int, default=200)
+        parser.add_argument("--max-block-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        connections.close_all()
+        started_at = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    allocate_blocks, options["allocations"], options["max_block_size"]
+                )
+                for _ in range(workers)
+            ]
+            invoice_ids = [
+                invoice_id for future in futures for invoice_id in future.result()
+            ]
+        elapsed = time.perf_counter() - started_at
+
+        duplicates = [
+            invoice_id
+            for invoice_id, count in Counter(invoice_ids).items()
+            if count > 1
+        ]
+        if duplicates:
+            raise CommandError(
+                f"{len(duplicates)} invoice IDs were allocated more than once, e.g. {duplicates[:5]}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{workers} workers allocated {len(invoice_ids)} unique invoice IDs "
+                f"in {elapsed:.2f}s"
+            )
+        )
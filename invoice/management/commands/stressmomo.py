@@ -0,0 +1,98 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from invoice.management.commands.fakemomo import FakeMomoServer
+from invoice.momo import CircuitBreaker, MomoClient, MomoError, MomoUnavailable
+
+"""
+A management command to load the MoMo client and print its metrics.
+
+By default the client talks to a local fake MoMo server started in a background thread,
+with the given latency, error and hang rates, so the timeouts, retries and the circuit
+breaker can be watched without MoMo.
+
+Args:
+    --requests (int): The number of payments to create. Defaults to 500.
+    --concurrency (int): The number of concurrent callers. Defaults to 20.
+    --endpoint (str): A MoMo endpoint to use instead of the fake server.
+    --latency (float): The delay of the fake server.
+    --error-rate (float): The probability of a 503 from the fake server.
+    --hang-rate (float): The probability of a hanging response from the fake server.
+    --read-timeout (float): The read timeout of the client. Defaults to 1.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Load the MoMo client against a fake MoMo server and print its metrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--endpoint")
+        parser.add_argument("--latency", type=float, default=0.01)
+        parser.add_argument("--error-rate", type=float, default=0)
+        parser.add_argument("--hang-rate", type=float, default=0)
+        parser.add_argument("--read-timeout", type=float, default=1)
+
+    def handle(self, *args, **options):
+        server = None
+        endpoint = options["endpoint"]
+        if not endpoint:
+            server = FakeMomoServer(
+                latency=options["latency"],
+                error_rate=options["error_rate"],
+                hang_rate=options["hang_rate"],
+                hang=options["read_timeout"] * 2,
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            endpoint = server.endpoint
+
+        client = MomoClient(
+            endpoint=endpoint,
+            read_timeout=options["read_timeout"],
+            backoff=0.05,
+            pool_size=options["concurrency"],
+            circuit_breaker=CircuitBreaker(failure_threshold=5, reset_timeout=1),
+        )
+        results = {"created": 0, "failed": 0, "unavailable": 0}
+        lock = threading.Lock()
+
+        def create_payment(i):
+            request_id = str(uuid.uuid4())
+            try:
+                client.create_payment(
+                    request_id, f"stress-{i}-{request_id}", "Stress test", 10000
+                )
+                result = "created"
+            except MomoUnavailable:
+                result = "unavailable"
+            except MomoError:
+                result = "failed"
+            with lock:
+                results[result] += 1
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            list(executor.map(create_payment, range(options["requests"])))
+        elapsed = time.perf_counter() - started_at
+        if server:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{results['created']} created, {results['failed']} failed, "
+                f"{results['unavailable']} short-circuited in {elapsed:.2f}s"
+            )
+        )
+        for name, value in client.metrics().items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            self.stdout.write(f"{name}: {value}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from invoice.overdue import DEFAULT_CHUNK_SIZE, sweep_overdue_invoices
+
+"""
+A management command to mark the pending invoices past their due date as overdue.
+
+Args:
+    --chunk-size (int): The number of invoices updated per transaction.
+    --no-notify (bool): Don't notify the residents.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Mark the pending invoices past their due date as overdue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--no-notify", action="store_true")
+
+    def handle(self, *args, **options):
+        swept = sweep_overdue_invoices(
+            chunk_size=options["chunk_size"], notify=not options["no_notify"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Marked {swept} invoices as overdue"))
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+def seed_invoice_sequence(apps, schema_editor):
+    Invoice = apps.get_model("invoice", "Invoice")
+    InvoiceSequence = apps.get_model("invoice", "InvoiceSequence")
+    latest_id = Invoice.objects.order_by("-id").values_list("id", flat=True).first()
+    InvoiceSequence.objects.create(
+        name="INVOICE_ID", last_value=int(latest_id[3:]) if latest_id else 0
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("invoice", "0018_proofimage_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceSequence",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=30,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Tên",
+                    ),
+                ),
+                (
+                    "last_value",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Giá trị cuối cùng"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Bộ đếm mã hóa đơn",
+                "verbose_name_plural": "Bộ đếm mã hóa đơn",
+            },
+        ),
+        migrations.RunPython(seed_invoice_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,159 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("invoice", "0019_invoicesequence"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BillingRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_date",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo"),
+                ),
+                (
+                    "updated_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật"),
+                ),
+                (
+                    "payment",
+                    models.CharField(
+                        choices=[
+                            ("FREE", "Miễn phí"),
+                            ("DAILY", "Theo ngày"),
+                            ("MONTHLY", "Theo tháng"),
+                            ("IMMEDIATELY", "Ngay lúc đăng ký"),
+                        ],
+                        max_length=20,
+                        verbose_name="Hình thức thanh toán",
+                    ),
+                ),
+                ("first_day_of_period", models.DateField(verbose_name="Ngày đầu kỳ")),
+                ("last_day_of_period", models.DateField(verbose_name="Ngày cuối kỳ")),
+                ("due_date", models.DateField(verbose_name="Ngày đáo hạn")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("RUNNING", "Đang chạy"),
+                            ("COMPLETED", "Hoàn tất"),
+                            ("FAILED", "Thất bại"),
+                        ],
+                        default="RUNNING",
+                        max_length=20,
+                        verbose_name="Trạng thái",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Số lần chạy"),
+                ),
+                (
+                    "invoices_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Số hóa đơn"),
+                ),
+                (
+                    "details_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Số chi tiết hóa đơn"
+                    ),
+                ),
+                (
+                    "started_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Bắt đầu lúc"
+                    ),
+                ),
+                (
+                    "finished_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Kết thúc lúc"
+                    ),
+                ),
+                (
+                    "elapsed",
+                    models.FloatField(default=0, verbose_name="Thời gian chạy (giây)"),
+                ),
+            ],
+            options={
+                "verbose_name": "Đợt lập hóa đơn",
+                "verbose_name_plural": "Đợt lập hóa đơn",
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="BillingRunItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Hóa đơn trong đợt",
+                "verbose_name_plural": "Hóa đơn trong đợt",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="billingrun",
+            constraint=models.UniqueConstraint(
+                fields=("payment", "first_day_of_period"),
+                name="unique_billing_run_period",
+            ),
+        ),
+        migrations.AddField(
+            model_name="billingrunitem",
+            name="billing_run",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="invoice.billingrun",
+                verbose_name="Đợt lập hóa đơn",
+            ),
+        ),
+        migrations.AddField(
+            model_name="billingrunitem",
+            name="invoice",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="invoice.invoice",
+                verbose_name="Hóa đơn",
+            ),
+        ),
+        migrations.AddField(
+            model_name="billingrunitem",
+            name="resident",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Cư dân",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="billingrunitem",
+            constraint=models.UniqueConstraint(
+                fields=("billing_run", "resident"), name="unique_billing_run_resident"
+            ),
+        ),
+    ]
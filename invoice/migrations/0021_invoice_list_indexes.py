@@ -0,0 +1,29 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("invoice", "0020_billingrun"),
+        ("service", "0008_remove_vehicle_deleted"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="invoice",
+            index=models.Index(
+                fields=["resident", "-created_date", "-id"],
+                name="invoice_inv_residen_213c24_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="invoicedetail",
+            index=models.Index(
+                fields=["invoice", "service_registration"],
+                name="invoice_inv_invoice_afaa70_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_revenue_rollup(apps, schema_editor):
+    InvoiceDetail = apps.get_model("invoice", "InvoiceDetail")
+    RevenueRollup = apps.get_model("invoice", "RevenueRollup")
+    rows = (
+        InvoiceDetail.objects.annotate(month=TruncMonth("invoice__due_date"))
+        .values("month", "service_registration__service_id", "invoice__status")
+        .annotate(amount=Sum("amount"))
+        .order_by()
+    )
+    RevenueRollup.objects.bulk_create(
+        [
+            RevenueRollup(
+                month=row["month"],
+                service_id=row["service_registration__service_id"],
+                status=row["invoice__status"],
+                amount=row["amount"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("invoice", "0021_invoice_list_indexes"),
+        ("service", "0008_remove_vehicle_deleted"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevenueRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(verbose_name="Tháng")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Chờ thanh toán"),
+                            ("PAID", "Đã thanh toán"),
+                            ("OVERDUE", "Quá hạn"),
+                            ("WAITING_FOR_APPROVAL", "Chờ phê duyệt"),
+                        ],
+                        max_length=30,
+                        verbose_name="Trạng thái thanh toán",
+                    ),
+                ),
+                ("amount", models.BigIntegerField(default=0, verbose_name="Doanh thu")),
+                (
+                    "service",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="service.service",
+                        verbose_name="Dịch vụ",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Doanh thu theo tháng",
+                "verbose_name_plural": "Doanh thu theo tháng",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="revenuerollup",
+            constraint=models.UniqueConstraint(
+                fields=("month", "service", "status"), name="unique_revenue_rollup"
+            ),
+        ),
+        migrations.RunPython(backfill_revenue_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("invoice", "0022_revenuerollup"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="onlinewallet",
+            name="reference_number",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=100,
+                null=True,
+                verbose_name="Mã tham chiếu",
+            ),
+        ),
+        migrations.CreateModel(
+            name="PaymentNotification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_date",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo"),
+                ),
+                (
+                    "updated_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật"),
+                ),
+                (
+                    "wallet_type",
+                    models.CharField(
+                        choices=[("VNPAY", "VnPay"), ("MOMO", "Momo")],
+                        max_length=10,
+                        verbose_name="Loại ví",
+                    ),
+                ),
+                (
+                    "transaction_id",
+                    models.CharField(max_length=255, verbose_name="Mã giao dịch"),
+                ),
+                (
+                    "reference_number",
+                    models.CharField(max_length=100, verbose_name="Mã tham chiếu"),
+                ),
+                ("data", models.JSONField(verbose_name="Dữ liệu")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Đang chờ xử lý"),
+                            ("PROCESSED", "Đã xử lý"),
+                            ("FAILED", "Thất bại"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="Trạng thái",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Số lần xử lý"),
+                ),
+                ("error", models.TextField(blank=True, null=True, verbose_name="Lỗi")),
+                (
+                    "processed_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Xử lý lúc"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Thông báo thanh toán (IPN)",
+                "verbose_name_plural": "Thông báo thanh toán (IPN)",
+                "abstract": False,
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="invoice_pay_status_4ed53d_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="paymentnotification",
+            constraint=models.UniqueConstraint(
+                fields=("wallet_type", "transaction_id"),
+                name="unique_payment_notification",
+            ),
+        ),
+    ]
@@ -1,14 +1,19 @@
+from datetime import datetime
+
 from cloudinary.models import CloudinaryField
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from django.db.models.base import post_save
-from django.db.models.signals import pre_save
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from app.models import MyBaseModel, MyBaseModelWithDeletedState
-from service.models import ServiceRegistration
+from service.models import Service, ServiceRegistration
 
 
 class Invoice(MyBaseModelWithDeletedState):
@@ -41,6 +46,16 @@ class Invoice(MyBaseModelWithDeletedState):
     class Meta(MyBaseModel.Meta):
         verbose_name = _("Hóa đơn")
         verbose_name_plural = _("Hóa đơn")
+        indexes = [
+            models.Index(fields=["resident", "-created_date", "-id"]),
+            models.Index(fields=["status", "due_date"]),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def pay(self):
         self.status = Invoice.InvoiceStatus.PAID
@@ -76,9 +91,18 @@ class InvoiceDetail(MyBaseModelWithDeletedState):
         _("Số tiền"), validators=[MinValueValidator(0)]
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     class Meta(MyBaseModel.Meta):
         verbose_name = _("Chi tiết hóa đơn")
         verbose_name_plural = _("Chi tiết hóa đơn")
+        indexes = [
+            models.Index(fields=["invoice", "service_registration"]),
+        ]
 
     def __str__(self):
         return str(self.pk)
@@ -205,7 +229,11 @@ class OnlineWallet(MyBaseModelWithDeletedState):
         verbose_name=_("Mã giao dịch"), max_length=255, null=True, blank=True
     )
     reference_number = models.CharField(
-        verbose_name=_("Mã tham chiếu"), max_length=100, null=True, blank=True
+        verbose_name=_("Mã tham chiếu"),
+        max_length=100,
+        null=True,
+        blank=True,
+        db_index=True,
     )
 
     class Meta(MyBaseModel.Meta):
@@ -223,6 +251,435 @@ class OnlineWallet(MyBaseModelWithDeletedState):
         return self.payment.__str__()
 
 
+"""
+An IPN inbox row, one per gateway transaction.
+
+The gateway callbacks only insert a row and answer at once. The unique transaction ID
+makes gateway retries collapse into the same row, and the payments are applied later
+by invoice.ipn.process_payment_notifications.
+"""
+
+
+class PaymentNotification(MyBaseModel):
+    MAX_ATTEMPTS = 5
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", _("Đang chờ xử lý")
+        PROCESSED = "PROCESSED", _("Đã xử lý")
+        FAILED = "FAILED", _("Thất bại")
+
+    wallet_type = models.CharField(
+        verbose_name=_("Loại ví"),
+        choices=OnlineWallet.WalletType.choices,
+        max_length=10,
+    )
+    transaction_id = models.CharField(verbose_name=_("Mã giao dịch"), max_length=255)
+    reference_number = models.CharField(verbose_name=_("Mã tham chiếu"), max_length=100)
+    data = models.JSONField(verbose_name=_("Dữ liệu"))
+    status = models.CharField(
+        verbose_name=_("Trạng thái"),
+        choices=Status.choices,
+        default=Status.PENDING,
+        max_length=20,
+    )
+    attempts = models.PositiveIntegerField(_("Số lần xử lý"), default=0)
+    error = models.TextField(_("Lỗi"), null=True, blank=True)
+    processed_date = models.DateTimeField(_("Xử lý lúc"), null=True, blank=True)
+
+    class Meta(MyBaseModel.Meta):
+        verbose_name = _("Thông báo thanh toán (IPN)")
+        verbose_name_plural = _("Thông báo thanh toán (IPN)")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet_type", "transaction_id"],
+                name="unique_payment_notification",
+            )
+        ]
+        indexes = [models.Index(fields=["status", "id"])]
+
+    """
+    Store a gateway callback, ignoring the ones already stored.
+
+    Args:
+        wallet_type (str): The gateway.
+        transaction_id (str): The gateway's ID of the transaction, the deduplication key.
+        reference_number (str): The reference number of the online wallet.
+        data (dict): The callback data.
+
+    Returns:
+        bool: Whether the callback is new.
+    """
+
+    @classmethod
+    def receive(cls, wallet_type, transaction_id, reference_number, data):
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    wallet_type=wallet_type,
+                    transaction_id=transaction_id,
+                    reference_number=reference_number,
+                    data=data,
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def process(self):
+        return self.finish(PaymentNotification.Status.PROCESSED)
+
+    def fail(self, error):
+        return self.finish(PaymentNotification.Status.FAILED, error)
+
+    def retry(self, error):
+        if self.attempts + 1 >= PaymentNotification.MAX_ATTEMPTS:
+            return self.finish(PaymentNotification.Status.FAILED, error)
+        return self.finish(PaymentNotification.Status.PENDING, error)
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.attempts += 1
+        self.error = error
+        self.processed_date = timezone.now()
+        self.save(
+            update_fields=[
+                "status",
+                "attempts",
+                "error",
+                "processed_date",
+                "updated_date",
+            ]
+        )
+        return True
+
+    def __str__(self):
+        return f"{self.get_wallet_type_display()} {self.transaction_id}"
+
+
+class InvoiceSequence(models.Model):
+    INVOICE_ID = "INVOICE_ID"
+    INVOICE_ID_PREFIX = "INV"
+
+    name = models.CharField(_("Tên"), max_length=30, primary_key=True)
+    last_value = models.PositiveBigIntegerField(_("Giá trị cuối cùng"), default=0)
+
+    class Meta:
+        verbose_name = _("Bộ đếm mã hóa đơn")
+        verbose_name_plural = _("Bộ đếm mã hóa đơn")
+
+    """
+    Reserve a block of invoice IDs.
+
+    The counter row is bumped with a single UPDATE, which holds the row lock until the
+    surrounding transaction ends, so concurrent allocators in different processes never
+    receive the same numbers. IDs of a block that is never saved are simply skipped.
+
+    Args:
+        count (int): The number of IDs to reserve. Defaults to 1.
+
+    Returns:
+        list: The reserved invoice IDs in ascending order.
+    """
+
+    @classmethod
+    def allocate_invoice_ids(cls, count=1):
+        if count < 1:
+            raise ValueError("count must be greater than 0")
+        with transaction.atomic():
+            sequence = cls.objects.filter(name=cls.INVOICE_ID)
+            if not sequence.update(last_value=F("last_value") + count):
+                cls.objects.get_or_create(
+                    name=cls.INVOICE_ID,
+                    defaults={"last_value": cls.get_latest_invoice_number()},
+                )
+                sequence.update(last_value=F("last_value") + count)
+            last_value = sequence.values_list("last_value", flat=True).get()
+        return [
+            cls.format_invoice_id(number)
+            for number in range(last_value - count + 1, last_value + 1)
+        ]
+
+    @classmethod
+    def format_invoice_id(cls, number):
+        return f"{cls.INVOICE_ID_PREFIX}{number:06d}"
+
+    @staticmethod
+    def get_latest_invoice_number():
+        latest_id = Invoice.objects.order_by("-id").values_list("id", flat=True).first()
+        return int(latest_id[3:]) if latest_id else 0
+
+    def __str__(self):
+        return f"{self.name} - {self.last_value}"
+
+
+class BillingRun(MyBaseModel):
+    class Status(models.TextChoices):
+        RUNNING = "RUNNING", _("Đang chạy")
+        COMPLETED = "COMPLETED", _("Hoàn tất")
+        FAILED = "FAILED", _("Thất bại")
+
+    payment = models.CharField(
+        _("Hình thức thanh toán"),
+        max_length=20,
+        choices=ServiceRegistration.Payment.choices,
+    )
+    first_day_of_period = models.DateField(_("Ngày đầu kỳ"))
+    last_day_of_period = models.DateField(_("Ngày cuối kỳ"))
+    due_date = models.DateField(_("Ngày đáo hạn"))
+    status = models.CharField(
+        _("Trạng thái"),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.RUNNING,
+    )
+    attempts = models.PositiveIntegerField(_("Số lần chạy"), default=0)
+    invoices_count = models.PositiveIntegerField(_("Số hóa đơn"), default=0)
+    details_count = models.PositiveIntegerField(_("Số chi tiết hóa đơn"), default=0)
+    started_date = models.DateTimeField(_("Bắt đầu lúc"), null=True, blank=True)
+    finished_date = models.DateTimeField(_("Kết thúc lúc"), null=True, blank=True)
+    elapsed = models.FloatField(_("Thời gian chạy (giây)"), default=0)
+
+    class Meta(MyBaseModel.Meta):
+        verbose_name = _("Đợt lập hóa đơn")
+        verbose_name_plural = _("Đợt lập hóa đơn")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["payment", "first_day_of_period"],
+                name="unique_billing_run_period",
+            )
+        ]
+
+    @property
+    def is_completed(self):
+        return self.status == BillingRun.Status.COMPLETED
+
+    def start(self):
+        self.status = BillingRun.Status.RUNNING
+        self.attempts += 1
+        self.started_date = timezone.now()
+        self.finished_date = None
+        self.save(update_fields=["status", "attempts", "started_date", "finished_date"])
+        return True
+
+    def finish(self, status, elapsed):
+        self.status = status
+        self.finished_date = timezone.now()
+        self.elapsed = elapsed
+        self.save(update_fields=["status", "finished_date", "elapsed", "updated_date"])
+        return True
+
+    def complete(self, elapsed):
+        return self.finish(BillingRun.Status.COMPLETED, elapsed)
+
+    def fail(self, elapsed):
+        return self.finish(BillingRun.Status.FAILED, elapsed)
+
+    def checkpoint(self, invoices_count, details_count):
+        return BillingRun.objects.filter(pk=self.pk).update(
+            invoices_count=F("invoices_count") + invoices_count,
+            details_count=F("details_count") + details_count,
+        )
+
+    def __str__(self):
+        return f"{self.get_payment_display()} {self.first_day_of_period:%d/%m/%Y}"
+
+
+class BillingRunItem(models.Model):
+    billing_run = models.ForeignKey(
+        verbose_name=_("Đợt lập hóa đơn"), to=BillingRun, on_delete=models.CASCADE
+    )
+    resident = models.ForeignKey(
+        to=get_user_model(), verbose_name=_("Cư dân"), on_delete=models.CASCADE
+    )
+    invoice = models.OneToOneField(
+        verbose_name=_("Hóa đơn"), to=Invoice, on_delete=models.CASCADE
+    )
+
+    class Meta:
+        verbose_name = _("Hóa đơn trong đợt")
+        verbose_name_plural = _("Hóa đơn trong đợt")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["billing_run", "resident"],
+                name="unique_billing_run_resident",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.billing_run} - {self.resident_id}"
+
+
+class RevenueRollup(models.Model):
+    month = models.DateField(_("Tháng"))
+    service = models.ForeignKey(
+        verbose_name=_("Dịch vụ"), to=Service, on_delete=models.CASCADE
+    )
+    status = models.CharField(
+        _("Trạng thái thanh toán"),
+        max_length=30,
+        choices=Invoice.InvoiceStatus.choices,
+    )
+    amount = models.BigIntegerField(_("Doanh thu"), default=0)
+
+    class Meta:
+        verbose_name = _("Doanh thu theo tháng")
+        verbose_name_plural = _("Doanh thu theo tháng")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "service", "status"],
+                name="unique_revenue_rollup",
+            )
+        ]
+
+    @staticmethod
+    def get_month(value):
+        if isinstance(value, datetime):
+            value = value.date()
+        return value.replace(day=1)
+
+    """
+    Add an amount to the revenue of a month, service and invoice status.
+
+    The row is bumped with a single UPDATE, so concurrent writers never lose each
+    other's amounts. The row is created on first use.
+
+    Args:
+        month (date): Any day of the month, which is keyed by its first day.
+        service_id (str): The service the revenue comes from.
+        status (str): The status of the invoices the revenue belongs to.
+        amount (int): The amount to add, negative to subtract.
+
+    Returns:
+        None
+    """
+
+    @classmethod
+    def add(cls, month, service_id, status, amount):
+        if not amount:
+            return
+        month = cls.get_month(month)
+        rollup = cls.objects.filter(month=month, service_id=service_id, status=status)
+        if rollup.update(amount=F("amount") + amount):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    month=month, service_id=service_id, status=status, amount=amount
+                )
+        except IntegrityError:
+            rollup.update(amount=F("amount") + amount)
+
+    @classmethod
+    def add_detail(cls, invoice_id, service_registration_id, amount):
+        invoice = Invoice.objects.filter(pk=invoice_id).values("due_date", "status")
+        service_id = ServiceRegistration.objects.filter(
+            pk=service_registration_id
+        ).values_list("service_id", flat=True)
+        if not invoice or not service_id:
+            return
+        cls.add(invoice[0]["due_date"], service_id[0], invoice[0]["status"], amount)
+
+    @classmethod
+    def move_invoice(cls, invoice_id, old_key, new_key):
+        old_month, old_status = old_key
+        new_month, new_status = new_key
+        amounts = (
+            InvoiceDetail.objects.filter(invoice_id=invoice_id)
+            .values("service_registration__service_id")
+            .annotate(amount=Sum("amount"))
+        )
+        for row in amounts:
+            service_id = row["service_registration__service_id"]
+            cls.add(old_month, service_id, old_status, -row["amount"])
+            cls.add(new_month, service_id, new_status, row["amount"])
+
+    """
+    Move the revenue of many invoices from one status to another.
+
+    Bulk updates skip the post_save receivers, so whoever bulk updates the status of
+    invoices moves their revenue with this, one aggregate query for all of them.
+
+    Args:
+        invoice_ids (list): The invoices whose status changed.
+        old_status (str): The status they had.
+        new_status (str): The status they have.
+
+    Returns:
+        None
+    """
+
+    @classmethod
+    def move_invoices(cls, invoice_ids, old_status, new_status):
+        amounts = (
+            InvoiceDetail.objects.filter(invoice_id__in=invoice_ids)
+            .annotate(month=TruncMonth("invoice__due_date"))
+            .values("month", "service_registration__service_id")
+            .annotate(amount=Sum("amount"))
+            .order_by()
+        )
+        for row in amounts:
+            service_id = row["service_registration__service_id"]
+            cls.add(row["month"], service_id, old_status, -row["amount"])
+            cls.add(row["month"], service_id, new_status, row["amount"])
+
+    """
+    Recompute the revenue rollup from the invoice details.
+
+    Args:
+        first_month (date, optional): The first month to rebuild. Defaults to the oldest.
+        last_month (date, optional): The last month to rebuild. Defaults to the newest.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+
+    @classmethod
+    def rebuild(cls, first_month=None, last_month=None):
+        rollups = cls.objects.all()
+        invoice_details = InvoiceDetail.objects.all()
+        if first_month:
+            rollups = rollups.filter(month__gte=cls.get_month(first_month))
+            invoice_details = invoice_details.filter(
+                invoice__due_date__gte=cls.get_month(first_month)
+            )
+        if last_month:
+            rollups = rollups.filter(month__lte=cls.get_month(last_month))
+            invoice_details = invoice_details.filter(
+                invoice__due_date__lt=cls.get_next_month(last_month)
+            )
+        rows = (
+            invoice_details.annotate(month=TruncMonth("invoice__due_date"))
+            .values("month", "service_registration__service_id", "invoice__status")
+            .annotate(amount=Sum("amount"))
+            .order_by()
+        )
+        with transaction.atomic():
+            rollups.delete()
+            return len(
+                cls.objects.bulk_create(
+                    [
+                        cls(
+                            month=row["month"],
+                            service_id=row["service_registration__service_id"],
+                            status=row["invoice__status"],
+                            amount=row["amount"],
+                        )
+                        for row in rows
+                    ],
+                    batch_size=1000,
+                )
+            )
+
+    @classmethod
+    def get_next_month(cls, value):
+        month = cls.get_month(value)
+        return month.replace(
+            year=month.year + month.month // 12, month=month.month % 12 + 1
+        )
+
+    def __str__(self):
+        return f"{self.month:%m/%Y} - {self.service_id} - {self.status}"
+
+
 class StatsRevenue(Invoice):
     class Meta:
         proxy = True
@@ -233,8 +690,9 @@ class StatsRevenue(Invoice):
 """
 A signal receiver function to generate an invoice ID before saving the Invoice instance.
 
-This function listens for the pre-save signal of the Invoice model and generates a unique
-invoice ID if it does not already exist.
+This function listens for the pre-save signal of the Invoice model and reserves a unique
+invoice ID from the invoice sequence if it does not already exist. Bulk paths, which skip
+this signal, reserve their IDs with InvoiceSequence.allocate_invoice_ids directly.
 
 Args:
     sender: The sender of the signal.
@@ -249,15 +707,62 @@ Returns:
 @receiver(pre_save, sender=Invoice)
 def generate_invoice_id(sender, instance, **kwargs):
     if not instance.id:
-        if latest_invoice := Invoice.objects.order_by("-id").first():
-            last_invoice_number = int(latest_invoice.id[3:])
-            new_invoice_number = last_invoice_number + 1
-        else:
-            new_invoice_number = 1
-        instance.id = f"INV{new_invoice_number:06d}"
+        instance.id = InvoiceSequence.allocate_invoice_ids()[0]
 
 
 @receiver(post_save, sender=Payment)
 def update_invoice_status(sender, instance, **kwargs):
     if instance.is_success:
         instance.invoice.pay()
+
+
+"""
+Signal receivers keeping the revenue rollup up to date.
+
+An invoice moves the amounts of its details when its status or due date changes, which
+also covers payments since they change the status of their invoice. A detail adds its
+amount when it is created and moves it when it is changed or deleted. Bulk writes skip
+these receivers and update the rollup themselves.
+"""
+
+
+@receiver(post_save, sender=Invoice)
+def update_revenue_rollup_on_invoice(sender, instance, created, **kwargs):
+    loaded_values = getattr(instance, "_loaded_values", {})
+    if not created and "status" in loaded_values and "due_date" in loaded_values:
+        old_key = (
+            RevenueRollup.get_month(loaded_values["due_date"]),
+            loaded_values["status"],
+        )
+        new_key = (RevenueRollup.get_month(instance.due_date), instance.status)
+        if old_key != new_key:
+            RevenueRollup.move_invoice(instance.pk, old_key, new_key)
+    instance._loaded_values = {"status": instance.status, "due_date": instance.due_date}
+
+
+@receiver(post_save, sender=InvoiceDetail)
+def update_revenue_rollup_on_invoice_detail(sender, instance, created, **kwargs):
+    loaded_values = getattr(instance, "_loaded_values", {})
+    new_values = {
+        "invoice_id": instance.invoice_id,
+        "service_registration_id": instance.service_registration_id,
+        "amount": instance.amount,
+    }
+    if not created and all(key in loaded_values for key in new_values):
+        old_values = {key: loaded_values[key] for key in new_values}
+        if old_values == new_values:
+            return
+        RevenueRollup.add_detail(
+            old_values["invoice_id"],
+            old_values["service_registration_id"],
+            -old_values["amount"],
+        )
+    RevenueRollup.add_detail(**new_values)
+    instance._loaded_values = new_values
+
+
+@receiver(post_delete, sender=InvoiceDetail)
+def update_revenue_rollup_on_invoice_detail_delete(sender, instance, **kwargs):
+    RevenueRollup.add_detail(
+        instance.invoice_id, instance.service_registration_id, -instance.amount
+    )
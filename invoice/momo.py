@@ -1,10 +1,284 @@
 import hashlib
 import hmac
+import random
+import threading
+import time
 import uuid
+from collections import deque
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from app import settings
+from utils import get_logger
+
+log = get_logger(__name__)
+
+SUCCESS_CODE = 0
+
+
+class MomoError(Exception):
+    pass
+
+
+class MomoUnavailable(MomoError):
+    pass
+
+
+"""
+A circuit breaker which stops calling a degraded gateway for a while.
+
+The circuit opens after failure_threshold consecutive failures, then every call fails fast
+until reset_timeout seconds have passed. After that one trial call is let through
+(half-open): a success closes the circuit again, a failure opens it for another period.
+
+Args:
+    failure_threshold (int): The number of consecutive failures which opens the circuit.
+    reset_timeout (float): The number of seconds the circuit stays open.
+"""
+
+
+class CircuitBreaker:
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+                log.info("Momo circuit is half-open, trying one request")
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                log.info("Momo circuit is closed")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    log.error(f"Momo circuit is open after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+"""
+A MoMo gateway client with a pooled keep-alive session.
+
+Every call has connect and read timeouts. Request errors, timeouts and 5xx responses
+are retried a bounded number of times with exponential backoff and full jitter, using the
+same requestId so MoMo sees the retries as the same request. A circuit breaker makes
+calls fail fast with MomoUnavailable while MoMo is degraded. The client is thread-safe
+and meant to be shared, see get_client().
+
+Args:
+    endpoint (str): The MoMo create payment endpoint.
+    connect_timeout (float): The number of seconds to wait for a connection.
+    read_timeout (float): The number of seconds to wait for the response.
+    max_retries (int): The number of retries after the first attempt.
+    backoff (float): The base number of seconds between retries.
+    pool_size (int): The number of keep-alive connections kept to MoMo.
+    circuit_breaker (CircuitBreaker): Defaults to one built from the settings.
+"""
+
+
+class MomoClient:
+    LATENCY_WINDOW = 1000
+
+    def __init__(
+        self,
+        endpoint=None,
+        connect_timeout=None,
+        read_timeout=None,
+        max_retries=None,
+        backoff=None,
+        pool_size=None,
+        circuit_breaker=None,
+    ):
+        self.endpoint = endpoint or settings.MOMO_ENDPOINT
+        self.timeout = (
+            connect_timeout or settings.MOMO_CONNECT_TIMEOUT,
+            read_timeout or settings.MOMO_READ_TIMEOUT,
+        )
+        self.max_retries = (
+            settings.MOMO_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.backoff = settings.MOMO_RETRY_BACKOFF if backoff is None else backoff
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            failure_threshold=settings.MOMO_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.MOMO_CIRCUIT_RESET_TIMEOUT,
+        )
+
+        pool_size = pool_size or settings.MOMO_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.counters = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "errors": 0,
+            "short_circuited": 0,
+        }
+
+    """
+    Create a MoMo payment.
+
+    Args:
+        request_id (str): The request ID, also the reference number of the online wallet.
+        order_id (str): The order ID, unique across every MoMo environment.
+        order_info (str): The description shown to the payer.
+        amount (int): The amount to pay.
+
+    Returns:
+        dict: The MoMo response, with resultCode, payUrl, deeplink and qrCodeUrl.
+
+    Raises:
+        MomoUnavailable: The circuit is open.
+        MomoError: MoMo failed after every retry or responded with a client error.
+    """
+
+    def create_payment(self, request_id, order_id, order_info, amount):
+        data = self.get_payment_data(request_id, order_id, order_info, amount)
+        self.increase("requests")
+        if not self.circuit_breaker.allow_request():
+            self.increase("short_circuited")
+            raise MomoUnavailable("Momo is unavailable")
+
+        # NOTE: Any error counts as a failure, or a half-open circuit would never close
+        try:
+            r = self.post(data)
+        except Exception:
+            self.increase("errors")
+            self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        if not r.ok:
+            self.increase("errors")
+            raise MomoError(f"Momo responded with {r.status_code}:::{r.text}")
+        return r.json()
+
+    def post(self, data):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.increase("retries")
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            self.increase("attempts")
+            started_at = time.perf_counter()
+            try:
+                r = self.session.post(self.endpoint, json=data, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.record_latency(started_at)
+                log.warning(f"Momo request failed:::{e}")
+                error = e
+                continue
+            self.record_latency(started_at)
+            if r.status_code >= 500:
+                log.warning(f"Momo responded with {r.status_code}:::{r.text}")
+                error = MomoError(f"Momo responded with {r.status_code}")
+                continue
+            return r
+
+        raise MomoError("Momo failed after retries") from error
+
+    def get_payment_data(self, request_id, order_id, order_info, amount):
+        amount = str(amount)
+        raw_signature = (
+            f"accessKey={settings.MOMO_ACCESS_KEY}&amount={amount}&extraData=&ipnUrl={settings.MOMO_IPN_URL}&orderId={order_id}"
+            + "&orderInfo="
+            + order_info
+            + "&partnerCode="
+            + settings.MOMO_PARTNER_CODE
+            + "&redirectUrl="
+            + settings.MOMO_REDIRECT_URL
+            + "&requestId="
+            + request_id
+            + "&requestType="
+            + settings.MOMO_REQUEST_TYPE
+        )
+        h = hmac.new(
+            bytes(settings.MOMO_SECRET_KEY, "utf8"),
+            bytes(raw_signature, "utf8"),
+            hashlib.sha256,
+        )
+        return {
+            "partnerCode": settings.MOMO_PARTNER_CODE,
+            "partnerName": settings.MOMO_PARTNER_NAME,
+            "storeId": settings.MOMO_STORE_ID,
+            "requestId": request_id,
+            "amount": amount,
+            "orderId": order_id,
+            "orderInfo": order_info,
+            "redirectUrl": settings.MOMO_REDIRECT_URL,
+            "ipnUrl": settings.MOMO_IPN_URL,
+            "lang": settings.MOMO_LANG,
+            "extraData": "",
+            "requestType": settings.MOMO_REQUEST_TYPE,
+            "signature": h.hexdigest(),
+        }
+
+    def increase(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def record_latency(self, started_at):
+        with self.lock:
+            self.latencies.append(time.perf_counter() - started_at)
+
+    """
+    Get the metrics of the client.
+
+    Returns:
+        dict: The counters, the circuit state and the p50/p95/max latency in
+        milliseconds over the last LATENCY_WINDOW attempts.
+    """
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+            latencies = sorted(self.latencies)
+        metrics["circuit"] = self.circuit_breaker.state
+        if latencies:
+            metrics["latency_p50_ms"] = latencies[len(latencies) // 2] * 1000
+            metrics["latency_p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000
+            metrics["latency_max_ms"] = latencies[-1] * 1000
+        return metrics
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MomoClient()
+        return _client
 
 
 def pay(invoice):
@@ -13,41 +287,8 @@ def pay(invoice):
     request_id = str(uuid.uuid4())
     order_id = f"{invoice.pk}-{request_id}"
     # NOTE: Dev and Prod env using the same momo api key, what happends is order ids are conflicted. So I add an uuid to solve it
-    print("ORDER_ID::", order_id)
+    log.info(f"ORDER_ID::{order_id}")
     order_info = f"{invoice.resident.__str__()} thanh toán hóa đơn {invoice.__str__()}"
-    amount = str(int(invoice.total_amount))
-    raw_signature = (
-        f"accessKey={settings.MOMO_ACCESS_KEY}&amount={amount}&extraData=&ipnUrl={settings.MOMO_IPN_URL}&orderId={order_id}"
-        + "&orderInfo="
-        + order_info
-        + "&partnerCode="
-        + settings.MOMO_PARTNER_CODE
-        + "&redirectUrl="
-        + settings.MOMO_REDIRECT_URL
-        + "&requestId="
-        + request_id
-        + "&requestType="
-        + settings.MOMO_REQUEST_TYPE
-    )
-    h = hmac.new(
-        bytes(settings.MOMO_SECRET_KEY, "utf8"),
-        bytes(raw_signature, "utf8"),
-        hashlib.sha256,
+    return get_client().create_payment(
+        request_id, order_id, order_info, int(invoice.total_amount)
     )
-    signature = h.hexdigest()
-    data = {
-        "partnerCode": settings.MOMO_PARTNER_CODE,
-        "partnerName": settings.MOMO_PARTNER_NAME,
-        "storeId": settings.MOMO_STORE_ID,
-        "requestId": request_id,
-        "amount": amount,
-        "orderId": order_id,
-        "orderInfo": order_info,
-        "redirectUrl": settings.MOMO_REDIRECT_URL,
-        "ipnUrl": settings.MOMO_IPN_URL,
-        "lang": settings.MOMO_LANG,
-        "extraData": "",
-        "requestType": settings.MOMO_REQUEST_TYPE,
-        "signature": signature,
-    }
-    return requests.post(settings.MOMO_ENDPOINT, json=data)
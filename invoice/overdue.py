@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.utils import timezone
+
+from invoice.models import Invoice, RevenueRollup
+from notification.manager import NotificationManager
+from notification.types import EntityType
+from utils import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+"""
+Mark the pending invoices past their due date as overdue.
+
+Every chunk is selected through the (status, due_date) index, locked, and flipped with a
+single UPDATE, then its residents are notified with one bulk fan-out. Invoices which
+are being paid at the same time are locked by the payment and skipped.
+
+Args:
+    today (date, optional): The day the sweep is done for. Defaults to today.
+    chunk_size (int): The number of invoices updated per transaction.
+    notify (bool): Whether residents are notified about their overdue invoices.
+
+Returns:
+    int: The number of invoices marked as overdue.
+"""
+
+
+def sweep_overdue_invoices(today=None, chunk_size=DEFAULT_CHUNK_SIZE, notify=True):
+    today = today or timezone.localdate()
+    swept = 0
+    while True:
+        with transaction.atomic():
+            invoice_ids = list(
+                Invoice.objects.select_for_update(skip_locked=True)
+                .filter(status=Invoice.InvoiceStatus.PENDING, due_date__lt=today)
+                .order_by("due_date", "id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not invoice_ids:
+                break
+            Invoice.objects.filter(id__in=invoice_ids).update(
+                status=Invoice.InvoiceStatus.OVERDUE, updated_date=timezone.now()
+            )
+            RevenueRollup.move_invoices(
+                invoice_ids,
+                Invoice.InvoiceStatus.PENDING,
+                Invoice.InvoiceStatus.OVERDUE,
+            )
+        swept += len(invoice_ids)
+        if notify:
+            invoices = list(Invoice.objects.filter(id__in=invoice_ids))
+            NotificationManager.create_notifications(
+                entities=invoices,
+                entity_type=EntityType.INVOICE_OVERDUE,
+                recipient_ids=[invoice.resident_id for invoice in invoices],
+            )
+    log.info(f"Marked {swept} invoices as overdue")
+    return swept
@@ -42,6 +42,27 @@ INVOICE_LIST = {
                 ),
             ],
         ),
+        OpenApiParameter(
+            name="year",
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description="Created year of invoices",
+            examples=[
+                OpenApiExample("Example", value=2024),
+            ],
+        ),
+        OpenApiParameter(
+            name="cursor",
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description="Cursor of the page, taken from next or previous",
+        ),
+        OpenApiParameter(
+            name="limit",
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description="Number of invoices per page",
+        ),
         OpenApiParameter(
             name="category",
             type=OpenApiTypes.STR,
@@ -58,14 +79,25 @@ INVOICE_LIST = {
         OpenApiExample(
             "Example",
             value={
-                "2024": [
+                "next": "http://0.0.0.0:8000/invoices/?cursor=cD0yMDI0LTA0",
+                "previous": None,
+                "results": [
                     {
                         "id": "INV043923",
                         "created_date": "2024-04-19T16:26:37.203Z",
                         "total_amount": "5350000",
                         "status": format.format_enum_values(Invoice.InvoiceStatus),
                     }
-                ]
+                ],
+                "summary": [
+                    {
+                        "year": 2024,
+                        "count": 4,
+                        "total": 21400000,
+                        "unpaid": 1,
+                        "unpaid_amount": 5350000,
+                    }
+                ],
             },
             response_only=True,
         )
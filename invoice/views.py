@@ -1,31 +1,43 @@
-from urllib.parse import parse_qs, urlparse
-
-import requests
-from cloudinary.utils import urllib
 from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import ExtractYear
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
-from vnpay.models import Billing
 
-from app import settings
-from invoice import momo
+from invoice import momo, vnpay
 from notification.manager import NotificationManager
 from notification.types import EntityType
-from utils import get_logger, token
+from utils import get_logger
 
 from . import serializers, swaggers
-from .models import Invoice, OnlineWallet, Payment, ProofImage
+from .models import (
+    Invoice,
+    InvoiceDetail,
+    OnlineWallet,
+    Payment,
+    PaymentNotification,
+    ProofImage,
+)
 
 log = get_logger(__name__)
 
 
+class InvoicePagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = "limit"
+    max_page_size = 100
+    ordering = ("-created_date", "-id")
+
+
 class InvoiceView(ListAPIView, RetrieveAPIView, ViewSet):
     serializer_class = serializers.InvoiceSerializer
+    pagination_class = InvoicePagination
     MOMO_SUCCESS_CODE = 0
     VNPAY_SUCCESS_CODE = "00"
 
@@ -39,22 +51,52 @@ class InvoiceView(ListAPIView, RetrieveAPIView, ViewSet):
             queries = queries.exclude(status=_status)
         if category := self.request.query_params.get("category"):
             category = [item.strip() for item in category.split(",")]
+            # NOTE: EXISTS instead of joining through the details, which duplicated
+            # invoices having several services of the category
             queries = queries.filter(
-                invoicedetail__service_registration__service__id__in=category
+                Exists(
+                    InvoiceDetail.objects.filter(
+                        invoice=OuterRef("pk"),
+                        service_registration__service__id__in=category,
+                    )
+                )
             )
         return queries
 
+    def get_summary(self, invoices):
+        unpaid = Q(
+            status__in=[Invoice.InvoiceStatus.PENDING, Invoice.InvoiceStatus.OVERDUE]
+        )
+        return (
+            invoices.annotate(year=ExtractYear("created_date"))
+            .values("year")
+            .annotate(
+                count=Count("id"),
+                total=Sum("total_amount"),
+                unpaid=Count("id", filter=unpaid),
+                unpaid_amount=Sum("total_amount", filter=unpaid, default=0),
+            )
+            .order_by("-year")
+        )
+
     @extend_schema(**swaggers.INVOICE_LIST)
     def list(self, request):
         invoices = self.get_queryset().filter(resident=request.user)
-        invoices_by_year = {}
-        for invoice in invoices:
-            year = invoice.created_date.year
-            if year not in invoices_by_year:
-                invoices_by_year[year] = []
-            invoices_by_year[year].append(self.serializer_class(invoice).data)
+        summary = None
+        if self.paginator.cursor_query_param not in request.query_params:
+            summary = list(self.get_summary(invoices))
+        if year := request.query_params.get("year"):
+            if not year.isdigit():
+                return Response("year must be a number", status.HTTP_400_BAD_REQUEST)
+            invoices = invoices.filter(created_date__year=int(year))
 
-        return Response(invoices_by_year)
+        page = self.paginate_queryset(invoices)
+        response = self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+        if summary is not None:
+            response.data["summary"] = summary
+        return response
 
     @extend_schema(**swaggers.INVOICE_RETRIEVE)
     def retrieve(self, request, *args, **kwargs):
@@ -104,29 +146,10 @@ class InvoiceView(ListAPIView, RetrieveAPIView, ViewSet):
     def payment_vnpay(self, request, pk=None):
         invoice = self.get_object()
 
-        r = requests.post(
-            url=f"{settings.HOST}/vnpay/payment_url/?token={token.generate_token(settings.SECRET_KEY)}",
-            headers={
-                "AUTHORIZATION": request.META["HTTP_AUTHORIZATION"],
-            },
-            data={"amount": int(invoice.total_amount)},
+        vnpay_billing, payment_url = vnpay.create_payment_url(
+            request, int(invoice.total_amount)
         )
-        log.info("Requested to VNPay successfully")
-        if not r.ok or "payment_url" not in r.json():
-            log.error(f"Vnpay payment failed:::{r.json()}")
-            return Response(
-                "Internal server error", status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        payment_url = r.json()["payment_url"]
-        parsed_url = urlparse(payment_url)
-        vnpay_reference_number = parse_qs(parsed_url.query)["vnp_TxnRef"][0]
-        vnpay_billing = Billing.objects.filter(
-            reference_number=vnpay_reference_number
-        ).first()
-        if not vnpay_billing:
-            log.error(f"Vnpay payment failed, not found vnpay billing:::{r.json()}")
-            return Response("Not found transaction", status=status.HTTP_404_NOT_FOUND)
+        log.info("Created VNPay payment url successfully")
 
         payment = Payment.objects.create(
             method=Payment.PaymentMethod.ONLINE_WALLET,
@@ -137,10 +160,10 @@ class InvoiceView(ListAPIView, RetrieveAPIView, ViewSet):
         OnlineWallet.objects.create(
             payment=payment,
             wallet_type=OnlineWallet.WalletType.VNPAY,
-            reference_number=vnpay_reference_number,
+            reference_number=vnpay_billing.reference_number,
         )
         log.info("Created online wallet payment successfully")
-        return Response(r.json(), status.HTTP_200_OK)
+        return Response({"payment_url": payment_url}, status.HTTP_200_OK)
 
     @extend_schema(**swaggers.INVOICE_ONLINE_WALLET_RETURN)
     @action(
@@ -149,41 +172,23 @@ class InvoiceView(ListAPIView, RetrieveAPIView, ViewSet):
         detail=False,
         permission_classes=[AllowAny],
     )
-    @transaction.atomic
     def return_vnpay(self, request):
-        r = requests.get(
-            url=f"{settings.HOST}/vnpay/payment_ipn/?{urllib.parse.urlencode(request.GET, doseq=False)}&token={token.generate_token(settings.SECRET_KEY)}",
+        data = vnpay.validate_params(request.GET)
+        if not data:
+            return Response("Invalid request", status=status.HTTP_400_BAD_REQUEST)
+        # NOTE: The payment is applied by the IPN worker, see invoice.ipn
+        PaymentNotification.receive(
+            wallet_type=OnlineWallet.WalletType.VNPAY,
+            transaction_id=data["vnp_TxnRef"],
+            reference_number=data["vnp_TxnRef"],
+            data=request.GET.dict(),
         )
-        log.info("Requested to VNPay successfully")
-        if (
-            not r.ok
-            or "RspCode" not in r.json()
-            or r.json()["RspCode"] != self.VNPAY_SUCCESS_CODE
-        ):
-            log.error(f"Vnpay payment failed:::{r.json()}")
+        if data["vnp_ResponseCode"] != self.VNPAY_SUCCESS_CODE:
+            log.error(f"Vnpay payment failed:::{request.GET}")
             return Response(
                 "Transaction is not success", status=status.HTTP_400_BAD_REQUEST
             )
-
-        parsed_url = urlparse(request.get_full_path())
-        vnpay_reference_number = parse_qs(parsed_url.query)["vnp_TxnRef"][0]
-        online_wallet = OnlineWallet.objects.filter(
-            wallet_type=OnlineWallet.WalletType.VNPAY,
-            reference_number=vnpay_reference_number,
-        ).first()
-        if not online_wallet:
-            log.error(f"Vnpay payment failed, not found vnpay billing:::{r.json()}")
-            return Response("Not found transaction", status=status.HTTP_404_NOT_FOUND)
-        paid = online_wallet.pay()
-        if not paid:
-            log.error(
-                "Vnpay payment failed, can't set success status for payment model"
-            )
-            return Response(
-                "Internal server error", status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        log.info("Paid online wallet payment successfully")
+        log.info("Received VNPay payment successfully")
         return Response("Paid successfully", status.HTTP_200_OK)
 
     # TODO: Handle when users exit the transaction before finishing
@@ -193,32 +198,38 @@ class InvoiceView(ListAPIView, RetrieveAPIView, ViewSet):
         url_path="payment/momo",
         detail=True,
     )
-    @transaction.atomic
     def payment_momo(self, request, pk=None):
         invoice = self.get_object()
-        r = momo.pay(invoice)
-        if not r.ok:
-            log.error(f"Momo payment failed:::{r.json()}")
+        # NOTE: Momo is called outside of the transaction, so a slow response doesn't hold it
+        try:
+            data = momo.pay(invoice)
+        except momo.MomoUnavailable:
+            log.error("Momo payment failed, momo is unavailable")
+            return Response(
+                "Momo is unavailable", status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except momo.MomoError as e:
+            log.error(f"Momo payment failed:::{e}")
             return Response(
                 "Internal server error", status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        data = r.json()
         if data["resultCode"] != self.MOMO_SUCCESS_CODE:
-            log.error(f"Momo payment failed:::{r.json()}")
+            log.error(f"Momo payment failed:::{data}")
             return Response(
                 "Transaction is not success", status=status.HTTP_400_BAD_REQUEST
             )
-        payment = Payment.objects.create(
-            method=Payment.PaymentMethod.ONLINE_WALLET,
-            status=Payment.PaymentStatus.CONFIRMING,
-            invoice=invoice,
-            total_amount=invoice.total_amount,
-        )
-        OnlineWallet.objects.create(
-            payment=payment,
-            wallet_type=OnlineWallet.WalletType.MOMO,
-            reference_number=data["requestId"],
-        )
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                method=Payment.PaymentMethod.ONLINE_WALLET,
+                status=Payment.PaymentStatus.CONFIRMING,
+                invoice=invoice,
+                total_amount=invoice.total_amount,
+            )
+            OnlineWallet.objects.create(
+                payment=payment,
+                wallet_type=OnlineWallet.WalletType.MOMO,
+                reference_number=data["requestId"],
+            )
         log.info("Created online wallet payment successfully")
         return Response(
             {
@@ -236,38 +247,19 @@ class InvoiceView(ListAPIView, RetrieveAPIView, ViewSet):
         detail=False,
         permission_classes=[AllowAny],
     )
-    @transaction.atomic
     def ipn_momo(self, request):
-        if (
-            "resultCode" not in request.data
-            or request.data["resultCode"] != self.MOMO_SUCCESS_CODE
-        ):
+        if "transId" not in request.data or "requestId" not in request.data:
             log.error(f"Momo payment failed:::{request.data}")
-            return Response(
-                "Transaction is not success", status=status.HTTP_400_BAD_REQUEST
-            )
-        online_wallet = OnlineWallet.objects.filter(
-            reference_number=request.data["requestId"]
-        ).first()
-        if not online_wallet:
-            log.error(
-                f"Momo payment failed, not found momo transaction:::{request.data}"
-            )
-            return Response("Not found transaction", status=status.HTTP_404_NOT_FOUND)
-        if online_wallet.payment.total_amount != int(request.data["amount"]):
-            log.error(f"Momo payment failed, amounts are not matching:::{request.data}")
-            return Response(
-                "Redirected data is invalid", status=status.HTTP_400_BAD_REQUEST
-            )
-        paid = online_wallet.pay(transaction_id=request.data["transId"])
-        if not paid:
-            log.error("Momo payment failed, can't set success status for payment model")
-            return Response(
-                "Internal server error", status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        log.info("IPN paid online wallet payment successfully")
-        return Response(status.HTTP_204_NO_CONTENT)
+            return Response("Bad request", status=status.HTTP_400_BAD_REQUEST)
+        # NOTE: The payment is applied by the IPN worker, see invoice.ipn
+        received = PaymentNotification.receive(
+            wallet_type=OnlineWallet.WalletType.MOMO,
+            transaction_id=str(request.data["transId"]),
+            reference_number=request.data["requestId"],
+            data=dict(request.data.items()),
+        )
+        log.info(f"IPN received momo payment:::{request.data['transId']}:::{received}")
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @extend_schema(**swaggers.INVOICE_ONLINE_WALLET_RETURN)
     @action(
@@ -0,0 +1,118 @@
+import uuid
+from decimal import Decimal
+
+from django.utils import timezone
+from vnpay.models import Billing
+from vnpay.utils import VnPay
+
+from utils import get_logger
+
+log = get_logger(__name__)
+
+SUCCESS_CODE = "00"
+
+"""
+Create a VNPay billing and build its signed payment URL in-process.
+
+This does what the django-vnpay payment_url endpoint does, without the HTTP round trip
+back into our own server.
+
+Args:
+    request: The request of the resident who pays, used for the client IP address.
+    amount (int): The amount to pay.
+
+Returns:
+    tuple: The created billing and its payment URL.
+"""
+
+
+def create_payment_url(request, amount):
+    if not amount:
+        raise ValueError("amount must not be empty")
+    billing = Billing.objects.create(
+        status="NEW",
+        currency="VND",
+        pay_by=request.user,
+        amount=amount,
+        # NOTE: The timestamp alone collides when two payments start in the same second
+        reference_number=f"{timezone.now():%Y%m%d%H%M%S}{uuid.uuid4().hex[:8]}",
+    )
+    return billing, billing.get_payment_url(request)
+
+
+"""
+Validate the parameters VNPay sends back.
+
+Args:
+    params (QueryDict): The query parameters VNPay sends to the return or IPN URL.
+
+Returns:
+    dict: The validated parameters, None if they are missing or wrongly signed.
+"""
+
+
+def validate_params(params):
+    vnp = VnPay()
+    try:
+        response_data = vnp.validate_response_data(params)
+    except Exception:
+        log.error(f"Vnpay response data is invalid:::{params}")
+        return None
+    if not vnp.validate_hash(dict(response_data)):
+        log.error(f"Vnpay signature is invalid:::{params}")
+        return None
+    return response_data
+
+
+"""
+Validate the parameters VNPay sends back and confirm the matching billing.
+
+This does what the django-vnpay payment_ipn endpoint does: the signature, the billing
+and its amount are checked and a new billing is confirmed once. The billing row is
+locked while it is confirmed, so concurrent callbacks for the same transaction can't
+both confirm it.
+
+Args:
+    params (QueryDict): The query parameters VNPay sends to the return or IPN URL.
+
+Returns:
+    dict: The IPN response with RspCode and Message, RspCode 00 means confirmed.
+"""
+
+
+def confirm_payment(params):
+    vnp = VnPay()
+    try:
+        response_data = vnp.validate_response_data(params)
+    except Exception:
+        log.error(f"Vnpay response data is invalid:::{params}")
+        return {"RspCode": "99", "Message": "Invalid request"}
+
+    reference_number = response_data["vnp_TxnRef"]
+    amount = Decimal(response_data["vnp_Amount"]) / 100
+    response_code = response_data["vnp_ResponseCode"]
+    transaction_id = response_data["vnp_TransactionNo"]
+
+    if not vnp.validate_hash(response_data):
+        return {"RspCode": "97", "Message": "Invalid Signature"}
+
+    billing = (
+        Billing.objects.select_for_update()
+        .filter(reference_number=reference_number)
+        .first()
+    )
+    if not billing:
+        return {"RspCode": "01", "Message": "Order not found"}
+    if billing.amount != amount:
+        return {"RspCode": "04", "Message": "Invalid Amount"}
+    if billing.status != "NEW":
+        return {"RspCode": "02", "Message": "Order Already Update"}
+
+    billing.finalize(succeeded=response_code == SUCCESS_CODE)
+    billing.status = "CONFIRMED"
+    billing.result_payment = f"VNPAY_{response_code}"
+    billing.transaction_id = transaction_id
+    billing.save(update_fields=["status", "result_payment", "transaction_id"])
+    if response_code != SUCCESS_CODE:
+        return {"RspCode": response_code, "Message": "Transaction is not success"}
+    return {"RspCode": SUCCESS_CODE, "Message": "Confirm Success"}
@@ -5,10 +5,13 @@ from django.http import HttpRequest
 from app.admin import MyBaseModelAdmin, admin_site
 
 from .models import (
+    ArchivedNotification,
     FCMToken,
     Notification,
     NotificationContent,
     NotificationSender,
+    PushMessage,
+    TopicSubscription,
 )
 
 
@@ -27,6 +30,11 @@ class NotificationAdmin(MyBaseModelAdmin):
         return False
 
 
+class ArchivedNotificationAdmin(NotificationAdmin):
+    list_display = ("id", "recipient", "target", "has_been_read", "created_date")
+    list_filter = ("target", "has_been_read")
+
+
 class NotificationSenderAdmin(MyBaseModelAdmin):
     def has_add_permission(self, request: HttpRequest) -> bool:
         return False
@@ -67,7 +75,36 @@ class FCMTokenAdmin(MyBaseModelAdmin):
         return False
 
 
+class PushMessageAdmin(MyBaseModelAdmin):
+    list_display = ("id", "target", "recipient", "status", "attempts", "sent_date")
+    list_filter = ("target", "status")
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(
+        self, request: HttpRequest, obj: Any | None = ...
+    ) -> bool:
+        return False
+
+
+class TopicSubscriptionAdmin(MyBaseModelAdmin):
+    list_display = ("id", "topic", "action", "status", "attempts", "created_date")
+    list_filter = ("topic", "action", "status")
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(
+        self, request: HttpRequest, obj: Any | None = ...
+    ) -> bool:
+        return False
+
+
 admin_site.register(FCMToken, FCMTokenAdmin)
 admin_site.register(Notification, NotificationAdmin)
 admin_site.register(NotificationContent, NotificationContentAdmin)
 admin_site.register(NotificationSender, NotificationSenderAdmin)
+admin_site.register(PushMessage, PushMessageAdmin)
+admin_site.register(ArchivedNotification, ArchivedNotificationAdmin)
+admin_site.register(TopicSubscription, TopicSubscriptionAdmin)
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app import settings
+from notification.models import ArchivedNotification, Notification
+from notification.types import EntityType
+from utils import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+ARCHIVED_FIELDS = [
+    "id",
+    "content_id",
+    "recipient_id",
+    "has_been_read",
+    "target",
+    "created_date",
+    "updated_date",
+]
+
+"""
+Move the old notifications nobody waits for out of the notification table.
+
+The read notifications, the broadcasts and the chat notifications older than the
+retention are moved. Unread ones stay, they are still part of the badge. Every chunk is
+locked with select_for_update(skip_locked=True), copied with one bulk insert and
+deleted, so a transaction only ever holds chunk_size rows.
+
+Args:
+    before (datetime, optional): Defaults to NOTIFICATION_RETENTION_DAYS days ago.
+    chunk_size (int): The number of notifications moved per transaction.
+
+Returns:
+    int: The number of notifications archived.
+"""
+
+
+def archive_notifications(before=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    before = before or timezone.now() - timedelta(
+        days=settings.NOTIFICATION_RETENTION_DAYS
+    )
+    archived = 0
+    while True:
+        with transaction.atomic():
+            notification_ids = list(
+                Notification.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(created_date__lt=before)
+                .filter(
+                    Q(has_been_read=True)
+                    | Q(recipient__isnull=True)
+                    | Q(content__entity_type=EntityType.CHAT_SEND_MESSAGE)
+                )
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not notification_ids:
+                break
+            ArchivedNotification.objects.bulk_create(
+                [
+                    ArchivedNotification(**notification)
+                    for notification in Notification.objects.filter(
+                        id__in=notification_ids
+                    ).values(*ARCHIVED_FIELDS)
+                ],
+                # NOTE: Rows copied by a run which failed before deleting them
+                ignore_conflicts=True,
+            )
+            Notification.objects.filter(id__in=notification_ids).delete()
+        archived += len(notification_ids)
+    log.info(f"Archived {archived} notifications")
+    return archived
@@ -0,0 +1,175 @@
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError, ResponseError
+
+from notification import stream
+from notification.types import MessageTarget
+from user.models import User
+from utils import get_logger
+
+log = get_logger(__name__)
+
+# NOTE: A hash of "<field>:<resident_id>" to the change of the counter since the last flush
+PENDING_KEY = "notification:badge:pending"
+FLUSHING_KEY = "notification:badge:flushing"
+FLUSH_ID_FIELD = "flush_id"
+FLUSH_RETENTION = timedelta(days=1)
+
+UNREAD_FIELDS = ["unread_notifications", "staff_unread_notifications"]
+
+
+def get_field(target):
+    return (
+        "staff_unread_notifications"
+        if target == MessageTarget.ADMIN
+        else "unread_notifications"
+    )
+
+
+"""
+Change the unread counters of many users with atomic Redis increments.
+
+The change is made after the current transaction commits, so a rolled back
+notification isn't counted, and it is written to the user rows by flush_badges. When
+Redis is down the rows are updated directly instead. The connected streams of the users
+get a badge_change event.
+
+Args:
+    user_ids (list): The resident IDs of the users.
+    target (MessageTarget): The target of the notifications, admin ones are counted
+        apart.
+    count (int): The change of the counter of every user, negative when read.
+
+Returns:
+    None
+"""
+
+
+def increase(user_ids, target, count=1):
+    user_ids = list(user_ids)
+    if not user_ids or not count:
+        return
+    field = get_field(target)
+
+    def apply():
+        try:
+            pipeline = get_redis_connection("default").pipeline(transaction=False)
+            for user_id in user_ids:
+                pipeline.hincrby(PENDING_KEY, f"{field}:{user_id}", count)
+            pipeline.execute()
+        except RedisError:
+            log.exception("Changing unread counters in redis failed")
+            User.objects.filter(pk__in=user_ids).update(
+                **{field: Greatest(F(field) + count, 0)}
+            )
+        stream.publish(user_ids, "badge_change", {"field": field, "change": count})
+
+    transaction.on_commit(apply)
+
+
+def decrease(user_id, target):
+    increase([user_id], target, -1)
+
+
+"""
+Get the unread counters of a user, with the changes which are not flushed yet.
+
+Args:
+    user (User): The user.
+
+Returns:
+    dict: The unread_notifications and staff_unread_notifications of the user.
+"""
+
+
+def get_unread_notifications(user):
+    counters = {field: getattr(user, field) for field in UNREAD_FIELDS}
+    keys = [f"{field}:{user.pk}" for field in UNREAD_FIELDS]
+    try:
+        # NOTE: The changes of a running flush aren't in the user rows yet
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        pipeline.hmget(PENDING_KEY, keys)
+        pipeline.hmget(FLUSHING_KEY, keys)
+        pending, flushing = pipeline.execute()
+    except RedisError:
+        log.exception("Getting unread counters from redis failed")
+        return counters
+    for field, change, flushing_change in zip(UNREAD_FIELDS, pending, flushing):
+        counters[field] = max(
+            counters[field] + int(change or 0) + int(flushing_change or 0), 0
+        )
+    return counters
+
+
+def discard_pending_changes():
+    try:
+        get_redis_connection("default").delete(PENDING_KEY, FLUSHING_KEY)
+    except RedisError:
+        log.exception("Discarding pending unread counters in redis failed")
+
+
+def get_pending_changes(redis):
+    # NOTE: A flush which crashed left its changes behind, they are written first
+    if not redis.exists(FLUSHING_KEY):
+        try:
+            redis.rename(PENDING_KEY, FLUSHING_KEY)
+        except ResponseError:
+            # NOTE: Nothing has changed since the last flush
+            return None, {}
+    # NOTE: Kept by a flush which crashed, so its retry is recognized
+    redis.hsetnx(FLUSHING_KEY, FLUSH_ID_FIELD, uuid.uuid4().hex)
+    changes = redis.hgetall(FLUSHING_KEY)
+    return changes.pop(FLUSH_ID_FIELD.encode()).decode(), changes
+
+
+"""
+Write the pending counter changes to the user rows.
+
+The pending hash is renamed atomically before it is read, so increments made during the
+flush go to a new hash and aren't lost. Users with the same change are updated with one
+UPDATE of their counter column only. The hash gets a flush ID which is recorded as a
+BadgeFlush in the transaction of the UPDATEs, so when the hash outlives a committed
+flush, e.g. Redis fails before it is deleted, the next flush drops it instead of
+writing it again.
+
+Returns:
+    int: The number of counters written.
+"""
+
+
+def flush_badges():
+    # NOTE: Imported here, notification.models imports this module
+    from notification.models import BadgeFlush
+
+    redis = get_redis_connection("default")
+    flush_id, changes = get_pending_changes(redis)
+    if flush_id is None:
+        return 0
+    user_ids_by_change = defaultdict(list)
+    for key, change in changes.items():
+        field, user_id = key.decode().split(":", 1)
+        if int(change):
+            user_ids_by_change[(field, int(change))].append(user_id)
+    try:
+        with transaction.atomic():
+            BadgeFlush.objects.create(flush_id=flush_id)
+            for (field, change), user_ids in user_ids_by_change.items():
+                User.objects.filter(pk__in=user_ids).update(
+                    **{field: Greatest(F(field) + change, 0)}
+                )
+            BadgeFlush.objects.filter(
+                created_date__lt=timezone.now() - FLUSH_RETENTION
+            ).delete()
+    except IntegrityError:
+        log.warning(f"Unread counters of flush {flush_id} were written already")
+        changes = {}
+    redis.delete(FLUSHING_KEY)
+    log.info(f"Flushed {len(changes)} unread counters")
+    return len(changes)
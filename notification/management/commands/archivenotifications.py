@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app import settings
+from notification.archive import DEFAULT_CHUNK_SIZE, archive_notifications
+
+"""
+A management command to move the old read notifications to the archive table.
+
+Args:
+    --days (int): The retention in days. Defaults to NOTIFICATION_RETENTION_DAYS.
+    --chunk-size (int): The number of notifications moved per transaction.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Move the old read notifications to the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.NOTIFICATION_RETENTION_DAYS
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        archived = archive_notifications(
+            before=timezone.now() - timedelta(days=options["days"]),
+            chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} notifications"))
@@ -0,0 +1,115 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from feedback.models import Feedback
+from notification.manager import NotificationManager
+from notification.models import Notification
+from notification.types import EntityType
+from user.models import PersonalInformation, User
+
+"""
+A management command to check that notifying many users costs a constant number of
+queries.
+
+For every size, that many staff are created and notified about a feedback inside a
+transaction which is rolled back, so the command can be run against any database. It
+fails when the number of queries changes with the number of recipients.
+
+Args:
+    --recipients (int): The numbers of staff to notify. Defaults to 1 30 300 3000.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Check the number of queries of a notification fan-out per recipient count"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipients", type=int, nargs="+", default=[1, 30, 300, 3000]
+        )
+
+    def handle(self, *args, **options):
+        query_counts = {}
+        for recipients in options["recipients"]:
+            with transaction.atomic():
+                query_counts[recipients] = self.benchmark(recipients)
+                transaction.set_rollback(True)
+
+        if len(set(query_counts.values())) > 1:
+            raise CommandError(
+                f"The number of queries grows with the recipients:::{query_counts}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Notifying costs {query_counts.popitem()[1]} queries besides the "
+                "batched inserts, whatever the number of recipients"
+            )
+        )
+
+    def benchmark(self, recipients):
+        personal_informations = PersonalInformation.objects.bulk_create(
+            [
+                PersonalInformation(
+                    citizen_id=f"8{i:011d}",
+                    full_name=f"Benchmark {i}",
+                    phone_number=f"08{i:08d}",
+                )
+                for i in range(recipients)
+            ],
+            batch_size=1000,
+        )
+        users = User.objects.bulk_create(
+            [
+                User(
+                    resident_id=f"S{i:05d}",
+                    personal_information=personal_information,
+                    is_staff=True,
+                )
+                for i, personal_information in enumerate(personal_informations)
+            ],
+            batch_size=1000,
+        )
+        feedback = Feedback.objects.create(
+            title="Benchmark", content="Benchmark", type="OTHER", author=users[0]
+        )
+        staff_count = User.objects.filter(is_staff=True).count()
+
+        started_at = time.perf_counter()
+        with (
+            CaptureQueriesContext(connection) as queries,
+            TestCase.captureOnCommitCallbacks() as callbacks,
+        ):
+            NotificationManager.create_notification(
+                entity=feedback,
+                entity_type=EntityType.FEEDBACK_POST,
+                sender=users[0],
+                push=False,
+            )
+        elapsed = time.perf_counter() - started_at
+
+        notified = Notification.objects.filter(content__entity_id=feedback.pk).count()
+        if notified != staff_count:
+            raise CommandError(f"{notified} of {staff_count} staff were notified")
+        # NOTE: The counters are bumped in Redis after the commit, which never comes here
+        if not callbacks:
+            raise CommandError("The unread counters were not bumped")
+        # NOTE: bulk_create splits the recipients into batches of the backend's size,
+        # which are counted apart
+        inserts = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith(f'INSERT INTO "{Notification._meta.db_table}"')
+            or query["sql"].startswith(f"INSERT INTO `{Notification._meta.db_table}`")
+        ]
+        self.stdout.write(
+            f"{staff_count} recipients: {len(queries) - len(inserts)} queries "
+            f"and {len(inserts)} batched inserts in {elapsed * 1000:.2f}ms"
+        )
+        return len(queries) - len(inserts)
@@ -0,0 +1,117 @@
+import statistics
+import time
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.pagination import Cursor, LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from app.pagination import KeysetPagination
+from notification.models import Notification, NotificationContent
+from notification.types import EntityType, MessageTarget
+from user.models import PersonalInformation, User
+
+"""
+A management command to compare the latency of deep pages with limit and offset and with
+cursors.
+
+The notifications of one resident are created inside a transaction which is rolled back,
+so the command can be run against any database, then the page at every depth is timed
+with both paginators. The cursor pages should stay flat while the offset ones grow with
+the depth.
+
+Args:
+    --rows (int): The number of notifications. Defaults to 1000000.
+    --depths (int): The depths of the timed pages. Defaults to 0 1000 100000 and the end.
+    --repeat (int): The number of times every page is timed. Defaults to 5.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Compare the latency of deep notification pages with offsets and cursors"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000)
+        parser.add_argument("--depths", type=int, nargs="+")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        depths = options["depths"] or [0, 1000, 100000, rows - 10]
+        with transaction.atomic():
+            user = self.create_notifications(rows)
+            queryset = Notification.objects.filter(recipient=user).order_by("-id")
+            ids = list(queryset.values_list("id", flat=True))
+            for depth in depths:
+                offset = self.time(
+                    LimitOffsetPagination(),
+                    queryset,
+                    {"limit": 10, "offset": depth},
+                    options["repeat"],
+                )
+                cursor = self.time(
+                    KeysetPagination(),
+                    queryset,
+                    {"cursor": self.encode_cursor(ids[depth - 1]) if depth else ""},
+                    options["repeat"],
+                )
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Page at {depth}: offset {offset * 1000:.2f}ms, "
+                        f"cursor {cursor * 1000:.2f}ms"
+                    )
+                )
+            transaction.set_rollback(True)
+
+    def create_notifications(self, rows):
+        personal_information = PersonalInformation.objects.create(
+            citizen_id="099999999999",
+            full_name="Benchmark",
+            phone_number="0899999999",
+        )
+        user = User.objects.create(
+            resident_id="B99999", personal_information=personal_information
+        )
+        content = NotificationContent.objects.create(
+            entity_id="0", entity_type=EntityType.NEWS_POST, message="Benchmark"
+        )
+        for start in range(0, rows, 10000):
+            Notification.objects.bulk_create(
+                [
+                    Notification(
+                        content=content,
+                        recipient=user,
+                        target=MessageTarget.RESIDENT,
+                    )
+                    for _ in range(min(10000, rows - start))
+                ]
+            )
+        return user
+
+    def encode_cursor(self, position):
+        # NOTE: The cursor the previous page hands out, pointing after that notification
+        paginator = KeysetPagination()
+        paginator.base_url = "http://testserver/"
+        url = paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=str(position))
+        )
+        return parse_qs(urlparse(url).query)["cursor"][0]
+
+    def time(self, paginator, queryset, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            request = Request(
+                APIRequestFactory().get(
+                    "/", {key: value for key, value in params.items() if value != ""}
+                )
+            )
+            started_at = time.perf_counter()
+            page = paginator.paginate_queryset(queryset, request)
+            paginator.get_paginated_response([n.pk for n in page])
+            timings.append(time.perf_counter() - started_at)
+        return statistics.median(timings)
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notification.outbox import (
+    DEFAULT_BATCH_SIZE,
+    drain_push_outbox,
+    get_push_outbox_metrics,
+)
+
+"""
+A management command to send the pending push notifications of the outbox.
+
+Args:
+    --batch-size (int): The number of pushes locked per transaction.
+    --forever (bool): Keep polling for new pushes instead of exiting.
+    --interval (float): The number of seconds between polls. Defaults to 1.
+    --stats (bool): Print the queue depth and the delivery latency instead.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Send the pending push notifications through FCM"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--forever", action="store_true")
+        parser.add_argument("--interval", type=float, default=1)
+        parser.add_argument("--stats", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for name, value in get_push_outbox_metrics().items():
+                self.stdout.write(f"{name}: {value}")
+            return
+        while True:
+            sent, failed = drain_push_outbox(batch_size=options["batch_size"])
+            if sent or failed or not options["forever"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Sent {sent} push notifications, {failed} failed"
+                    )
+                )
+            if not options["forever"]:
+                return
+            time.sleep(options["interval"])
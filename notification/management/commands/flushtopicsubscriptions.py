@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notification.tokens import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_VALIDATION_SIZE,
+    flush_topic_subscriptions,
+    validate_tokens,
+)
+
+"""
+A management command to send the queued FCM topic subscriptions.
+
+Args:
+    --batch-size (int): The number of subscriptions locked per transaction.
+    --forever (bool): Keep polling for new subscriptions instead of exiting.
+    --interval (float): The number of seconds between polls. Defaults to 1.
+    --validate (int): Check this many tokens with a dry run afterwards and delete the
+        stale ones.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Send the queued FCM topic subscriptions and prune stale tokens"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--forever", action="store_true")
+        parser.add_argument("--interval", type=float, default=1)
+        parser.add_argument(
+            "--validate", type=int, nargs="?", const=DEFAULT_VALIDATION_SIZE
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = flush_topic_subscriptions(batch_size=options["batch_size"])
+            if sent or failed or not options["forever"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Sent {sent} topic subscriptions, {failed} failed"
+                    )
+                )
+            if not options["forever"]:
+                break
+            time.sleep(options["interval"])
+        if options["validate"]:
+            valid, stale = validate_tokens(limit=options["validate"])
+            self.stdout.write(
+                self.style.SUCCESS(f"{valid} tokens are valid, deleted {stale} stale")
+            )
@@ -0,0 +1,141 @@
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+
+import uvicorn
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from oauth2_provider.models import AccessToken
+
+from app import settings
+from notification import stream
+from user.models import User
+
+"""
+A management command to load test the notification stream with many connections.
+
+The ASGI application is served by uvicorn inside the command with the in-memory broker,
+then the connections are opened with the access token of a user, events are published
+to that user and the time until every connection receives them is measured. The open
+file limit of the shell (ulimit -n) must be above the number of connections.
+
+Args:
+    --resident-id (str): The user the connections are opened as.
+    --connections (int): The number of connections. Defaults to 1000.
+    --events (int): The number of events published. Defaults to 10.
+    --port (int): The port uvicorn listens on. Defaults to 8765.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Load test the notification stream with many concurrent connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--resident-id", required=True)
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument("--events", type=int, default=10)
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(pk=options["resident_id"]).first()
+        if not user:
+            raise CommandError(f"User {options['resident_id']} does not exist")
+        # NOTE: The events only reach connections of this process
+        settings.NOTIFICATION_STREAM_BROKER = "memory"
+        access_token = AccessToken.objects.create(
+            user=user,
+            token=get_random_string(32),
+            expires=timezone.now() + timedelta(hours=1),
+            scope="read write",
+        )
+        try:
+            asyncio.run(self.run(user, access_token.token, options))
+        finally:
+            access_token.delete()
+
+    async def run(self, user, token, options):
+        from app.asgi import application
+
+        server = uvicorn.Server(
+            uvicorn.Config(
+                application,
+                port=options["port"],
+                lifespan="off",
+                log_level="warning",
+                timeout_keep_alive=60,
+            )
+        )
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        connections = []
+        try:
+            started_at = time.perf_counter()
+            connections = await asyncio.gather(
+                *[
+                    self.connect(options["port"], token)
+                    for _ in range(options["connections"])
+                ]
+            )
+            broker = stream.get_broker()
+            self.stdout.write(
+                f"Opened {broker.count()} connections in "
+                f"{time.perf_counter() - started_at:.2f}s"
+            )
+            latencies = []
+            for _ in range(options["events"]):
+                sent_at = time.perf_counter()
+                broker.publish_each(
+                    [(user.pk, {"event": "load_test", "data": {"sent_at": sent_at}})]
+                )
+                received_at = await asyncio.gather(
+                    *[self.receive(reader) for reader, _ in connections]
+                )
+                latencies.extend(at - sent_at for at in received_at)
+            latencies.sort()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Delivered {len(latencies)} events to {len(connections)} "
+                    f"connections: p50 {statistics.median(latencies) * 1000:.2f}ms, "
+                    f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f}ms, "
+                    f"max {latencies[-1] * 1000:.2f}ms"
+                )
+            )
+        finally:
+            for _, writer in connections:
+                writer.close()
+            server.should_exit = True
+            await serving
+
+    async def connect(self, port, token):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            (
+                "GET /notifications/stream/ HTTP/1.1\r\n"
+                "Host: localhost\r\n"
+                f"Authorization: Bearer {token}\r\n"
+                "Accept: text/event-stream\r\n\r\n"
+            ).encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if b" 200 " not in status_line:
+            raise CommandError(f"Connecting failed: {status_line.decode().strip()}")
+        # NOTE: The stream is subscribed once its first event has been sent
+        while not (line := await reader.readline()).startswith(b"event: badge"):
+            if not line:
+                raise CommandError("The stream was closed")
+        return reader, writer
+
+    async def receive(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise CommandError("The stream was closed")
+            if line.startswith(b"data: ") and b"sent_at" in line:
+                return time.perf_counter()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from notification.manager import NotificationManager
+
+"""
+A management command to recompute the unread notification counters of every user from
+their unread notifications, e.g. after Redis lost the pending changes.
+
+Returns:
+    None
+"""
+
+
+class Command(BaseCommand):
+    help = "Recompute the unread notification counters of every user"
+
+    def handle(self, *args, **options):
+        fixed = NotificationManager.reconcile_unread_notifications()
+        self.stdout.write(
+            self.style.SUCCESS(f"Fixed the unread counters of {fixed} users")
+        )
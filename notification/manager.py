@@ -1,17 +1,27 @@
 import json
+import uuid
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
 
 from app import settings
-from firebase import message
+from notification import badge, stream
 from notification.models import (
-    FCMToken,
+    BroadcastCursor,
+    BroadcastReceipt,
     Notification,
     NotificationContent,
     NotificationSender,
+    PushMessage,
 )
 from notification.serializers import LINK_MAPPING, NotificationContentSerializer
 from notification.types import (
     ACTION_MESSAGE_MAPPING,
+    BROADCAST_TARGETS,
     ENTITY_TARGET,
+    EntityType,
     MessageTarget,
 )
 from user.models import User
@@ -23,7 +33,7 @@ log = get_logger(__name__)
 def get_users_by_target(target=None, filters=None):
     if filters is None:
         filters = {}
-    users = []
+    users = User.objects.none()
     if target == MessageTarget.ADMIN:
         users = User.objects.filter(is_staff=True, **filters).distinct()
     elif target in [MessageTarget.RESIDENTS, MessageTarget.RESIDENT]:
@@ -34,9 +44,43 @@ def get_users_by_target(target=None, filters=None):
 
 
 class NotificationManager:
+    @staticmethod
+    def get_stream_data(content, target):
+        return {
+            "content": NotificationContentSerializer(content).data,
+            "message": content.message,
+            "target": str(target),
+        }
+
+    """
+    Notify the users targeted by an entity type about an entity.
+
+    The recipients are written with one bulk insert and their unread counters are bumped
+    in Redis, so the number of queries doesn't grow with the number of recipients.
+    Broadcasts to every user are stored once, without any recipient. The push is queued
+    in the same transaction and sent by the outbox worker, see notification.outbox, and
+    the connected streams get a notification event once it commits.
+
+    Args:
+        entity: The entity, e.g. a feedback.
+        entity_type (EntityType): The type of the entity, which decides the target.
+        sender (User, optional): Defaults to the first staff.
+        image (str, optional): Defaults to the avatar of the sender.
+        filters (dict, optional): The filters of the recipients.
+        push (bool): Whether the notification is pushed through FCM.
+
+    Returns:
+        None
+    """
+
     @staticmethod
     def create_notification(
-        entity=None, entity_type=None, sender=None, image=None, filters=None
+        entity=None,
+        entity_type=None,
+        sender=None,
+        image=None,
+        filters=None,
+        push=True,
     ):
         if filters is None:
             filters = {}
@@ -49,35 +93,328 @@ class NotificationManager:
         target = ENTITY_TARGET[str(entity_type)]
         log.info(f"Sender notification:::{sender.__str__()}")
         log.info(f"Target notification:::{target}")
-        content = NotificationContent.objects.create(
-            entity_id=str(entity.pk),
-            entity_type=entity_type,
-            image=image,
-        )
-        NotificationSender.objects.create(sender=sender, content=content)
-        users = get_users_by_target(target=target, filters=filters)
-        for user in users:
-            Notification.objects.create(recipient=user, content=content, target=target)
-        tokens = None
-        if len(users) > 0 and target == MessageTarget.RESIDENT:
-            tokens = (
-                FCMToken.objects.filter(
-                    user=users[0], device_type=FCMToken.DeviceType.ANDROID
+        with transaction.atomic():
+            content = NotificationContent(
+                entity_id=str(entity.pk),
+                entity_type=entity_type,
+                image=image,
+            )
+            content.message = content.render_message(entity)
+            content.save()
+            NotificationSender.objects.create(sender=sender, content=content)
+            users = []
+            channels = [stream.BROADCAST_CHANNEL]
+            if target in BROADCAST_TARGETS and not filters:
+                # NOTE: Stored once, the recipients read it through their BroadcastCursor
+                Notification.objects.create(content=content, target=target)
+            else:
+                recipients = get_users_by_target(target=target, filters=filters)
+                users = list(recipients.values_list("pk", flat=True))
+                Notification.objects.bulk_create(
+                    [
+                        Notification(
+                            recipient_id=user_id, content=content, target=target
+                        )
+                        for user_id in users
+                    ],
+                    batch_size=1000,
+                )
+                if entity_type != EntityType.CHAT_SEND_MESSAGE:
+                    badge.increase(users, target)
+                channels = users
+            stream.publish(
+                channels,
+                "notification",
+                NotificationManager.get_stream_data(content, target),
+            )
+            if push and (target != MessageTarget.RESIDENT or users):
+                PushMessage.objects.create(
+                    target=target,
+                    recipient_id=users[0] if target == MessageTarget.RESIDENT else None,
+                    title=content.message,
+                    link=(
+                        LINK_MAPPING[entity_type](str(entity.pk))
+                        if entity_type in LINK_MAPPING
+                        else None
+                    ),
+                    image=image,
+                    data={
+                        "content": json.dumps(
+                            NotificationContentSerializer(content).data
+                        )
+                    },
                 )
-                .values_list("token", flat=True)
-                .all()
+
+    """
+    Notify many residents at once, each about their own entity.
+
+    Every table is written with one bulk insert and the unread counters are bumped in
+    Redis, instead of a create_notification call per entity.
+
+    Args:
+        entities (list): The entities, e.g. invoices.
+        entity_type (EntityType): The type of the entities, targeted at a resident.
+        recipient_ids (list): The resident ID of the recipient of each entity.
+        sender (User, optional): Defaults to the first staff.
+        image (str, optional): Defaults to the avatar of the sender.
+
+    Returns:
+        int: The number of notifications created.
+    """
+
+    @staticmethod
+    def create_notifications(
+        entities, entity_type, recipient_ids, sender=None, image=None
+    ):
+        if not entity_type or len(entities) != len(recipient_ids):
+            raise ValueError("every entity must have a recipient")
+        if not entities:
+            return 0
+        if not sender:
+            sender = User.objects.filter(is_staff=True).first()
+        if not image:
+            image = sender.avatar_url or settings.LOGO
+        target = ENTITY_TARGET[str(entity_type)]
+        if target != MessageTarget.RESIDENT:
+            raise ValueError("entity type must target a resident")
+
+        with transaction.atomic():
+            contents = NotificationManager.bulk_create_contents(
+                entities, entity_type, image
             )
-        message.send_notification(
-            tokens=tokens,
-            target=target,
-            title=ACTION_MESSAGE_MAPPING[entity_type](
-                entity=entity, action=content.get_entity_type_display().lower()
-            ),
-            link=(
-                LINK_MAPPING[entity_type](str(entity.pk))
-                if entity_type in LINK_MAPPING
-                else None
-            ),
-            image=image,
-            data={"content": json.dumps(NotificationContentSerializer(content).data)},
+            NotificationSender.objects.bulk_create(
+                [
+                    NotificationSender(sender=sender, content=content)
+                    for content in contents
+                ],
+                batch_size=1000,
+            )
+            Notification.objects.bulk_create(
+                [
+                    Notification(
+                        recipient_id=recipient_id, content=content, target=target
+                    )
+                    for recipient_id, content in zip(recipient_ids, contents)
+                ],
+                batch_size=1000,
+            )
+            recipients_by_count = defaultdict(list)
+            for recipient_id, count in Counter(recipient_ids).items():
+                recipients_by_count[count].append(recipient_id)
+            for count, ids in recipients_by_count.items():
+                badge.increase(ids, target, count)
+            PushMessage.objects.bulk_create(
+                [
+                    PushMessage(
+                        target=target,
+                        recipient_id=recipient_id,
+                        title=content.message,
+                        link=(
+                            LINK_MAPPING[entity_type](content.entity_id)
+                            if entity_type in LINK_MAPPING
+                            else None
+                        ),
+                        image=image,
+                        data={
+                            "content": json.dumps(
+                                NotificationContentSerializer(content).data
+                            )
+                        },
+                    )
+                    for recipient_id, content in zip(recipient_ids, contents)
+                ],
+                batch_size=1000,
+            )
+            stream.publish_each(
+                [
+                    (
+                        recipient_id,
+                        "notification",
+                        NotificationManager.get_stream_data(content, target),
+                    )
+                    for recipient_id, content in zip(recipient_ids, contents)
+                ]
+            )
+
+        log.info(f"Created {len(contents)} {entity_type} notifications")
+        return len(contents)
+
+    """
+    Insert the contents of many entities with one bulk insert.
+
+    MySQL doesn't return the IDs of bulk inserted rows, so there the contents are tagged
+    with a batch ID nobody else uses and read back by it, in the order of their IDs,
+    which is the order of the rows.
+
+    Args:
+        entities (list): The entities.
+        entity_type (EntityType): The type of the entities.
+        image (str): The image of the contents.
+
+    Returns:
+        list: The contents, in the order of the entities.
+    """
+
+    @staticmethod
+    def bulk_create_contents(entities, entity_type, image):
+        contents = [
+            NotificationContent(
+                entity_id=str(entity.pk), entity_type=entity_type, image=image
+            )
+            for entity in entities
+        ]
+        for entity, content in zip(entities, contents):
+            content.message = content.render_message(entity)
+        if connection.features.can_return_rows_from_bulk_insert:
+            return NotificationContent.objects.bulk_create(contents, batch_size=1000)
+        batch_id = uuid.uuid4().hex
+        for content in contents:
+            content.batch_id = batch_id
+        with transaction.atomic():
+            NotificationContent.objects.bulk_create(contents, batch_size=1000)
+            content_ids = (
+                NotificationContent.objects.filter(batch_id=batch_id)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            for content, content_id in zip(contents, content_ids, strict=True):
+                content.id = content_id
+        return contents
+
+    """
+    Mark many notifications of a user as read at once.
+
+    The notifications of the user are marked with one UPDATE which only matches unread
+    ones, so when several devices read at the same time every notification is counted
+    once, and the counter is lowered by the number of rows updated. Broadcasts are read
+    by moving the cursor of the user forward, or with receipts for a list of contents,
+    and counted too.
+
+    Args:
+        user (User): The user.
+        for_admin (bool): Whether the admin notifications are read instead of the others.
+        content_ids (list, optional): Only read the notifications of these contents.
+        before_id (int, optional): Only read the notifications up to this ID.
+
+    Returns:
+        int: The number of notifications and broadcasts of the user marked as read.
+    """
+
+    @staticmethod
+    def read_notifications(user, for_admin=False, content_ids=None, before_id=None):
+        notifications = Notification.objects.filter(
+            recipient=user, has_been_read=False
+        ).exclude(content__entity_type=EntityType.CHAT_SEND_MESSAGE)
+        if for_admin:
+            notifications = notifications.filter(target=MessageTarget.ADMIN)
+        else:
+            notifications = notifications.exclude(target=MessageTarget.ADMIN)
+        if content_ids is not None:
+            notifications = notifications.filter(content_id__in=content_ids)
+        if before_id is not None:
+            notifications = notifications.filter(id__lte=before_id)
+        with transaction.atomic():
+            count = notifications.update(
+                has_been_read=True, updated_date=timezone.now()
+            )
+            badge.increase(
+                [user.pk],
+                MessageTarget.ADMIN if for_admin else MessageTarget.RESIDENT,
+                -count,
+            )
+            if not for_admin:
+                count += NotificationManager.read_broadcasts(
+                    user, content_ids, before_id
+                )
+        return count
+
+    """
+    Mark the broadcasts of a user as read.
+
+    The cursor of the user is locked, so when several devices read at the same time
+    every broadcast is counted once.
+
+    Args:
+        user (User): The user.
+        content_ids (list, optional): Only read the broadcasts of these contents, with
+            receipts, instead of moving the cursor.
+        before_id (int, optional): Only read the broadcasts up to this ID.
+
+    Returns:
+        int: The number of broadcasts marked as read.
+    """
+
+    @staticmethod
+    def read_broadcasts(user, content_ids=None, before_id=None):
+        cursor = BroadcastCursor.objects.select_for_update().get(
+            pk=BroadcastCursor.get_for(user).pk
         )
+        broadcasts = cursor.get_unread()
+        if before_id is not None:
+            broadcasts = broadcasts.filter(id__lte=before_id)
+        if content_ids is None:
+            last_read_id = (
+                BroadcastCursor.get_latest_broadcast_id()
+                if before_id is None
+                else before_id
+            )
+            # NOTE: Only ever moves forward, whichever device reads last
+            if last_read_id <= cursor.last_read_id:
+                return 0
+            count = broadcasts.count()
+            cursor.last_read_id = last_read_id
+            cursor.save(update_fields=["last_read_id"])
+            return count
+        notification_ids = list(
+            broadcasts.filter(content_id__in=content_ids).values_list("id", flat=True)
+        )
+        BroadcastReceipt.objects.bulk_create(
+            [
+                BroadcastReceipt(notification_id=notification_id, user=user)
+                for notification_id in notification_ids
+            ],
+            ignore_conflicts=True,
+        )
+        return len(notification_ids)
+
+    """
+    Recompute the unread counters of every user with one grouped query over their
+    unread notifications.
+
+    The pending changes in Redis are dropped first, they are already part of the
+    recomputed counts. A notification created meanwhile may be counted twice, running it
+    again when it is quiet fixes that.
+
+    Returns:
+        int: The number of users whose counters were wrong.
+    """
+
+    @staticmethod
+    def reconcile_unread_notifications():
+        badge.discard_pending_changes()
+        counts = {
+            row["recipient_id"]: (row["unread"], row["staff_unread"])
+            for row in Notification.objects.filter(
+                recipient__isnull=False, has_been_read=False
+            )
+            .exclude(content__entity_type=EntityType.CHAT_SEND_MESSAGE)
+            .values("recipient_id")
+            .annotate(
+                unread=Count("id", filter=~Q(target=MessageTarget.ADMIN)),
+                staff_unread=Count("id", filter=Q(target=MessageTarget.ADMIN)),
+            )
+        }
+        user_ids_by_counts = defaultdict(list)
+        for user_id, unread, staff_unread in User.objects.values_list(
+            "pk", "unread_notifications", "staff_unread_notifications"
+        ):
+            expected = counts.get(user_id, (0, 0))
+            if (unread, staff_unread) != expected:
+                user_ids_by_counts[expected].append(user_id)
+        with transaction.atomic():
+            for (unread, staff_unread), ids in user_ids_by_counts.items():
+                User.objects.filter(pk__in=ids).update(
+                    unread_notifications=unread,
+                    staff_unread_notifications=staff_unread,
+                )
+        return sum(len(ids) for ids in user_ids_by_counts.values())
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0021_alter_notificationcontent_entity_type"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notificationcontent",
+            name="entity_type",
+            field=models.CharField(
+                choices=[
+                    ("SERVICE_REGISTER", "Đăng ký dịch vụ"),
+                    ("SERVICE_APPROVED", "Đã duyệt đăng ký"),
+                    ("SERVICE_REJECTED", "Đã từ chối đăng ký"),
+                    ("REISSUE_APPROVED", "Đã duyệt cấp lại"),
+                    ("REISSUE_REJECTED", "Đã từ chối cấp lại"),
+                    ("SERVICE_REISSUE", "Cấp lại"),
+                    ("FEEDBACK_POST", "Đăng phản ánh"),
+                    ("INVOICE_PROOF_IMAGE_PAYMENT", "Thanh toán"),
+                    ("INVOICE_PROOF_IMAGE_APPROVED", "Đã duyệt thanh toán"),
+                    ("INVOICE_PROOF_IMAGE_REJECTED", "Đã từ chối thanh toán"),
+                    ("NEWS_POST", "Đăng tin tức"),
+                    ("INVOICE_CREATE", "Nhận hóa đơn"),
+                    ("INVOICE_OVERDUE", "Hóa đơn quá hạn"),
+                    ("LOCKER_ITEM_ADD", "Đã nhận giúp"),
+                    ("CHAT_SEND_MESSAGE", ""),
+                ],
+                max_length=100,
+                verbose_name="Loại thông báo",
+            ),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_broadcast_cursors(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    BroadcastCursor = apps.get_model("notification", "BroadcastCursor")
+    BroadcastCursor.objects.bulk_create(
+        [
+            BroadcastCursor(user_id=user_id)
+            for user_id in User.objects.values_list("pk", flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0022_alter_notificationcontent_entity_type"),
+        (
+            "user",
+            "0002_rename_number_of_unread_notifications_user_unread_notifications_and_more",
+        ),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BroadcastCursor",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Người dùng",
+                    ),
+                ),
+                (
+                    "visible_from",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Hiển thị từ"
+                    ),
+                ),
+                (
+                    "last_read_id",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Đã đọc đến"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Con trỏ thông báo chung",
+                "verbose_name_plural": "Con trỏ thông báo chung",
+            },
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="recipient",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Người nhận",
+            ),
+        ),
+        migrations.CreateModel(
+            name="BroadcastReceipt",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_date",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo"),
+                ),
+                (
+                    "updated_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật"),
+                ),
+                (
+                    "notification",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="notification.notification",
+                        verbose_name="Thông báo",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Người dùng",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Đã đọc thông báo chung",
+                "verbose_name_plural": "Đã đọc thông báo chung",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="broadcastreceipt",
+            constraint=models.UniqueConstraint(
+                fields=("user", "notification"), name="unique_broadcast_receipt"
+            ),
+        ),
+        migrations.RunPython(create_broadcast_cursors, migrations.RunPython.noop),
+    ]
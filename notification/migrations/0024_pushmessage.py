@@ -0,0 +1,105 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0023_broadcastcursor"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PushMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_date",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo"),
+                ),
+                (
+                    "updated_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật"),
+                ),
+                (
+                    "target",
+                    models.CharField(
+                        choices=[
+                            ("ADMIN", "Ban quản trị"),
+                            ("RESIDENT", "Cư dân"),
+                            ("RESIDENTS", "Nhiều cư dân"),
+                            ("ALL", "Tất cả"),
+                        ],
+                        max_length=50,
+                        verbose_name="Đối tượng",
+                    ),
+                ),
+                ("title", models.TextField(verbose_name="Tiêu đề")),
+                (
+                    "image",
+                    models.CharField(
+                        blank=True, max_length=200, null=True, verbose_name="Ảnh"
+                    ),
+                ),
+                (
+                    "link",
+                    models.CharField(
+                        blank=True, max_length=255, null=True, verbose_name="Liên kết"
+                    ),
+                ),
+                ("data", models.JSONField(default=dict, verbose_name="Dữ liệu")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Đang chờ gửi"),
+                            ("SENT", "Đã gửi"),
+                            ("FAILED", "Thất bại"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="Trạng thái",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Số lần gửi"),
+                ),
+                ("error", models.TextField(blank=True, null=True, verbose_name="Lỗi")),
+                (
+                    "sent_date",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Gửi lúc"),
+                ),
+                (
+                    "recipient",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Người nhận",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Thông báo đẩy",
+                "verbose_name_plural": "Thông báo đẩy",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="notificatio_status_16bc64_idx"
+                    )
+                ],
+            },
+        ),
+    ]
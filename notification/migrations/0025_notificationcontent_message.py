@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0024_pushmessage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationcontent",
+            name="message",
+            field=models.TextField(blank=True, null=True, verbose_name="Nội dung"),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0025_notificationcontent_message"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedNotification",
+            fields=[
+                (
+                    "id",
+                    models.PositiveBigIntegerField(primary_key=True, serialize=False),
+                ),
+                (
+                    "has_been_read",
+                    models.BooleanField(default=False, verbose_name="Đã đọc"),
+                ),
+                (
+                    "target",
+                    models.CharField(
+                        choices=[
+                            ("ADMIN", "Ban quản trị"),
+                            ("RESIDENT", "Cư dân"),
+                            ("RESIDENTS", "Nhiều cư dân"),
+                            ("ALL", "Tất cả"),
+                        ],
+                        max_length=50,
+                        verbose_name="Đối tượng",
+                    ),
+                ),
+                ("created_date", models.DateTimeField(verbose_name="Ngày tạo")),
+                ("updated_date", models.DateTimeField(verbose_name="Ngày cập nhật")),
+                (
+                    "archived_date",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Ngày lưu trữ"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Thông báo đã lưu trữ",
+                "verbose_name_plural": "Thông báo đã lưu trữ",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["created_date"], name="notificatio_created_482707_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivednotification",
+            name="content",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                to="notification.notificationcontent",
+                verbose_name="Thông báo",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivednotification",
+            name="recipient",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Người nhận",
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0026_archivednotification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fcmtoken",
+            name="validated_date",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="TopicSubscription",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_date",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo"),
+                ),
+                (
+                    "updated_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật"),
+                ),
+                ("token", models.CharField(max_length=163, verbose_name="Token")),
+                ("topic", models.CharField(max_length=50, verbose_name="Chủ đề")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("SUBSCRIBE", "Đăng ký"),
+                            ("UNSUBSCRIBE", "Hủy đăng ký"),
+                        ],
+                        max_length=20,
+                        verbose_name="Thao tác",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("PENDING", "Đang chờ"), ("FAILED", "Thất bại")],
+                        default="PENDING",
+                        max_length=20,
+                        verbose_name="Trạng thái",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Số lần thử"),
+                ),
+                ("error", models.TextField(blank=True, null=True, verbose_name="Lỗi")),
+            ],
+            options={
+                "verbose_name": "Đăng ký chủ đề",
+                "verbose_name_plural": "Đăng ký chủ đề",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="notificatio_status_be613f_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0027_topicsubscription"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pushmessage",
+            name="tokens",
+            field=models.JSONField(
+                blank=True, null=True, verbose_name="Thiết bị còn lại"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0028_pushmessage_tokens"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BadgeFlush",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_date",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo"),
+                ),
+                (
+                    "updated_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Ngày cập nhật"),
+                ),
+                (
+                    "flush_id",
+                    models.CharField(
+                        max_length=32, unique=True, verbose_name="Mã lần ghi"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Lần ghi số thông báo chưa đọc",
+                "verbose_name_plural": "Lần ghi số thông báo chưa đọc",
+            },
+        ),
+    ]
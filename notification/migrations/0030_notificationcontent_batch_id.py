@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0029_badgeflush"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationcontent",
+            name="batch_id",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=32,
+                null=True,
+                verbose_name="Mã lô",
+            ),
+        ),
+    ]
@@ -1,9 +1,23 @@
+from collections import defaultdict
+
 from django.core.validators import MinLengthValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from app.models import MyBaseModel
-from notification.types import EntityType, MessageTarget
+from notification import badge
+from notification.types import (
+    ACTION_MESSAGE_MAPPING,
+    BROADCAST_TARGETS,
+    ENTITY_TYPE_MODEL_MAPPING,
+    ENTITY_TYPE_RELATED_MAPPING,
+    EntityType,
+    MessageTarget,
+)
 from user.models import User
 
 
@@ -17,10 +31,20 @@ class FCMToken(MyBaseModel):
         max_length=163, unique=True, validators=[MinLengthValidator(163)]
     )
     device_type = models.CharField(max_length=10, choices=DeviceType.choices)
+    # NOTE: The last time FCM accepted the token in a dry run, see notification.tokens
+    validated_date = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self) -> str:
         return f"{self.user.__str__()} - {self.device_type}"
 
+    @staticmethod
+    def get_topic(user, device_type):
+        return (
+            "admin"
+            if user.is_staff and device_type == FCMToken.DeviceType.WEB
+            else "resident"
+        )
+
 
 class NotificationContent(MyBaseModel):
     image = models.CharField(
@@ -33,11 +57,65 @@ class NotificationContent(MyBaseModel):
         verbose_name=_("Loại thông báo"), choices=EntityType.choices, max_length=100
     )
     entity_id = models.CharField(verbose_name=_("Mã thực thể"), max_length=100)
+    # NOTE: Rendered when the notification is created, it is empty for older ones
+    message = models.TextField(verbose_name=_("Nội dung"), null=True, blank=True)
+    # NOTE: Tags a bulk insert, which is read back by it on MySQL
+    batch_id = models.CharField(
+        verbose_name=_("Mã lô"), max_length=32, null=True, blank=True, db_index=True
+    )
 
     class Meta:
         verbose_name = _("Nội dung thông báo")
         verbose_name_plural = _("Nội dung thông báo")
 
+    def render_message(self, entity):
+        return ACTION_MESSAGE_MAPPING[self.entity_type](
+            entity, self.get_entity_type_display().lower()
+        )
+
+    """
+    Get the messages of many contents.
+
+    The stored messages are used as they are. The entities of the others are loaded with
+    one in_bulk query per model, along with the relations their messages walk.
+
+    Args:
+        contents (list): The contents.
+
+    Returns:
+        dict: The message of every content by its ID, None if its entity is deleted.
+    """
+
+    @staticmethod
+    def get_messages(contents):
+        messages = {}
+        contents_by_model = defaultdict(list)
+        for content in contents:
+            if content.message:
+                messages[content.pk] = content.message
+            else:
+                contents_by_model[
+                    ENTITY_TYPE_MODEL_MAPPING[content.entity_type]
+                ].append(content)
+        for model, model_contents in contents_by_model.items():
+            related = {
+                field
+                for content in model_contents
+                for field in ENTITY_TYPE_RELATED_MAPPING.get(content.entity_type, [])
+            }
+            entities = model.objects.select_related(*related).in_bulk(
+                {
+                    model._meta.pk.to_python(content.entity_id)
+                    for content in model_contents
+                }
+            )
+            for content in model_contents:
+                entity = entities.get(model._meta.pk.to_python(content.entity_id))
+                messages[content.pk] = (
+                    content.render_message(entity) if entity else None
+                )
+        return messages
+
     def __str__(self) -> str:
         return f"{self.get_entity_type_display()} - {self.entity_id}"
 
@@ -68,11 +146,14 @@ class Notification(MyBaseModel):
         on_delete=models.DO_NOTHING,
         db_index=True,
     )
+    # NOTE: Broadcasts are stored once without a recipient, see BroadcastCursor
     recipient = models.ForeignKey(
         verbose_name=_("Người nhận"),
         to=User,
         on_delete=models.DO_NOTHING,
         db_index=True,
+        null=True,
+        blank=True,
     )
     has_been_read = models.BooleanField(
         verbose_name=_("Đã đọc"), default=False
@@ -87,33 +168,364 @@ class Notification(MyBaseModel):
     class Meta:
         verbose_name = _("Thông báo")
         verbose_name_plural = _("Thông báo")
+        indexes = [models.Index(fields=["created_date"])]
+
+    @property
+    def is_broadcast(self):
+        return self.recipient_id is None
 
     def save(self, *args, **kwargs):
         is_new = not self.pk
         super().save(*args, **kwargs)
-        if is_new:
-            if self.content.entity_type != EntityType.CHAT_SEND_MESSAGE:
-                if self.target == MessageTarget.ADMIN:
-                    self.recipient.staff_unread_notifications += 1
-                else:
-                    self.recipient.unread_notifications += 1
-            self.recipient.save()
-
-    def read(self):
+        if (
+            is_new
+            and not self.is_broadcast
+            and self.content.entity_type != EntityType.CHAT_SEND_MESSAGE
+        ):
+            badge.increase([self.recipient_id], self.target)
+
+    def read(self, user=None):
+        if self.is_broadcast:
+            return BroadcastReceipt.read(self, user)
         if self.has_been_read:
             return False
         self.has_been_read = True
-        if (
-            self.recipient.unread_notifications > 0
-            or self.recipient.staff_unread_notifications > 0
-        ):
-            if self.target == MessageTarget.ADMIN:
-                self.recipient.staff_unread_notifications -= 1
-            else:
-                self.recipient.unread_notifications -= 1
-            self.recipient.save()
-        self.save()
+        self.save(update_fields=["has_been_read", "updated_date"])
+        badge.decrease(self.recipient_id, self.target)
         return True
 
     def __str__(self) -> str:
+        if self.is_broadcast:
+            return f"{self.get_target_display()} - {self.content.__str__()}"
         return f"{self.recipient.__str__()} - {self.content.__str__()}"
+
+
+"""
+A notification moved out of the hot notification table by notification.archive.
+
+It keeps the ID, the dates and the read state of the notification, so the history of a
+user is listed like their recent notifications.
+"""
+
+
+class ArchivedNotification(models.Model):
+    id = models.PositiveBigIntegerField(primary_key=True)
+    content = models.ForeignKey(
+        verbose_name=_("Thông báo"),
+        to=NotificationContent,
+        on_delete=models.DO_NOTHING,
+        db_index=True,
+    )
+    recipient = models.ForeignKey(
+        verbose_name=_("Người nhận"),
+        to=User,
+        on_delete=models.CASCADE,
+        db_index=True,
+        null=True,
+        blank=True,
+    )
+    has_been_read = models.BooleanField(verbose_name=_("Đã đọc"), default=False)
+    target = models.CharField(
+        verbose_name=_("Đối tượng"), choices=MessageTarget.choices, max_length=50
+    )
+    created_date = models.DateTimeField(_("Ngày tạo"))
+    updated_date = models.DateTimeField(_("Ngày cập nhật"))
+    archived_date = models.DateTimeField(_("Ngày lưu trữ"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Thông báo đã lưu trữ")
+        verbose_name_plural = _("Thông báo đã lưu trữ")
+
+    def __str__(self) -> str:
+        return f"{self.recipient_id or self.get_target_display()} - {self.content_id}"
+
+
+"""
+The read cursor of a user over the broadcast notifications.
+
+A broadcast is stored once as a notification without a recipient. Users see the
+broadcasts after visible_from, those up to last_read_id are read, and the ones above it
+are read if they have a receipt.
+"""
+
+
+class BroadcastCursor(models.Model):
+    user = models.OneToOneField(
+        verbose_name=_("Người dùng"),
+        to=User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    visible_from = models.PositiveBigIntegerField(_("Hiển thị từ"), default=0)
+    last_read_id = models.PositiveBigIntegerField(_("Đã đọc đến"), default=0)
+
+    class Meta:
+        verbose_name = _("Con trỏ thông báo chung")
+        verbose_name_plural = _("Con trỏ thông báo chung")
+
+    @staticmethod
+    def get_latest_broadcast_id():
+        return (
+            Notification.objects.filter(recipient__isnull=True)
+            .order_by("-id")
+            .values_list("id", flat=True)
+            .first()
+            or 0
+        )
+
+    """
+    Get the cursor of a user, creating it if the user has none yet.
+
+    Users created without the post_save receiver, e.g. with bulk_create, get a cursor
+    which starts at the latest broadcast, like the ones created with it.
+
+    Args:
+        user (User): The user.
+
+    Returns:
+        BroadcastCursor: The cursor of the user.
+    """
+
+    @classmethod
+    def get_for(cls, user):
+        cursor = cls.objects.filter(user=user).first()
+        if cursor:
+            return cursor
+        try:
+            with transaction.atomic():
+                return cls.objects.create(
+                    user=user, visible_from=cls.get_latest_broadcast_id()
+                )
+        except IntegrityError:
+            return cls.objects.get(user=user)
+
+    def get_broadcasts(self):
+        return Notification.objects.filter(
+            recipient__isnull=True,
+            target__in=BROADCAST_TARGETS,
+            id__gt=self.visible_from,
+        )
+
+    def get_unread(self):
+        return (
+            self.get_broadcasts()
+            .filter(id__gt=self.last_read_id)
+            .exclude(content__entity_type=EntityType.CHAT_SEND_MESSAGE)
+            .exclude(
+                Exists(
+                    BroadcastReceipt.objects.filter(
+                        notification=OuterRef("pk"), user_id=self.user_id
+                    )
+                )
+            )
+        )
+
+    """
+    Count the broadcasts the user hasn't read yet.
+
+    Returns:
+        int: The number of unread broadcasts.
+    """
+
+    def count_unread(self):
+        return self.get_unread().count()
+
+    def __str__(self):
+        return f"{self.user_id} - {self.last_read_id}"
+
+
+class BroadcastReceipt(MyBaseModel):
+    notification = models.ForeignKey(
+        verbose_name=_("Thông báo"), to=Notification, on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        verbose_name=_("Người dùng"), to=User, on_delete=models.CASCADE
+    )
+
+    class Meta:
+        verbose_name = _("Đã đọc thông báo chung")
+        verbose_name_plural = _("Đã đọc thông báo chung")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "notification"], name="unique_broadcast_receipt"
+            )
+        ]
+
+    """
+    Mark a broadcast as read by a user.
+
+    Args:
+        notification (Notification): The broadcast.
+        user (User): The reader.
+
+    Returns:
+        bool: Whether the broadcast was unread.
+    """
+
+    @classmethod
+    def read(cls, notification, user):
+        if not user:
+            raise ValueError("user must not be null")
+        if notification.id <= BroadcastCursor.get_for(user).last_read_id:
+            return False
+        _, created = cls.objects.get_or_create(notification=notification, user=user)
+        return created
+
+    def __str__(self):
+        return f"{self.user_id} - {self.notification_id}"
+
+
+"""
+A push notification waiting to be sent through FCM.
+
+It is written in the same transaction as its notification, and sent after the commit
+by notification.outbox.drain_push_outbox, so requests never wait on FCM.
+"""
+
+
+class PushMessage(MyBaseModel):
+    MAX_ATTEMPTS = 5
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", _("Đang chờ gửi")
+        SENT = "SENT", _("Đã gửi")
+        FAILED = "FAILED", _("Thất bại")
+
+    target = models.CharField(
+        verbose_name=_("Đối tượng"), choices=MessageTarget.choices, max_length=50
+    )
+    recipient = models.ForeignKey(
+        verbose_name=_("Người nhận"),
+        to=User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    title = models.TextField(verbose_name=_("Tiêu đề"))
+    image = models.CharField(
+        verbose_name=_("Ảnh"), max_length=200, null=True, blank=True
+    )
+    link = models.CharField(
+        verbose_name=_("Liên kết"), max_length=255, null=True, blank=True
+    )
+    data = models.JSONField(verbose_name=_("Dữ liệu"), default=dict)
+    status = models.CharField(
+        verbose_name=_("Trạng thái"),
+        choices=Status.choices,
+        default=Status.PENDING,
+        max_length=20,
+    )
+    attempts = models.PositiveIntegerField(_("Số lần gửi"), default=0)
+    error = models.TextField(_("Lỗi"), null=True, blank=True)
+    sent_date = models.DateTimeField(_("Gửi lúc"), null=True, blank=True)
+    # NOTE: The tokens left to send to after a partly failed try, None for every token
+    tokens = models.JSONField(_("Thiết bị còn lại"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Thông báo đẩy")
+        verbose_name_plural = _("Thông báo đẩy")
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def sent(self):
+        return self.finish(PushMessage.Status.SENT)
+
+    def retry(self, error, tokens=None):
+        self.tokens = tokens
+        if self.attempts + 1 >= PushMessage.MAX_ATTEMPTS:
+            return self.finish(PushMessage.Status.FAILED, error)
+        return self.finish(PushMessage.Status.PENDING, error)
+
+    def fail(self, error):
+        return self.finish(PushMessage.Status.FAILED, error)
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.attempts += 1
+        self.error = error
+        self.sent_date = timezone.now() if status == PushMessage.Status.SENT else None
+        self.save(
+            update_fields=[
+                "status",
+                "attempts",
+                "error",
+                "sent_date",
+                "tokens",
+                "updated_date",
+            ]
+        )
+        return True
+
+    def __str__(self):
+        return f"{self.get_target_display()} - {self.title}"
+
+
+class TopicSubscription(MyBaseModel):
+    MAX_ATTEMPTS = 5
+
+    class Action(models.TextChoices):
+        SUBSCRIBE = "SUBSCRIBE", _("Đăng ký")
+        UNSUBSCRIBE = "UNSUBSCRIBE", _("Hủy đăng ký")
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", _("Đang chờ")
+        FAILED = "FAILED", _("Thất bại")
+
+    # NOTE: Not a foreign key, the token is gone when it is unsubscribed
+    token = models.CharField(verbose_name=_("Token"), max_length=163)
+    topic = models.CharField(verbose_name=_("Chủ đề"), max_length=50)
+    action = models.CharField(
+        verbose_name=_("Thao tác"), choices=Action.choices, max_length=20
+    )
+    status = models.CharField(
+        verbose_name=_("Trạng thái"),
+        choices=Status.choices,
+        default=Status.PENDING,
+        max_length=20,
+    )
+    attempts = models.PositiveIntegerField(_("Số lần thử"), default=0)
+    error = models.TextField(_("Lỗi"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Đăng ký chủ đề")
+        verbose_name_plural = _("Đăng ký chủ đề")
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def retry(self, error):
+        self.attempts += 1
+        self.error = error
+        if self.attempts >= TopicSubscription.MAX_ATTEMPTS:
+            self.status = TopicSubscription.Status.FAILED
+        self.save(update_fields=["status", "attempts", "error", "updated_date"])
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.topic}"
+
+
+"""
+A flush of the unread counters written to the user rows, see notification.badge.
+
+It is recorded in the transaction of the flush, so a flush which committed but whose
+pending changes are still in Redis isn't written twice.
+"""
+
+
+class BadgeFlush(MyBaseModel):
+    flush_id = models.CharField(
+        verbose_name=_("Mã lần ghi"), max_length=32, unique=True
+    )
+
+    class Meta:
+        verbose_name = _("Lần ghi số thông báo chưa đọc")
+        verbose_name_plural = _("Lần ghi số thông báo chưa đọc")
+
+    def __str__(self):
+        return self.flush_id
+
+
+@receiver(post_save, sender=User)
+def create_broadcast_cursor(sender, instance, created, **kwargs):
+    if created:
+        BroadcastCursor.objects.get_or_create(
+            user=instance,
+            defaults={"visible_from": BroadcastCursor.get_latest_broadcast_id()},
+        )
@@ -0,0 +1,237 @@
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+
+from firebase import message
+from notification.models import FCMToken, PushMessage
+from notification.types import MessageTarget
+from utils import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+METRICS_WINDOW = 1000
+
+# NOTE: FCM answers these for tokens which will never be valid again
+STALE_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+RETRYABLE_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+    exceptions.UnknownError,
+    messaging.QuotaExceededError,
+)
+
+
+def send_to_topic(push_message):
+    if push_message.target == MessageTarget.ALL:
+        # NOTE: There is no topic for everyone, they read it in the app
+        return
+    message.send_notification(
+        title=push_message.title,
+        image=push_message.image,
+        link=push_message.link,
+        data=push_message.data,
+        target=push_message.target,
+    )
+
+
+"""
+Whether a push which failed with an error can succeed later.
+
+Args:
+    exception (Exception): The error of FCM for a message, or of its batch.
+
+Returns:
+    bool: Whether the push should be retried.
+"""
+
+
+def is_retryable(exception):
+    if not isinstance(exception, exceptions.FirebaseError):
+        return True
+    return isinstance(exception, RETRYABLE_ERRORS)
+
+
+"""
+Send the pushes of single residents, with one token query and FCM batches of
+firebase.message.MAX_BATCH_SIZE messages, and record the outcome of every push.
+
+A push is sent once one of its devices got it and nothing is left to retry. When some of
+its devices failed with a retryable error, it is retried later for these devices only,
+so the others don't get it twice. Tokens FCM reports as unregistered are deleted, so
+they aren't sent to again.
+
+Args:
+    push_messages (list): The pushes targeted at a resident.
+
+Returns:
+    int: The number of pushes sent.
+"""
+
+
+def send_to_residents(push_messages):
+    tokens = defaultdict(list)
+    for user_id, token in FCMToken.objects.filter(
+        user_id__in={push_message.recipient_id for push_message in push_messages},
+        device_type=FCMToken.DeviceType.ANDROID,
+    ).values_list("user_id", "token"):
+        tokens[user_id].append(token)
+    notifications = []
+    send_to = {}
+    for push_message in push_messages:
+        send_to[push_message.id] = [
+            token
+            for token in tokens[push_message.recipient_id]
+            if push_message.tokens is None or token in push_message.tokens
+        ]
+        if send_to[push_message.id]:
+            notifications.append(
+                {
+                    "tokens": send_to[push_message.id],
+                    "title": push_message.title,
+                    "image": push_message.image,
+                    "data": push_message.data,
+                }
+            )
+    responses = iter(message.send_each(notifications) if notifications else [])
+
+    sent = 0
+    stale_tokens = []
+    for push_message in push_messages:
+        delivered = False
+        retried_tokens = []
+        error = None
+        for token in send_to[push_message.id]:
+            _, response = next(responses)
+            if response.success:
+                delivered = True
+                continue
+            error = str(response.exception)
+            if isinstance(response.exception, STALE_TOKEN_ERRORS):
+                stale_tokens.append(token)
+            elif is_retryable(response.exception):
+                retried_tokens.append(token)
+            else:
+                log.warning(f"Sending push {push_message.id} failed:::{error}")
+        if retried_tokens:
+            push_message.retry(error, retried_tokens)
+        elif delivered or not send_to[push_message.id]:
+            push_message.sent()
+            sent += 1
+        else:
+            push_message.fail(error)
+    if stale_tokens:
+        FCMToken.objects.filter(token__in=stale_tokens).delete()
+        log.info(f"Deleted {len(stale_tokens)} stale FCM tokens")
+    return sent
+
+
+"""
+Send a push to its topic and record the outcome.
+
+Args:
+    push_message (PushMessage): The push, not targeted at a single resident.
+
+Returns:
+    int: 1 if the push is sent, else 0.
+"""
+
+
+def deliver(push_message):
+    try:
+        send_to_topic(push_message)
+    except Exception as e:
+        log.exception(f"Sending push {push_message.id} failed")
+        push_message.retry(str(e))
+        return 0
+    push_message.sent()
+    return 1
+
+
+"""
+Send the pending pushes of the outbox in batches.
+
+Every batch is locked with select_for_update(skip_locked=True), so several workers can
+drain the outbox at the same time without sending the same push twice. The outcome is
+recorded per push: one which failed with a retryable error is kept pending until it
+has been tried PushMessage.MAX_ATTEMPTS times. Topic pushes are sent one by one, the
+pushes of single residents together in FCM batches.
+
+Args:
+    batch_size (int): The number of pushes locked per transaction.
+
+Returns:
+    tuple: The number of sent and failed pushes.
+"""
+
+
+def drain_push_outbox(batch_size=DEFAULT_BATCH_SIZE):
+    sent = failed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            push_messages = list(
+                PushMessage.objects.select_for_update(skip_locked=True)
+                .filter(status=PushMessage.Status.PENDING, id__gt=last_id)
+                .order_by("id")[:batch_size]
+            )
+            if not push_messages:
+                return sent, failed
+            started_at = time.perf_counter()
+            residents = [
+                push_message
+                for push_message in push_messages
+                if push_message.target == MessageTarget.RESIDENT
+            ]
+            batch_sent = sum(
+                deliver(push_message)
+                for push_message in push_messages
+                if push_message.target != MessageTarget.RESIDENT
+            )
+            if residents:
+                batch_sent += send_to_residents(residents)
+            sent += batch_sent
+            failed += len(push_messages) - batch_sent
+            log.info(
+                f"Tried {len(push_messages)} push messages in "
+                f"{(time.perf_counter() - started_at) * 1000:.2f}ms"
+            )
+        last_id = push_messages[-1].id
+
+
+"""
+Get the health of the push outbox.
+
+Returns:
+    dict: The number of pending pushes, the age of the oldest one in seconds and the
+    p50/p95 delivery latency in seconds over the last METRICS_WINDOW sent pushes.
+"""
+
+
+def get_push_outbox_metrics():
+    pending = PushMessage.objects.filter(status=PushMessage.Status.PENDING)
+    oldest = pending.aggregate(oldest=Min("created_date"))["oldest"]
+    metrics = {
+        "pending": pending.count(),
+        "failed": PushMessage.objects.filter(status=PushMessage.Status.FAILED).count(),
+        "oldest_pending_age": (
+            (timezone.now() - oldest).total_seconds() if oldest else 0
+        ),
+    }
+    latencies = sorted(
+        sent_date - created_date
+        for created_date, sent_date in PushMessage.objects.filter(
+            status=PushMessage.Status.SENT
+        )
+        .order_by("-id")
+        .values_list("created_date", "sent_date")[:METRICS_WINDOW]
+    )
+    if latencies:
+        metrics["latency_p50"] = latencies[len(latencies) // 2].total_seconds()
+        metrics["latency_p95"] = latencies[int(len(latencies) * 0.95)].total_seconds()
+    return metrics
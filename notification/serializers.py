@@ -1,12 +1,9 @@
 from rest_framework import serializers
 
 from app import settings
-from notification.types import (
-    ACTION_MESSAGE_MAPPING,
-    ENTITY_TYPE_MODEL_MAPPING,
-    LINK_MAPPING,
-)
+from notification.types import LINK_MAPPING
 
+from . import tokens
 from .models import FCMToken, Notification, NotificationContent
 
 
@@ -25,28 +22,27 @@ class FCMTokenSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data):
-        obj, created = FCMToken.objects.update_or_create(
-            token=validated_data["token"],
-            defaults={
-                "token": validated_data["token"],
-                "device_type": validated_data["device_type"],
-                "user": validated_data["user"],
-            },
-            create_defaults={
-                "token": validated_data["token"],
-                "device_type": validated_data["device_type"],
-                "user": validated_data["user"],
-            },
+        return tokens.register_token(
+            validated_data["user"],
+            validated_data["token"],
+            validated_data["device_type"],
         )
-        return obj, created
 
 
 class ReadNotificationSerializer(serializers.ModelSerializer):
-    content_id = serializers.IntegerField()
+    content_id = serializers.IntegerField(required=False)
+    content_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=1000
+    )
+
+    def validate(self, attrs):
+        if "content_id" not in attrs and "content_ids" not in attrs:
+            raise serializers.ValidationError("content_id or content_ids is required")
+        return attrs
 
     class Meta:
         model = Notification
-        fields = ["content_id"]
+        fields = ["content_id", "content_ids"]
 
 
 class NotificationContentSerializer(serializers.ModelSerializer):
@@ -62,17 +58,32 @@ class NotificationContentSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "entity_type", "entity_id", "image"]
 
 
+"""
+Serialize a page of notifications, with the messages of their contents resolved
+together instead of one entity query per notification.
+"""
+
+
+class NotificationListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        data = list(data.all() if hasattr(data, "all") else data)
+        self.child.messages = NotificationContent.get_messages(
+            [instance.content for instance in data]
+        )
+        return super().to_representation(data)
+
+
 class ClientNotificationSerializer(serializers.ModelSerializer):
+    # NOTE: Annotated by NotificationView, broadcasts are read per user
+    has_been_read = serializers.BooleanField(source="is_read", read_only=True)
     message = serializers.SerializerMethodField(read_only=True)
     content = NotificationContentSerializer(read_only=True)
 
     def get_message(self, instance):
-        entity = ENTITY_TYPE_MODEL_MAPPING[instance.content.entity_type].objects.get(
-            pk=instance.content.entity_id
-        )
-        return ACTION_MESSAGE_MAPPING[instance.content.entity_type](
-            entity, instance.content.get_entity_type_display().lower()
-        )
+        messages = getattr(self, "messages", None)
+        if messages is None or instance.content_id not in messages:
+            messages = NotificationContent.get_messages([instance.content])
+        return messages[instance.content_id]
 
     class Meta:
         model = Notification
@@ -84,6 +95,7 @@ class ClientNotificationSerializer(serializers.ModelSerializer):
             "created_date",
             "updated_date",
         ]
+        list_serializer_class = NotificationListSerializer
         read_only_fields = [
             "id",
             "has_been_read",
@@ -108,3 +120,4 @@ class AdminNotificationSerializer(ClientNotificationSerializer):
         model = ClientNotificationSerializer.Meta.model
         fields = ClientNotificationSerializer.Meta.fields + ["link"]
         read_only_fields = ClientNotificationSerializer.Meta.fields + ["link"]
+        list_serializer_class = NotificationListSerializer
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app import settings
+from utils import get_logger
+
+log = get_logger(__name__)
+
+# NOTE: The channel of the notifications stored once for every resident
+BROADCAST_CHANNEL = "broadcast"
+REDIS_CHANNEL_PREFIX = "notification:stream:"
+
+"""
+A broker which hands events to the streams connected to this process.
+
+Every subscriber gets its own queue, bound to the event loop it was created in, so events
+can be published from any thread, e.g. from the on_commit hook of a request.
+
+Args:
+    max_queue_size (int): The number of events kept for a slow subscriber before the
+        oldest ones are dropped.
+"""
+
+
+class InMemoryBroker:
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.max_queue_size)
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].discard(subscription)
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+
+    """
+    Publish events, each to its own channel.
+
+    Args:
+        messages (list): The (channel, event) pairs.
+    """
+
+    def publish_each(self, messages):
+        with self.lock:
+            deliveries = [
+                (subscription, event)
+                for channel, event in messages
+                for subscription in self.subscribers.get(str(channel), ())
+            ]
+        for subscription, event in deliveries:
+            subscription.put(event)
+
+    def count(self):
+        with self.lock:
+            return len(set().union(*self.subscribers.values()))
+
+
+class Subscription:
+    def __init__(self, broker, channels, max_queue_size):
+        self.broker = broker
+        self.channels = [str(channel) for channel in channels]
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self.put_nowait, event)
+
+    def put_nowait(self, event):
+        if self.queue.full():
+            # NOTE: A client which doesn't keep up loses its oldest events
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+"""
+A broker for several processes or nodes, over Redis pub/sub.
+
+Events are published to Redis, and every process runs one listener which hands them to
+its own in-memory broker, so a process holds one Redis connection for all its streams.
+"""
+
+
+class RedisBroker(InMemoryBroker):
+    def __init__(self, max_queue_size=100):
+        super().__init__(max_queue_size)
+        self.listeners = {}
+
+    def subscribe(self, channels):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if loop not in self.listeners or self.listeners[loop].done():
+                self.listeners[loop] = loop.create_task(self.listen())
+        return super().subscribe(channels)
+
+    def publish_each(self, messages):
+        try:
+            pipeline = get_redis_connection("default").pipeline(transaction=False)
+            for channel, event in messages:
+                pipeline.publish(f"{REDIS_CHANNEL_PREFIX}{channel}", json.dumps(event))
+            pipeline.execute()
+        except RedisError:
+            log.exception("Publishing notification events failed")
+
+    async def listen(self):
+        redis = Redis.from_url(settings.CACHES["default"]["LOCATION"])
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(f"{REDIS_CHANNEL_PREFIX}*")
+            # NOTE: Stops with the last stream of the loop, the next one starts it again
+            while self.count():
+                message = await pubsub.get_message(timeout=1)
+                if message:
+                    channel = message["channel"].decode()[len(REDIS_CHANNEL_PREFIX) :]
+                    super().publish_each([(channel, json.loads(message["data"]))])
+        except RedisError:
+            log.exception("Listening to notification events failed")
+        finally:
+            await pubsub.aclose()
+            await redis.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = (
+                InMemoryBroker()
+                if settings.NOTIFICATION_STREAM_BROKER == "memory"
+                else RedisBroker()
+            )
+        return _broker
+
+
+def get_user_channels(user):
+    return [user.pk, BROADCAST_CHANNEL]
+
+
+"""
+Publish events to the streams of users once the transaction commits.
+
+Args:
+    messages (list): The (channel, event, data) of every event, the channel is the
+        resident ID of a user or BROADCAST_CHANNEL.
+
+Returns:
+    None
+"""
+
+
+def publish_each(messages):
+    messages = [
+        (str(channel), {"event": event, "data": data})
+        for channel, event, data in messages
+    ]
+    if messages:
+        transaction.on_commit(lambda: get_broker().publish_each(messages))
+
+
+def publish(channels, event, data):
+    publish_each([(channel, event, data) for channel in channels])
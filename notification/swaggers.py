@@ -42,6 +42,12 @@ NOTIFICATION_LIST = {
                 ),
             ],
         ),
+        OpenApiParameter(
+            name="history",
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            description="List the archived notifications instead of the recent ones",
+        ),
     ],
     "examples": [
         OpenApiExample(
@@ -80,5 +86,40 @@ NOTIFICATION_READ = {
             },
             request_only=True,
         ),
+        OpenApiExample(
+            "Many",
+            value={
+                "content_ids": [1, 2, 3],
+            },
+            request_only=True,
+        ),
+        OpenApiExample(
+            "Many",
+            value={"read": 3, "badge": 0},
+            response_only=True,
+        ),
+    ],
+}
+
+NOTIFICATION_READ_ALL = {
+    "request": None,
+    "responses": {200: OpenApiTypes.OBJECT},
+    "parameters": [
+        OpenApiParameter(
+            name="source",
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description="Notification for",
+            examples=[OpenApiExample("Example", value="admin")],
+        ),
+    ],
+    "examples": [
+        OpenApiExample(
+            "Example",
+            value={"read": 10, "badge": 0},
+            response_only=True,
+        ),
     ],
 }
+
+NOTIFICATION_READ_BEFORE = NOTIFICATION_READ_ALL
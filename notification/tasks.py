@@ -0,0 +1,21 @@
+from notification import archive, badge, outbox, tokens
+
+
+def drain_push_outbox():
+    outbox.drain_push_outbox()
+
+
+def flush_badges():
+    badge.flush_badges()
+
+
+def archive_notifications():
+    archive.archive_notifications()
+
+
+def flush_topic_subscriptions():
+    tokens.flush_topic_subscriptions()
+
+
+def validate_fcm_tokens():
+    tokens.validate_tokens()
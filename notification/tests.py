@@ -1,3 +1,55 @@
 from django.test import TestCase
 
-# Create your tests here.
+from app import settings
+from feedback.models import Feedback
+from notification.manager import NotificationManager
+from notification.models import Notification
+from notification.types import EntityType
+from user.models import PersonalInformation, User
+
+
+def create_user(i, is_staff=False):
+    personal_information = PersonalInformation.objects.create(
+        citizen_id=f"{i:012d}",
+        full_name=f"User {i}",
+        phone_number=f"09{i:08d}",
+    )
+    return User.objects.create(
+        resident_id=f"T{i:05d}",
+        personal_information=personal_information,
+        is_staff=is_staff,
+    )
+
+
+class CreateNotificationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = create_user(0, is_staff=True)
+        cls.author = create_user(1)
+        cls.feedback = Feedback.objects.create(
+            title="Thang máy",
+            content="Thang máy bị hỏng",
+            type=Feedback.FeedbackType.COMPLAIN,
+            author=cls.author,
+        )
+
+    def notify_staff(self):
+        NotificationManager.create_notification(
+            entity=self.feedback,
+            entity_type=EntityType.FEEDBACK_POST,
+            sender=self.sender,
+            image=settings.LOGO,
+        )
+
+    def test_fan_out_to_staff_costs_constant_queries(self):
+        for i in range(2, 4):
+            create_user(i, is_staff=True)
+        with self.assertNumQueries(7):
+            self.notify_staff()
+        self.assertEqual(Notification.objects.count(), 3)
+
+        for i in range(4, 31):
+            create_user(i, is_staff=True)
+        with self.assertNumQueries(7):
+            self.notify_staff()
+        self.assertEqual(Notification.objects.count(), 3 + 30)
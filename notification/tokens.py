@@ -0,0 +1,190 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+
+from firebase import message, topic
+from notification.models import FCMToken, TopicSubscription
+from utils import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_BATCH_SIZE = topic.MAX_BATCH_SIZE
+DEFAULT_VALIDATION_SIZE = 1000
+VALIDATION_INTERVAL = timedelta(days=7)
+
+# NOTE: A dry run of an empty message only fails like this because of its token
+STALE_TOKEN_ERRORS = (
+    messaging.UnregisteredError,
+    messaging.SenderIdMismatchError,
+    exceptions.InvalidArgumentError,
+)
+STALE_TOKEN_REASONS = {"NOT_FOUND", "INVALID_ARGUMENT"}
+
+"""
+Save the token of a device and queue its subscription to the topic of its user.
+
+Args:
+    user (User): The owner of the token.
+    token (str): The token.
+    device_type (FCMToken.DeviceType): The device type.
+
+Returns:
+    tuple: The token and whether it was created.
+"""
+
+
+def register_token(user, token, device_type):
+    with transaction.atomic():
+        fcm_token, created = FCMToken.objects.update_or_create(
+            token=token,
+            defaults={"device_type": device_type, "user": user},
+        )
+        queue([token], FCMToken.get_topic(user, device_type))
+    return fcm_token, created
+
+
+"""
+Delete the tokens of a user and queue their unsubscription from a topic.
+
+Args:
+    user (User): The owner of the tokens.
+    tokens (list): The tokens.
+    device_type (FCMToken.DeviceType): The device type.
+    topic_name (str): The topic.
+
+Returns:
+    None
+"""
+
+
+def unregister_tokens(user, tokens, device_type, topic_name):
+    with transaction.atomic():
+        FCMToken.objects.filter(
+            token__in=tokens, user=user, device_type=device_type
+        ).delete()
+        queue(tokens, topic_name, TopicSubscription.Action.UNSUBSCRIBE)
+
+
+def queue(tokens, topic_name, action=TopicSubscription.Action.SUBSCRIBE):
+    TopicSubscription.objects.bulk_create(
+        [
+            TopicSubscription(token=token, topic=topic_name, action=action)
+            for token in tokens
+            if token
+        ]
+    )
+
+
+"""
+Send the queued topic subscriptions to FCM.
+
+Every batch is locked with select_for_update(skip_locked=True) and only the last queued
+action of a token on a topic is sent, so a device registering twice costs one call. The
+tokens of a topic and action are sent together in FCM batches of topic.MAX_BATCH_SIZE.
+Tokens FCM doesn't know are deleted, the other failures are retried up to
+TopicSubscription.MAX_ATTEMPTS times.
+
+Args:
+    batch_size (int): The number of subscriptions locked per transaction.
+
+Returns:
+    tuple: The number of sent and failed subscriptions, stale tokens are neither.
+"""
+
+
+def flush_topic_subscriptions(batch_size=DEFAULT_BATCH_SIZE):
+    sent = failed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            subscriptions = list(
+                TopicSubscription.objects.select_for_update(skip_locked=True)
+                .filter(status=TopicSubscription.Status.PENDING, id__gt=last_id)
+                .order_by("id")[:batch_size]
+            )
+            if not subscriptions:
+                return sent, failed
+            latest = {
+                (subscription.token, subscription.topic): subscription
+                for subscription in subscriptions
+            }
+            tokens = defaultdict(list)
+            for (token, topic_name), subscription in latest.items():
+                tokens[(topic_name, subscription.action)].append(token)
+            done = {subscription.id for subscription in subscriptions}
+            stale_tokens = []
+            retried = 0
+            for (topic_name, action), batch in tokens.items():
+                try:
+                    errors = topic.manage_topic(
+                        batch,
+                        topic_name,
+                        subscribe=action == TopicSubscription.Action.SUBSCRIBE,
+                    )
+                except Exception as e:
+                    log.exception(
+                        f"Sending {len(batch)} {action} to {topic_name} failed"
+                    )
+                    errors = [(token, str(e)) for token in batch]
+                for token, reason in errors:
+                    if reason in STALE_TOKEN_REASONS:
+                        stale_tokens.append(token)
+                        continue
+                    latest[(token, topic_name)].retry(reason)
+                    done.discard(latest[(token, topic_name)].id)
+                    retried += 1
+            TopicSubscription.objects.filter(id__in=done).delete()
+            if stale_tokens:
+                FCMToken.objects.filter(token__in=stale_tokens).delete()
+                log.info(f"Deleted {len(stale_tokens)} stale FCM tokens")
+            sent += len(latest) - retried - len(stale_tokens)
+            failed += retried
+        last_id = subscriptions[-1].id
+
+
+"""
+Check the tokens which haven't been checked for VALIDATION_INTERVAL with a dry run and
+delete the ones FCM rejects.
+
+The oldest checked tokens go first, at most limit of them per run, so a run stays short
+however many tokens there are and every token is checked in turn.
+
+Args:
+    limit (int): The number of tokens checked.
+
+Returns:
+    tuple: The number of valid and deleted tokens.
+"""
+
+
+def validate_tokens(limit=DEFAULT_VALIDATION_SIZE):
+    tokens = list(
+        FCMToken.objects.filter(
+            Q(validated_date__isnull=True)
+            | Q(validated_date__lt=timezone.now() - VALIDATION_INTERVAL)
+        )
+        .order_by(F("validated_date").asc(nulls_first=True), "id")
+        .values_list("token", flat=True)[:limit]
+    )
+    if not tokens:
+        return 0, 0
+    valid_tokens = []
+    stale_tokens = []
+    for token, response in message.validate_tokens(tokens):
+        if response.success:
+            valid_tokens.append(token)
+        elif isinstance(response.exception, STALE_TOKEN_ERRORS):
+            stale_tokens.append(token)
+    with transaction.atomic():
+        FCMToken.objects.filter(token__in=valid_tokens).update(
+            validated_date=timezone.now()
+        )
+        FCMToken.objects.filter(token__in=stale_tokens).delete()
+    log.info(
+        f"Validated {len(tokens)} FCM tokens, deleted {len(stale_tokens)} stale ones"
+    )
+    return len(valid_tokens), len(stale_tokens)
@@ -17,6 +17,10 @@ class MessageTarget(models.TextChoices):
     ALL = "ALL", _("Tất cả")
 
 
+# NOTE: Notifications for every user, which are stored once instead of per recipient
+BROADCAST_TARGETS = [MessageTarget.RESIDENTS, MessageTarget.ALL]
+
+
 class EntityType(models.TextChoices):
     SERVICE_REGISTER = "SERVICE_REGISTER", _("Đăng ký dịch vụ")
     SERVICE_APPROVED = "SERVICE_APPROVED", _("Đã duyệt đăng ký")
@@ -36,6 +40,7 @@ class EntityType(models.TextChoices):
     )
     NEWS_POST = "NEWS_POST", _("Đăng tin tức")
     INVOICE_CREATE = "INVOICE_CREATE", _("Nhận hóa đơn")
+    INVOICE_OVERDUE = "INVOICE_OVERDUE", _("Hóa đơn quá hạn")
     LOCKER_ITEM_ADD = "LOCKER_ITEM_ADD", _("Đã nhận giúp")
     CHAT_SEND_MESSAGE = "CHAT_SEND_MESSAGE", _("")
 
@@ -53,6 +58,7 @@ ENTITY_TARGET = {
     EntityType.INVOICE_PROOF_IMAGE_REJECTED: MessageTarget.RESIDENT,
     EntityType.NEWS_POST: MessageTarget.RESIDENTS,
     EntityType.INVOICE_CREATE: MessageTarget.RESIDENT,
+    EntityType.INVOICE_OVERDUE: MessageTarget.RESIDENT,
     EntityType.LOCKER_ITEM_ADD: MessageTarget.RESIDENT,
     EntityType.CHAT_SEND_MESSAGE: MessageTarget.RESIDENT,
 }
@@ -70,10 +76,30 @@ ENTITY_TYPE_MODEL_MAPPING = {
     EntityType.INVOICE_PROOF_IMAGE_REJECTED: ProofImage,
     EntityType.NEWS_POST: News,
     EntityType.INVOICE_CREATE: Invoice,
+    EntityType.INVOICE_OVERDUE: Invoice,
     EntityType.LOCKER_ITEM_ADD: Item,
     EntityType.CHAT_SEND_MESSAGE: Inbox,
 }
 
+# NOTE: The relations ACTION_MESSAGE_MAPPING walks, loaded along with the entities
+ENTITY_TYPE_RELATED_MAPPING = {
+    EntityType.SERVICE_REGISTER: ["resident__personal_information", "service"],
+    EntityType.SERVICE_APPROVED: ["service"],
+    EntityType.SERVICE_REJECTED: ["service"],
+    EntityType.SERVICE_REISSUE: [
+        "service_registration__resident__personal_information",
+        "service_registration__service",
+    ],
+    EntityType.REISSUE_APPROVED: ["service_registration__service"],
+    EntityType.REISSUE_REJECTED: ["service_registration__service"],
+    EntityType.FEEDBACK_POST: ["author__personal_information"],
+    EntityType.INVOICE_PROOF_IMAGE_PAYMENT: [
+        "payment__invoice__resident__personal_information"
+    ],
+    EntityType.INVOICE_PROOF_IMAGE_APPROVED: ["payment"],
+    EntityType.INVOICE_PROOF_IMAGE_REJECTED: ["payment"],
+}
+
 ACTION_MESSAGE_MAPPING = {
     EntityType.SERVICE_REGISTER: lambda entity,
     action: f"{entity.resident.__str__()} {action} {entity.service.get_id_display()}",
@@ -98,6 +124,8 @@ ACTION_MESSAGE_MAPPING = {
     EntityType.NEWS_POST: lambda entity, action: f"{entity.__str__()}",
     EntityType.INVOICE_CREATE: lambda entity,
     action: f"{action.capitalize()} ({entity.created_date.strftime('%d/%m/%Y')})",
+    EntityType.INVOICE_OVERDUE: lambda entity,
+    action: f"{action.capitalize()} {entity.id} ({entity.due_date.strftime('%d/%m/%Y')})",
     EntityType.LOCKER_ITEM_ADD: lambda entity,
     action: f"Ban quản trị {action} {str(entity.quantity)} {entity.name}",
     EntityType.CHAT_SEND_MESSAGE: lambda entity,
@@ -1,10 +1,17 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import FCMTokenView, NotificationView
+from .views import FCMTokenView, NotificationView, stream_notifications
 
 r = routers.DefaultRouter()
 r.register("fcm-tokens", FCMTokenView, basename="fcm-token")
 r.register("notifications", NotificationView, basename="notification")
 
-urlpatterns = [path("", include(r.urls))]
+urlpatterns = [
+    path(
+        "notifications/stream/",
+        stream_notifications,
+        name="notification-stream",
+    ),
+    path("", include(r.urls)),
+]
@@ -1,20 +1,38 @@
+import asyncio
+import json
 import traceback
 
-from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Value,
+    When,
+)
+from django.http import HttpResponse, StreamingHttpResponse
 from drf_spectacular.utils import extend_schema
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.generics import CreateAPIView, ListAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
-from firebase import topic
-from notification.types import EntityType, MessageTarget
+from app import settings
+from app.pagination import OptionalCursorPagination
+from notification.manager import NotificationManager
+from notification.types import BROADCAST_TARGETS, EntityType, MessageTarget
 from user.permissions import NonAccessTokenPermissionMixin
 from utils import get_logger
 
-from . import models, serializers, swaggers
+from . import badge, models, serializers, stream, swaggers
 
 log = get_logger(__name__)
 
@@ -24,13 +42,13 @@ class FCMTokenView(NonAccessTokenPermissionMixin, CreateAPIView, ViewSet):
     serializer_class = serializers.FCMTokenSerializer
     permission_classes = [IsAuthenticated]
 
-    # TODO: validate tokens by sending tokens to a topic
     @extend_schema(**swaggers.NOTIFICATION_POST_FCM_TOKEN)
     def create(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         try:
+            # NOTE: The topic subscription is queued, see notification.tokens
             fcm_token, created = serializer.save(user=request.user)
             # NOTE: Avoid sending too much information about tokens to clients
             if created:
@@ -41,13 +59,6 @@ class FCMTokenView(NonAccessTokenPermissionMixin, CreateAPIView, ViewSet):
                 log.info(
                     f"Updated fcm token {fcm_token.token} of {self.request.user} successfully"
                 )
-            if (
-                request.user.is_staff
-                and serializer.validated_data["device_type"] == "WEB"
-            ):
-                topic.subscribe_to_topic(fcm_tokens=fcm_token.token, topic="admin")
-            else:
-                topic.subscribe_to_topic(fcm_tokens=fcm_token.token, topic="resident")
             response = Response("Saved fcm token successfully", status.HTTP_201_CREATED)
             response.set_cookie("fcm_token", fcm_token.token)
             return response
@@ -61,6 +72,8 @@ class FCMTokenView(NonAccessTokenPermissionMixin, CreateAPIView, ViewSet):
 class NotificationView(NonAccessTokenPermissionMixin, ListAPIView, ViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.ClientNotificationSerializer
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = "-id"
 
     @property
     def for_admin(self):
@@ -69,10 +82,51 @@ class NotificationView(NonAccessTokenPermissionMixin, ListAPIView, ViewSet):
     def get_permissions(self):
         return super().get_permissions()
 
+    @property
+    def for_history(self):
+        return self.request.GET.get("history") == "true"
+
     def get_queryset(self):
+        cursor = models.BroadcastCursor.get_for(self.request.user)
+        if self.for_history:
+            # NOTE: Archived broadcasts are too old to be unread
+            queryset = models.ArchivedNotification.objects.filter(
+                Q(recipient=self.request.user)
+                | Q(
+                    recipient__isnull=True,
+                    target__in=BROADCAST_TARGETS,
+                    pk__gt=cursor.visible_from,
+                )
+            ).annotate(
+                is_read=Case(
+                    When(recipient__isnull=True, then=Value(True)),
+                    default=F("has_been_read"),
+                    output_field=BooleanField(),
+                )
+            )
+            return self.filter_queryset_by_source(queryset)
         queryset = models.Notification.objects.filter(
-            recipient=self.request.user,
+            Q(recipient=self.request.user)
+            | Q(
+                recipient__isnull=True,
+                target__in=BROADCAST_TARGETS,
+                pk__gt=cursor.visible_from,
+            )
+        ).annotate(
+            is_read=Case(
+                When(recipient__isnull=False, then=F("has_been_read")),
+                When(pk__lte=cursor.last_read_id, then=Value(True)),
+                default=Exists(
+                    models.BroadcastReceipt.objects.filter(
+                        notification=OuterRef("pk"), user=self.request.user
+                    )
+                ),
+                output_field=BooleanField(),
+            )
         )
+        return self.filter_queryset_by_source(queryset)
+
+    def filter_queryset_by_source(self, queryset):
         queryset = queryset.exclude(
             content__entity_type=EntityType.CHAT_SEND_MESSAGE
         )  # NOTE: should use ~Q instead of excluding, but it has an error that I didn't figure out how to fix
@@ -80,7 +134,7 @@ class NotificationView(NonAccessTokenPermissionMixin, ListAPIView, ViewSet):
             queryset = queryset.filter(target=MessageTarget.ADMIN)
         else:
             queryset = queryset.exclude(target=MessageTarget.ADMIN)
-        return queryset.order_by("-id")
+        return queryset.select_related("content").order_by("-id")
 
     def get_serializer_class(self):
         if self.for_admin:
@@ -92,11 +146,7 @@ class NotificationView(NonAccessTokenPermissionMixin, ListAPIView, ViewSet):
         if self.for_admin and not request.user.is_staff:
             return Response("You do not have permission", status.HTTP_403_FORBIDDEN)
         response = super().list(request, *args, **kwargs)
-        response.data["badge"] = (
-            request.user.staff_unread_notifications
-            if self.for_admin
-            else request.user.unread_notifications
-        )
+        response.data["badge"] = self.get_badge(request.user)
         return response
 
     # NOTE: There is a bug on my Firefox, if you can't set read state for the notification
@@ -110,11 +160,15 @@ class NotificationView(NonAccessTokenPermissionMixin, ListAPIView, ViewSet):
     def read(self, request):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
+        if "content_ids" in serializer.validated_data:
+            return self.read_notifications(
+                request, content_ids=serializer.validated_data["content_ids"]
+            )
         if (
             self.get_queryset()
             .filter(content_id=serializer.validated_data["content_id"])
             .first()
-            .read()
+            .read(user=request.user)
         ):
             log.info(f"{request.user} read notification successfully")
             return Response("Read successfully", status.HTTP_201_CREATED)
@@ -126,3 +180,109 @@ class NotificationView(NonAccessTokenPermissionMixin, ListAPIView, ViewSet):
                 "Read failed. This notification has been read already",
                 status.HTTP_201_CREATED,
             )
+
+    @extend_schema(**swaggers.NOTIFICATION_READ_ALL)
+    @action(detail=False, methods=["POST"], url_path="read-all")
+    def read_all(self, request):
+        return self.read_notifications(request)
+
+    @extend_schema(**swaggers.NOTIFICATION_READ_BEFORE)
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path=r"read-before/(?P<notification_id>\d+)",
+    )
+    def read_before(self, request, notification_id=None):
+        return self.read_notifications(request, before_id=int(notification_id))
+
+    def read_notifications(self, request, content_ids=None, before_id=None):
+        if self.for_admin and not request.user.is_staff:
+            return Response("You do not have permission", status.HTTP_403_FORBIDDEN)
+        count = NotificationManager.read_notifications(
+            request.user,
+            for_admin=self.for_admin,
+            content_ids=content_ids,
+            before_id=before_id,
+        )
+        log.info(f"{request.user} read {count} notifications")
+        return Response(
+            {"read": count, "badge": self.get_badge(request.user)}, status.HTTP_200_OK
+        )
+
+    def get_badge(self, user):
+        unread_notifications = badge.get_unread_notifications(user)
+        if self.for_admin:
+            return unread_notifications["staff_unread_notifications"]
+        return (
+            unread_notifications["unread_notifications"]
+            + models.BroadcastCursor.get_for(user).count_unread()
+        )
+
+
+def authenticate_stream(request):
+    # NOTE: EventSource can't send headers, the access token may come as a parameter
+    if access_token := request.GET.get("access_token"):
+        request.META["HTTP_AUTHORIZATION"] = f"Bearer {access_token}"
+    try:
+        result = OAuth2Authentication().authenticate(Request(request))
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def get_stream_badge(user):
+    unread_notifications = badge.get_unread_notifications(user)
+    unread_notifications["unread_notifications"] += models.BroadcastCursor.get_for(
+        user
+    ).count_unread()
+    return unread_notifications
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+"""
+Stream the new notifications and badge changes of a user as server-sent events.
+
+The stream starts with a badge event holding the absolute counters, then sends a
+notification event for every new notification and a badge_change event with the change
+of a counter, e.g. {"field": "unread_notifications", "change": -3}. A comment is sent
+every NOTIFICATION_STREAM_HEARTBEAT seconds so proxies keep the connection open.
+
+The view is async and holds no thread while it waits, so it must be served over ASGI,
+see app.asgi. Users are authenticated by their session or by an access token, in the
+Authorization header or the access_token parameter.
+"""
+
+
+async def stream_notifications(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        user = await sync_to_async(authenticate_stream)(request)
+    if user is None:
+        return HttpResponse("Authentication credentials were not provided.", status=401)
+    initial_badge = await sync_to_async(get_stream_badge)(user)
+
+    async def events():
+        subscription = stream.get_broker().subscribe(stream.get_user_channels(user))
+        try:
+            yield format_event("badge", initial_badge)
+            while True:
+                try:
+                    event = await subscription.get(
+                        settings.NOTIFICATION_STREAM_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(event["event"], event["data"])
+        finally:
+            subscription.close()
+
+    log.info(f"{user.pk} connected to the notification stream")
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # NOTE: Nginx would buffer the events otherwise
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -12,6 +12,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from app.pagination import OptionalCursorPagination
 from notification.manager import NotificationManager
 from notification.types import EntityType
 from user.models import PersonalInformation
@@ -36,6 +37,8 @@ log = get_logger(__name__)
 class ServiceRegistrationView(DestroyAPIView, ReadOnlyModelViewSet):
     serializer_class = serializers.AccessCardServiceRegistrationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = "-id"
     # NOTE: Able to save the policy on the number of vehicles for each apartment in the database with a separate model
     max_vehicle_counts = {
         Vehicle.VehicleType.BICYCLE: 2,
@@ -3,7 +3,8 @@ from django.contrib.auth.password_validation import validate_password
 from django.forms import IntegerField
 from rest_framework import serializers
 
-from notification.models import FCMToken
+from notification import badge
+from notification.models import BroadcastCursor, FCMToken
 
 from . import models
 
@@ -42,8 +43,15 @@ class UserSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         rep["avatar"] = instance.avatar_url
+        rep.update(badge.get_unread_notifications(instance))
         if not rep["is_staff"]:
             del rep["staff_unread_notifications"]
+        request = self.context.get("request")
+        # NOTE: Broadcasts are counted from their cursor, only for the user themself
+        if not request or request.user == instance:
+            rep["unread_notifications"] += BroadcastCursor.get_for(
+                instance
+            ).count_unread()
         return rep
 
     class Meta:
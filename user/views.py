@@ -15,8 +15,7 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
 from app import settings
-from firebase import topic
-from notification.models import FCMToken
+from notification.tokens import unregister_tokens
 from service.models import MyBaseServiceStatus, Service, ServiceRegistration
 from user.models import User
 from utils import email, get_logger, http, sms, token
@@ -505,13 +504,12 @@ class UserView(ListAPIView, ViewSet, GenericAPIView):
                 "fcm_token" in serializer.validated_data
                 and serializer.validated_data["fcm_token"] is not None
             ):
-                fcm_token = serializer.validated_data["fcm_token"]
-                FCMToken.objects.filter(
-                    token=fcm_token,
-                    user=request.user,
-                    device_type=serializer.validated_data["device_type"],
-                ).delete()
-                topic.unsubscribe_from_topic(fcm_tokens=fcm_token, topic="resident")
+                unregister_tokens(
+                    request.user,
+                    [serializer.validated_data["fcm_token"]],
+                    serializer.validated_data["device_type"],
+                    "resident",
+                )
             log.info("User logout successfully")
             return Response(
                 status=status.HTTP_204_NO_CONTENT,
@@ -1,3 +1,5 @@
+import unicodedata
+
 """
 Format the given amount as a currency value in Vietnamese Dong (VNĐ).
 
@@ -39,3 +41,36 @@ Returns:
 def format_enum_values(enum):
     enum_values = [choice.value for choice in enum]
     return " | ".join(enum_values)
+
+
+"""
+Fold the given text for searching, lowercase and without Vietnamese accents.
+
+Args:
+    text (str): The text, e.g. "Nguyễn Đức Anh".
+
+Returns:
+    str: The folded text, e.g. "nguyen duc anh".
+"""
+
+
+def fold_accents(text):
+    text = unicodedata.normalize("NFD", text.lower()).replace("đ", "d")
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+"""
+Get the parts of the given text which start at one of its words, so a prefix search
+over them matches any word.
+
+Args:
+    text (str): The text, e.g. "tran van duc".
+
+Returns:
+    list: The parts, e.g. ["tran van duc", "van duc", "duc"].
+"""
+
+
+def get_word_suffixes(text):
+    words = text.split()
+    return [" ".join(words[i:]) for i in range(len(words))]